@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU General Public License along with
 # CQR. If not, see <https://www.gnu.org/licenses/>.
 from .solver import Solver
+from .batch import solve_batch
 
 __version__ = '0.1.0'
 
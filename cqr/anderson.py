@@ -0,0 +1,276 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""Anderson acceleration of fixed-point iterations.
+
+For the iteration ``x_{k+1} = x_k + g(x_k)``, with the differences of the
+last iterates ``dX`` and of their residuals ``dG``, the accelerated iterate
+is
+
+.. code-block:: none
+
+    x_{k+1} = x_k + g_k - (dX + dG) gamma
+
+where ``gamma`` solves ``min ||g_k - dG gamma||`` (type-II) or
+``dX^T dG gamma = dX^T g_k`` (type-I), see Walker and Ni, Anderson
+acceleration for fixed-point iterations, 2011, and Zhang, O'Donoghue and
+Boyd, Globally convergent type-I Anderson acceleration for nonsmooth
+fixed-point iterations, 2020. Both systems are regularized with a multiple
+of the identity.
+
+The thin QR of ``dG`` (type-II) or ``dX`` (type-I) is updated at each
+iteration: new columns are orthogonalized by Gram-Schmidt with
+reorthogonalization, and the oldest column is removed with Givens rotations.
+The other difference matrix is stored as is. So each iteration costs
+``O(N memory)``, with ``N`` the size of the variable.
+"""
+
+import numpy as np
+import scipy as sp
+
+ANDERSON_TYPES = ('I', 'II')
+
+
+def _rotate(first, second, cosine, sine):
+    """Apply Givens rotation to two short vectors, in place."""
+    first_copy = np.array(first)
+    first *= cosine
+    first += sine * second
+    second *= cosine
+    second -= sine * first_copy
+
+
+class AndersonAcceleration:
+    """Anderson acceleration, with its history.
+
+    :param size: Size of the variable.
+    :type size: int
+    :param memory: Number of differences kept.
+    :type memory: int
+    :param anderson_type: ``'I'`` or ``'II'``.
+    :type anderson_type: str
+    :param regularization: Regularization of the small linear system,
+        relative to its Frobenius norm.
+    :type regularization: float
+    :param safeguard: Accelerated iterates are rejected if their residual
+        norm is larger than this times the one of the current iterate.
+    :type safeguard: float
+    """
+
+    def __init__(
+            self, size, memory=10, anderson_type='II', regularization=1e-10,
+            safeguard=1.):
+        if anderson_type not in ANDERSON_TYPES:
+            raise SyntaxError(
+                f'Anderson type must be one of {ANDERSON_TYPES}.')
+        assert memory > 0
+        self.size = size
+        self.memory = memory
+        self.anderson_type = anderson_type
+        self.regularization = regularization
+        self.safeguard = safeguard
+
+        # current iterate and residual
+        self.x = np.empty(size)
+        self.g = np.empty(size)
+
+        # thin QR of the first difference matrix, and the second
+        self._q = np.empty((size, memory), order='F')
+        self._r = np.zeros((memory, memory))
+        self._other = np.empty((size, memory), order='F')
+        # for type-I, Q^T dG
+        self._c = np.zeros((memory, memory))
+
+        self._work = np.empty(size)
+        self._work_other = np.empty(size)
+
+        self.columns = 0
+        self._has_point = False
+        self.accepted = 0
+        self.rejected = 0
+
+    @property
+    def acceptance_rate(self):
+        """Fraction of accelerated iterates that were accepted.
+
+        :returns: Accepted over accepted and rejected iterates, zero if
+            there were none.
+        :rtype: float
+        """
+        return self.accepted / max(self.accepted + self.rejected, 1)
+
+    def reset(self):
+        """Forget the history; counters are kept."""
+        self.columns = 0
+        self._has_point = False
+
+    def state(self):
+        """History and counters, as arrays, to be saved.
+
+        :returns: Copies of the current point and of the used columns of the
+            factors, with the configuration they depend on.
+        :rtype: dict
+        """
+        k = self.columns
+        return {
+            'anderson_type': np.array(self.anderson_type),
+            'memory': np.array(self.memory),
+            'has_point': np.array(self._has_point),
+            'accepted': np.array(self.accepted),
+            'rejected': np.array(self.rejected),
+            'x': np.copy(self.x), 'g': np.copy(self.g),
+            'q': np.copy(self._q[:, :k]), 'r': np.copy(self._r[:k, :k]),
+            'other': np.copy(self._other[:, :k]),
+            'c': np.copy(self._c[:k, :k])}
+
+    def restore(self, state):
+        """Restore history and counters from :meth:`state`.
+
+        :param state: Saved state, of an acceleration with the same size,
+            memory and type.
+        :type state: dict
+
+        :raises ValueError: If the state is of a different acceleration.
+        """
+        if str(state['anderson_type']) != self.anderson_type or int(
+                state['memory']) != self.memory or len(
+                    state['x']) != self.size:
+            raise ValueError(
+                'Saved state is of a different Anderson acceleration.')
+        k = state['q'].shape[1]
+        self.x[:] = state['x']
+        self.g[:] = state['g']
+        self._q[:, :k] = state['q']
+        self._r[:] = 0.
+        self._r[:k, :k] = state['r']
+        self._other[:, :k] = state['other']
+        self._c[:] = 0.
+        self._c[:k, :k] = state['c']
+        self.columns = k
+        self._has_point = bool(state['has_point'])
+        self.accepted = int(state['accepted'])
+        self.rejected = int(state['rejected'])
+
+    def update(self, x, g):
+        """Add iterate and its residual to the history.
+
+        :param x: Iterate.
+        :type x: np.array
+        :param g: Residual, ``g(x)``.
+        :type g: np.array
+        """
+        if self._has_point:
+            dx, dg = self._work, self._work_other
+            np.subtract(x, self.x, out=dx)
+            np.subtract(g, self.g, out=dg)
+            if self.anderson_type == 'II':
+                self._append(basis=dg, other=dx)
+            else:
+                self._append(basis=dx, other=dg)
+        self.x[:] = x
+        self.g[:] = g
+        self._has_point = True
+
+    def _append(self, basis, other):
+        """Append column to the QR factors; basis is overwritten."""
+        if self.columns == self.memory:
+            self._delete_oldest()
+        k = self.columns
+        q = self._q[:, :k]
+        new = self._q[:, k]
+
+        # Gram-Schmidt, twice is enough
+        norm = np.linalg.norm(basis)
+        coefficients = np.zeros(k)
+        for _ in range(2):
+            projection = q.T @ basis
+            np.dot(q, projection, out=new)
+            basis -= new
+            coefficients += projection
+        diagonal = np.linalg.norm(basis)
+        if not diagonal > np.sqrt(np.finfo(float).eps) * norm:
+            # (numerically) dependent on the history, or zero
+            return
+        np.multiply(basis, 1. / diagonal, out=new)
+
+        self._r[:k, k] = coefficients
+        self._r[k, :k] = 0.
+        self._r[k, k] = diagonal
+        self._other[:, k] = other
+        if self.anderson_type == 'I':
+            self._c[:k+1, k] = self._q[:, :k+1].T @ other
+            self._c[k, :k] = new @ self._other[:, :k]
+        self.columns += 1
+
+    def _delete_oldest(self):
+        """Remove the oldest column from the QR factors."""
+        k = self.columns
+        hessenberg = np.array(self._r[:k, 1:k])
+        c = self._c[:k, :k]
+        for i in range(k - 1):
+            cosine, sine, hessenberg[i, i] = sp.linalg.lapack.dlartg(
+                hessenberg[i, i], hessenberg[i+1, i])
+            hessenberg[i+1, i] = 0.
+            _rotate(hessenberg[i, i+1:], hessenberg[i+1, i+1:], cosine, sine)
+            sp.linalg.blas.drot(
+                self._q[:, i], self._q[:, i+1], cosine, sine,
+                overwrite_x=1, overwrite_y=1)
+            if self.anderson_type == 'I':
+                _rotate(c[i], c[i+1], cosine, sine)
+        self._r[:k-1, :k-1] = hessenberg[:k-1]
+        self._r[k-1, :] = 0.
+        self._r[:, k-1] = 0.
+        if self.anderson_type == 'I':
+            self._c[:k-1, :k-1] = np.array(c[:k-1, 1:])
+            self._c[k-1, :] = 0.
+            self._c[:, k-1] = 0.
+        self._other[:, :k-1] = self._other[:, 1:k]
+        self.columns -= 1
+
+    def extrapolate(self, out):
+        """Compute the accelerated iterate.
+
+        :param out: Output, the accelerated iterate, or ``x + g`` if there is
+            no history or the linear system is singular.
+        :type out: np.array
+
+        :returns: Whether the iterate is accelerated.
+        :rtype: bool
+        """
+        np.add(self.x, self.g, out=out)
+        k = self.columns
+        if k == 0:
+            return False
+        q, r = self._q[:, :k], self._r[:k, :k]
+        rhs = r.T @ (q.T @ self.g)
+        if self.anderson_type == 'II':
+            matrix = r.T @ r
+        else:
+            matrix = r.T @ self._c[:k, :k]
+        matrix[np.diag_indices(k)] += self.regularization * np.linalg.norm(
+            matrix)
+        try:
+            gamma = np.linalg.solve(matrix, rhs)
+        except np.linalg.LinAlgError:
+            return False
+        if not np.all(np.isfinite(gamma)):
+            return False
+
+        # (dX + dG) gamma, one of the two is Q R
+        np.dot(q, r @ gamma, out=self._work)
+        out -= self._work
+        np.dot(self._other[:, :k], gamma, out=self._work)
+        out -= self._work
+        return True
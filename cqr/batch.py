@@ -0,0 +1,462 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""Douglas-Rachford iteration on a batch of programs that share the matrix.
+
+Programs with the same matrix and cones, differing only in ``b`` and ``c``,
+share the equilibration and the QR factorization, see
+:mod:`cqr.factorization_cache`. Their iterates are the columns of a
+``(2m, N)`` array: each iteration multiplies all of them by ``Q^T``, and then
+by ``Q``, in one matrix-matrix product, and the cone projections are
+vectorized over the batch. Programs leave the batch as they converge, or a
+certificate or the tolerances are met, so the arrays shrink.
+
+Each program is set up, and its solution or certificate recovered, by its own
+:class:`cqr.Solver`, so results, statuses and statistics are the same as
+those of single solves.
+"""
+
+import time
+
+import numpy as np
+
+from .cones import ExponentialCones
+from .douglas_rachford import DouglasRachford
+from .factorization_cache import FactorizationCache
+from .solver import Solver
+
+
+class BatchDouglasRachford:
+    """Douglas-Rachford iteration on the columns of a ``(2m, N)`` array.
+
+    Buffers are Fortran-ordered, so that each column is contiguous, and they
+    are reallocated only when programs leave the batch.
+
+    :param orthogonal: Square orthogonal factor ``Q``, shared.
+    :type orthogonal: cqr.factors.OrthogonalFactor
+    :param rank: Number of columns of ``Q_1``.
+    :type rank: int
+    :param b: QR-transformed primal constants, one column per program.
+    :type b: np.array
+    :param y0: Particular dual vectors, one column per program.
+    :type y0: np.array
+    :param var0: Particular solutions of the gap constraints.
+    :type var0: np.array
+    :param gap_direction: Unit normals of the gap constraints.
+    :type gap_direction: np.array
+    :param cone_layout: Layout of the cones, shared.
+    :type cone_layout: cqr.cones.ConeLayout
+    """
+
+    # same schedules as the single program engine
+    DIFFERENCE_INTERVAL = DouglasRachford.DIFFERENCE_INTERVAL
+    MAX_DIFFERENCE_INTERVAL = DouglasRachford.MAX_DIFFERENCE_INTERVAL
+    DIFFERENCE_TOLERANCE = DouglasRachford.DIFFERENCE_TOLERANCE
+    TERMINATION_INTERVAL = DouglasRachford.TERMINATION_INTERVAL
+
+    def __init__(
+            self, orthogonal, rank, b, y0, var0, gap_direction, cone_layout):
+        self.orthogonal = orthogonal
+        self.m = orthogonal.shape[0]
+        self.rank = rank
+        self.b = np.asfortranarray(b, dtype=float)
+        self.y0 = np.asfortranarray(y0, dtype=float)
+        self.var0 = np.asfortranarray(var0, dtype=float)
+        self.gap_direction = np.asfortranarray(gap_direction, dtype=float)
+        self.size = self.b.shape[1]
+        for array in [self.b, self.y0, self.var0, self.gap_direction]:
+            assert array.shape == (self.m, self.size)
+        self.cone_layout = cone_layout
+        assert cone_layout.size == self.m
+        self._exponential_cones = ExponentialCones(cone_layout.exp)
+
+        # programs still in the batch, as indexes of the initial columns
+        self.indexes = np.arange(self.size)
+        self.dr_y = np.zeros((2 * self.m, self.size), order='F')
+        self._last_step = np.zeros((2 * self.m, self.size), order='F')
+        self._allocate_buffers()
+
+        # per program, set when it leaves the batch
+        self.statuses = [None] * self.size
+        self.results = [None] * self.size
+        self.iterations = np.zeros(self.size, dtype=int)
+
+    def _allocate_buffers(self):
+        """Allocate work buffers for the programs in the batch."""
+        m, size = self.m, len(self.indexes)
+        self.pi = np.empty((2 * m, size), order='F')
+        self.reflected = np.empty((2 * m, size), order='F')
+        self.step = np.empty((2 * m, size), order='F')
+        self.norms = np.empty(size)
+
+        # products by Q^T and Q of the s and y parts are done together
+        self._work = np.empty((m, 2 * size), order='F')
+        self._transformed = np.empty((m, 2 * size), order='F')
+        self._var = np.empty((m, size), order='F')
+        self._dots = np.empty(size)
+
+    @classmethod
+    def from_solvers(cls, solvers):
+        """Build from the QR-transformed data of solvers of the batch.
+
+        :param solvers: Solvers, after the QR transformation of the gap,
+            that share the orthogonal factor.
+        :type solvers: list
+
+        :returns: Engine.
+        :rtype: BatchDouglasRachford
+        """
+        data = [DouglasRachford.data_from_solver(solver)
+                for solver in solvers]
+        for name in ['orthogonal', 'rank', 'cone_layout']:
+            for other in data[1:]:
+                assert other[name] is data[0][name] or \
+                    other[name] == data[0][name]
+        result = dict(data[0])
+        for name in ['b', 'y0', 'var0', 'gap_direction']:
+            result[name] = np.column_stack([other[name] for other in data])
+        return cls(**result)
+
+    def _second_order_project(self, z, pi):
+        """Project columns on all second-order cones, with no loop on them.
+
+        The squared tail norms are sums over the segments of the cones,
+        with their heads zeroed, see :class:`cqr.cones.SecondOrderCones`.
+        """
+        layout = self.cone_layout
+        starts = layout.soc_offsets
+        t = z[starts]
+        squares = z * z
+        squares[starts] = 0.
+        norms = np.sqrt(np.add.reduceat(squares, starts, axis=0))
+        inside = norms <= t
+        # zero in the polar cone, where norm <= -t
+        head = np.maximum((norms + t) / 2., 0.)
+        scale = np.where(
+            inside, 1., head / np.maximum(norms, np.finfo(float).tiny))
+        np.multiply(z, scale.take(layout.soc_ids, axis=0), out=pi)
+        pi[starts] = np.where(inside, t, head)
+
+    def _project(self, z, pi, dual):
+        """Project columns on the cone, or its dual."""
+        layout = self.cone_layout
+        zero, nonneg, soc = layout.zero_slice, layout.nonneg_slice, \
+            layout.soc_slice
+        pi[zero] = z[zero] if dual else 0.
+        np.maximum(z[nonneg], 0., out=pi[nonneg])
+        if layout.soc:
+            self._second_order_project(z[soc], pi[soc])
+        if layout.exp:
+            # rows of the cones of all columns, projected at once
+            count, columns = layout.exp, z.shape[1]
+            rows = z[layout.exp_slice].reshape(count, 3, columns).transpose(
+                0, 2, 1).reshape(-1, 3)
+            pi[layout.exp_slice] = self._exponential_cones.project_rows(
+                rows, dual=dual).reshape(count, columns, 3).transpose(
+                    0, 2, 1).reshape(-1, columns)
+
+    def cone_project(self, sy, pi, reflected):
+        """Project columns on the cone and reflect, ``reflected = 2 pi - sy``.
+
+        :param sy: Input, not modified.
+        :type sy: np.array
+        :param pi: Output, projection.
+        :type pi: np.array
+        :param reflected: Output, reflection.
+        :type reflected: np.array
+        """
+        m = self.m
+        self._project(sy[:m], pi[:m], dual=False)
+        self._project(sy[m:], pi[m:], dual=True)
+        np.multiply(pi, 2., out=reflected)
+        reflected -= sy
+
+    def linspace_project(self, sy, out):
+        """Project columns on the affine subspaces.
+
+        :param sy: Input, not modified.
+        :type sy: np.array
+        :param out: Output, can not be the input.
+        :type out: np.array
+        """
+        m, rank, size = self.m, self.rank, len(self.indexes)
+        work, transformed, var = self._work, self._transformed, self._var
+
+        # var = [Q_1^T (b - s); Q_2^T (y - y0)] - var0
+        np.subtract(self.b, sy[:m], out=work[:, :size])
+        np.subtract(sy[m:], self.y0, out=work[:, size:])
+        self.orthogonal.rmatmat_to(work, transformed)
+        var[:rank] = transformed[:rank, :size]
+        var[rank:] = transformed[rank:, size:]
+        var -= self.var0
+
+        # project on gap constraints
+        np.einsum('ij,ij->j', self.gap_direction, var, out=self._dots)
+        np.multiply(self.gap_direction, self._dots, out=work[:, :size])
+        var -= work[:, :size]
+        var += self.var0
+
+        # s = b - Q_1 x, y = y0 + Q_2 z
+        work[:rank, :size] = var[:rank]
+        work[rank:, :size] = 0.
+        work[:rank, size:] = 0.
+        work[rank:, size:] = var[rank:]
+        self.orthogonal.matmat_to(work, transformed)
+        np.subtract(self.b, transformed[:, :size], out=out[:m])
+        np.add(self.y0, transformed[:, size:], out=out[m:])
+
+    def compute_step(self):
+        """Compute the steps from ``dr_y`` into ``step``.
+
+        :returns: Norms of the steps, of the programs in the batch.
+        :rtype: np.array
+        """
+        self.cone_project(self.dr_y, self.pi, self.reflected)
+        self.linspace_project(self.reflected, self.step)
+        self.step -= self.pi
+        np.einsum('ij,ij->j', self.step, self.step, out=self.norms)
+        return np.sqrt(self.norms, out=self.norms)
+
+    def iterate(self):
+        """One iteration of the programs in the batch.
+
+        :returns: Norms of the steps.
+        :rtype: np.array
+        """
+        self.compute_step()
+        self.dr_y += self.step
+        return self.norms
+
+    def difference_converged(self):
+        """Check which steps converged since the last call.
+
+        :returns: Mask of the programs in the batch whose change of the step
+            relative to its norm is below ``DIFFERENCE_TOLERANCE``.
+        :rtype: np.array
+        """
+        change = self._last_step
+        change -= self.step
+        change_norms = np.sqrt(np.einsum('ij,ij->j', change, change))
+        change[:] = self.step
+        return change_norms <= self.DIFFERENCE_TOLERANCE * np.sqrt(
+            np.einsum('ij,ij->j', self.step, self.step))
+
+    def _leave(self, mask, status, iterations):
+        """Programs in the mask leave the batch, with status.
+
+        :param mask: Mask of the programs in the batch.
+        :type mask: np.array
+        :param status: Status.
+        :type status: str
+        :param iterations: Number of iterations.
+        :type iterations: int
+        """
+        if not np.any(mask):
+            return
+        for column in np.flatnonzero(mask):
+            index = self.indexes[column]
+            self.statuses[index] = status
+            self.results[index] = self.dr_y[:, column].copy()
+            self.iterations[index] = iterations
+        keep = ~mask
+        self.indexes = self.indexes[keep]
+        for name in [
+                'b', 'y0', 'var0', 'gap_direction', 'dr_y', '_last_step']:
+            setattr(
+                self, name, np.asfortranarray(getattr(self, name)[:, keep]))
+        step = np.asfortranarray(self.step[:, keep])
+        self._allocate_buffers()
+        self.step[:] = step
+        self.norms[:] = np.sqrt(np.einsum('ij,ij->j', step, step))
+
+    def solve(
+            self, dr_y, max_iter, eps, relaxation=1., time_limit=None,
+            check=None, certificate=None):
+        """Run the iteration, as :meth:`DouglasRachford.solve` per program.
+
+        :param dr_y: Initial points, one column per program, copied.
+        :type dr_y: np.array
+        :param max_iter: Maximum number of iterations.
+        :type max_iter: int
+        :param eps: Convergence tolerance on the norms of the steps.
+        :type eps: float
+        :param relaxation: Relaxation of the step, in ``(0, 2)``. Default 1,
+            no relaxation.
+        :type relaxation: float
+        :param time_limit: Wall-clock time limit in seconds. Default None, no
+            limit.
+        :type time_limit: float or None
+        :param check: Termination check, called with the index of a program
+            and its iterate every ``TERMINATION_INTERVAL`` iterations; the
+            program leaves the batch if it returns True. Default None.
+        :type check: callable or None
+        :param certificate: Certificate check, called with the index of a
+            program and its converged step; the program leaves the batch if
+            it returns True. Default None.
+        :type certificate: callable or None
+
+        :returns: Status of each program, as those of
+            :meth:`DouglasRachford.solve`. The last iterates are in
+            ``results`` and the numbers of iterations in ``iterations``.
+        :rtype: list
+        """
+        assert 0. < relaxation < 2.
+        deadline = None if time_limit is None else \
+            time.perf_counter() + time_limit
+        self.dr_y[:] = dr_y
+        self._last_step[:] = 0.
+        self.compute_step()
+        self.step *= relaxation
+        difference_interval = self.DIFFERENCE_INTERVAL
+        next_difference_test = difference_interval
+
+        for i in range(max_iter):
+            self._leave(self.norms < eps, 'converged', i)
+            if len(self.indexes) == 0:
+                return self.statuses
+            if deadline is not None and time.perf_counter() > deadline:
+                self._leave(np.ones(len(self.indexes), bool), 'time_limit', i)
+                return self.statuses
+            if check is not None and i % self.TERMINATION_INTERVAL == \
+                    self.TERMINATION_INTERVAL - 1:
+                self._leave(np.array(
+                    [check(index, self.dr_y[:, column]) for column, index
+                     in enumerate(self.indexes)], dtype=bool),
+                    'tolerance', i)
+                if len(self.indexes) == 0:
+                    return self.statuses
+            self.dr_y += self.step
+            self.compute_step()
+            self.step *= relaxation
+            if certificate is not None and i + 1 == next_difference_test:
+                converged = self.difference_converged()
+                if np.any(converged):
+                    found = np.zeros(len(self.indexes), dtype=bool)
+                    for column in np.flatnonzero(converged):
+                        found[column] = certificate(
+                            self.indexes[column], self.step[:, column])
+                    self._leave(found, 'certificate', i + 1)
+                    if len(self.indexes) == 0:
+                        return self.statuses
+                    difference_interval = min(
+                        2 * difference_interval, self.MAX_DIFFERENCE_INTERVAL)
+                next_difference_test += difference_interval
+        self._leave(np.ones(len(self.indexes), bool), 'max_iter', max_iter)
+        return self.statuses
+
+
+class _BatchInstance(Solver):
+    """Solver of one program of the batch, only set up at construction."""
+
+    def _solve(self):
+        """Transform program vectors, the iteration is done by the batch."""
+        self.iterate_in_batch = self._transform_program()
+        if not self.iterate_in_batch:
+            self._finalize()
+
+
+def solve_batch(
+        matrix, b, c, zero, nonneg, soc=(), exp=0, qr='PYSPQR', verbose=True,
+        factorization_cache=None, relaxation=1., eps_abs=0., eps_rel=0.,
+        eps_infeas=1e-8, max_iter=100000, time_limit=None):
+    """Solve programs that share matrix and cones, iterating on the batch.
+
+    The equilibration of the matrix is computed with the first ``b`` and
+    ``c``, and reused, as with a :class:`cqr.FactorizationCache`. Options are
+    as those of :class:`cqr.Solver`; Anderson acceleration, adaptive
+    relaxation and the Halpern variants are not available in batch.
+
+    :param matrix: Program matrix, shared.
+    :type matrix: scipy.sparse.csc_matrix
+    :param b: Right-hand sides, one row per program.
+    :type b: np.array
+    :param c: Costs, one row per program.
+    :type c: np.array
+    :param zero: Size of the zero cone.
+    :type zero: int
+    :param nonneg: Size of the non-negative cone.
+    :type nonneg: int
+    :param soc: Sizes of the second-order cones.
+    :type soc: list or tuple
+    :param exp: Number of exponential cones, see
+        :class:`cqr.cones.ExponentialCones`. Default 0.
+    :type exp: int
+    :param qr: QR backend, as in :class:`cqr.Solver`.
+    :type qr: str
+    :param verbose: Whether to print information.
+    :type verbose: bool
+    :param factorization_cache: Cache of factorizations; default None, a new
+        one is used for the batch.
+    :type factorization_cache: cqr.factorization_cache.FactorizationCache or
+        None
+    :param relaxation: Relaxation of the step, in ``(0, 2)``. Default 1.
+    :type relaxation: float
+    :param eps_abs: Absolute tolerance of the residuals. Default 0.
+    :type eps_abs: float
+    :param eps_rel: Relative tolerance of the residuals. Default 0.
+    :type eps_rel: float
+    :param eps_infeas: Tolerance of the certificates. Default 1e-8.
+    :type eps_infeas: float
+    :param max_iter: Maximum number of iterations. Default 100000.
+    :type max_iter: int
+    :param time_limit: Wall-clock time limit in seconds, for the whole batch.
+        Default None, no limit.
+    :type time_limit: float or None
+
+    :returns: Solver of each program, with its ``x``, ``y``, ``status`` and
+        ``statistics``.
+    :rtype: list
+    """
+    start = time.perf_counter()
+    b = np.atleast_2d(b)
+    c = np.atleast_2d(c)
+    assert len(b) == len(c)
+    if factorization_cache is None:
+        factorization_cache = FactorizationCache(max_entries=1)
+    solvers = [_BatchInstance(
+        matrix, b_i, c_i, zero=zero, nonneg=nonneg, soc=soc, exp=exp, qr=qr,
+        verbose=verbose, factorization_cache=factorization_cache,
+        relaxation=relaxation, eps_abs=eps_abs, eps_rel=eps_rel,
+        eps_infeas=eps_infeas, max_iter=max_iter, time_limit=time_limit)
+        for b_i, c_i in zip(b, c)]
+
+    batch = [solver for solver in solvers if solver.iterate_in_batch]
+    if len(batch) == 0:
+        return solvers
+    engine = BatchDouglasRachford.from_solvers(batch)
+    for solver in batch:
+        solver._best_iterate = None
+    statuses = engine.solve(
+        np.column_stack([solver._sy_from_var_reduced(solver.var_reduced)
+                         for solver in batch]),
+        max_iter=max_iter, eps=1e-12, relaxation=relaxation,
+        time_limit=None if time_limit is None else max(
+            time_limit - (time.perf_counter() - start), 0.),
+        check=lambda index, sy: batch[index]._check_termination(sy),
+        certificate=lambda index, step: batch[index]._check_certificate(
+            step))
+
+    for index, solver in enumerate(batch):
+        solver.statistics['iterations'] = int(engine.iterations[index])
+        solver.statistics['relaxation'] = relaxation
+        solver.statistics['termination'] = statuses[index]
+        solver.statistics['batch_size'] = len(batch)
+        solver._iterate_and_invert(
+            lambda solver=solver, index=index:
+            solver._douglas_rachford_outcome(
+                statuses[index], engine.results[index],
+                engine.iterations[index]))
+        solver._finalize()
+    return solvers
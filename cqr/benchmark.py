@@ -0,0 +1,543 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""Benchmarks, run with ``python -m cqr.benchmark``.
+
+Programs are built with the generators of :mod:`cqr.programs`, which are
+also used in the unit tests; CVXPY is not needed.
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import scipy as sp
+
+from .batch import BatchDouglasRachford
+from .cones import (
+    ConeLayout, ExponentialCones, ScaledSecondOrderCones, SecondOrderCones)
+from .douglas_rachford import DouglasRachford
+from .equilibrate import hsde_ruiz_equilibration
+from .factorization_cache import FactorizationCache
+from .factorization_store import load_factorization, save_factorization
+from .factors import (
+    AppendedRowsQ, DeletedRowQ, DenseHouseholderQ, TSQRHouseholderQ)
+from .fused_step import NUMBA_AVAILABLE
+from .programs import (
+    feasible_linear_program, feasible_program, l1_regression_program,
+    l1_regularized_regression_program, portfolio_program)
+from .solver import Solver, sparse_qr
+
+
+def _timeit(function, repeat):
+    """Average wall-clock time of a function call, and its last result."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def _program_matrix(program):
+    """Equilibrated matrix of a program of :mod:`cqr.programs`."""
+    matrix, b, c, zero, nonneg, soc = program
+    return hsde_ruiz_equilibration(
+        matrix, b, c, dimensions={
+            'zero': zero, 'nonneg': nonneg, 'second_order': soc},
+        max_iters=5, l_norm=2, eps_cols=1e-12, eps_rows=1e-12)[4]
+
+
+def benchmark_column_ordering_reuse(repeat=5):
+    """Sparse QR setup time, with and without reuse of column ordering.
+
+    Matrix values are perturbed at each re-solve, as in rolling
+    re-estimation, keeping the sparsity pattern.
+    """
+    print('\nSPARSE QR SETUP, REUSING COLUMN ORDERING')
+    print(f'{"program":>30} {"m":>6} {"n":>6} {"nnz":>8}'
+          f' {"AMD (s)":>10} {"reuse (s)":>10} {"saved":>7}')
+    programs = {
+        'l1 regression m=400 n=300': l1_regression_program(
+            seed=0, m=400, n=300),
+        'l1 regression m=2000 n=100': l1_regularized_regression_program(
+            seed=0, m=2000, n=100),
+        'portfolio n=200': portfolio_program(seed=0, n=200),
+    }
+    for name, program in programs.items():
+        matrix = _program_matrix(program)
+        np.random.seed(0)
+        perturbed = [matrix.copy() for _ in range(repeat)]
+        for el in perturbed:
+            el.data *= 1. + 0.01 * np.random.randn(el.nnz)
+        ordering = sparse_qr(matrix)[2].permutation
+
+        time_amd, _ = _timeit(
+            lambda: [sparse_qr(el) for el in perturbed], 1)
+        time_reuse, _ = _timeit(
+            lambda: [sparse_qr(el, ordering) for el in perturbed], 1)
+        time_amd /= repeat
+        time_reuse /= repeat
+        print(f'{name:>30} {matrix.shape[0]:>6} {matrix.shape[1]:>6}'
+              f' {matrix.nnz:>8} {time_amd:>10.4f} {time_reuse:>10.4f}'
+              f' {1 - time_reuse/time_amd:>7.1%}')
+
+
+def benchmark_dense_qr(repeat=3):
+    """Dense QR with complete Q against Householder form.
+
+    Reports setup time, memory of the orthogonal factor, and time to
+    multiply by the transpose of the null-space block.
+    """
+    print('\nDENSE QR, COMPLETE Q AGAINST HOUSEHOLDER FORM')
+    print(f'{"m":>6} {"n":>6} {"complete (s)":>13} {"(MB)":>8}'
+          f' {"householder (s)":>16} {"(MB)":>8}'
+          f' {"Q2^T y (ms)":>12} {"implicit (ms)":>14}')
+    np.random.seed(0)
+    for m, n in [(2000, 1000), (4000, 500)]:
+        matrix = np.random.randn(m, n)
+        vector = np.random.randn(m)
+        time_complete, (q, _) = _timeit(
+            lambda: np.linalg.qr(matrix, mode='complete'), repeat)
+        time_householder, (q_implicit, _) = _timeit(
+            lambda: DenseHouseholderQ.from_matrix(matrix), repeat)
+        nullspace = q[:, n:]
+        nullspace_implicit = q_implicit.column_block(n, m)
+        time_apply, _ = _timeit(lambda: nullspace.T @ vector, 10 * repeat)
+        time_apply_implicit, _ = _timeit(
+            lambda: nullspace_implicit.T @ vector, 10 * repeat)
+        print(f'{m:>6} {n:>6} {time_complete:>13.4f} {q.nbytes/2**20:>8.1f}'
+              f' {time_householder:>16.4f} {q_implicit.nbytes/2**20:>8.1f}'
+              f' {1000*time_apply:>12.3f} {1000*time_apply_implicit:>14.3f}')
+
+
+def benchmark_tsqr(repeat=3):
+    """Tall-skinny QR setup time against number of threads."""
+    print('\nTALL-SKINNY QR, SCALING WITH THREADS')
+    print(f'{"m":>7} {"n":>5} {"dense (s)":>10} {"threads":>8}'
+          f' {"TSQR (s)":>9} {"speedup":>8}')
+    np.random.seed(0)
+    workers = sorted({1, 2, 4, os.cpu_count()})
+    for m, n in [(100000, 100), (20000, 400)]:
+        matrix = np.random.randn(m, n)
+        time_dense, _ = _timeit(
+            lambda: DenseHouseholderQ.from_matrix(matrix), repeat)
+        for threads in workers:
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                time_tsqr, _ = _timeit(
+                    lambda: TSQRHouseholderQ.from_matrix(
+                        matrix, blocks=threads, map_function=executor.map),
+                    repeat)
+            print(f'{m:>7} {n:>5} {time_dense:>10.4f} {threads:>8}'
+                  f' {time_tsqr:>9.4f} {time_dense/time_tsqr:>8.2f}')
+
+
+def benchmark_row_updates(repeat=3):
+    """QR update after adding or deleting rows, against factorizing again."""
+    print('\nQR UPDATES OF ROWS, AGAINST FACTORIZING AGAIN')
+    print(f'{"m":>6} {"n":>5} {"refactor (s)":>13} {"add 5 (s)":>10}'
+          f' {"delete 1 (s)":>13}')
+    np.random.seed(0)
+    for m, n in [(4000, 400), (2000, 1000)]:
+        matrix = np.random.randn(m, n)
+        rows = np.random.randn(5, n)
+        time_refactor, (q, r) = _timeit(
+            lambda: DenseHouseholderQ.from_matrix(matrix), repeat)
+        time_add, _ = _timeit(
+            lambda: AppendedRowsQ.from_update(q, r, rows, m // 2), repeat)
+        time_delete, _ = _timeit(
+            lambda: DeletedRowQ.from_update(q, r, m // 2), repeat)
+        print(f'{m:>6} {n:>5} {time_refactor:>13.4f} {time_add:>10.4f}'
+              f' {time_delete:>13.4f}')
+
+
+def benchmark_factorization_store(repeat=3):
+    """Loading a stored dense QR, against factorizing again."""
+    print('\nFACTORIZATION STORE, LOADING AGAINST FACTORIZING AGAIN')
+    print(f'{"m":>6} {"n":>5} {"factor (s)":>11} {"save (s)":>9}'
+          f' {"load (s)":>9} {"MB":>7}')
+    np.random.seed(0)
+    for m, n in [(4000, 400), (20000, 1000)]:
+        matrix = np.random.randn(m, n)
+        time_factor, (q, r) = _timeit(
+            lambda: DenseHouseholderQ.from_matrix(matrix), repeat)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'qr.cqr')
+            time_save, _ = _timeit(
+                lambda: save_factorization(path, {'q': q, 'r': r}), repeat)
+            # includes one product, which reads all the pages
+            time_load, _ = _timeit(
+                lambda: load_factorization(path)[1]['q'] @ matrix[:, 0],
+                repeat)
+            size = os.path.getsize(path) / 2**20
+        print(f'{m:>6} {n:>5} {time_factor:>11.4f} {time_save:>9.4f}'
+              f' {time_load:>9.4f} {size:>7.1f}')
+
+
+class _SetupOnly(Solver):
+    """Solver that stops after the transformations of the program data."""
+
+    def new_toy_douglas_rachford_solve(self, eps=0.):
+        """Skip the iterations."""
+
+
+def benchmark_douglas_rachford(iterations=100):
+    """Time per iteration of the engine, against allocating in the loop."""
+    print('\nDOUGLAS-RACHFORD ITERATION, PREALLOCATED AGAINST ALLOCATING')
+    print(f'{"m":>7} {"n":>5} {"QR":>7} {"allocating (s)":>15}'
+          f' {"preallocated (s)":>17} {"speedup":>8}')
+    for m, n, qr in [
+            (20000, 20, 'PYSPQR'), (1000000, 20, 'PYSPQR'),
+            (20000, 200, 'NUMPY')]:
+        matrix, b, c, zero, nonneg, soc = feasible_program(
+            m, n, zero=m // 10, soc=(5,) * 10, seed=0)
+        solver = _SetupOnly(
+            matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, qr=qr,
+            verbose=False)
+        engine = DouglasRachford.from_solver(solver)
+        dr_y = np.random.randn(2 * m)
+        engine.dr_y[:] = dr_y
+
+        def allocating():
+            nonlocal dr_y
+            dr_y = np.copy(dr_y + solver.douglas_rachford_step(dr_y))
+
+        time_allocating, _ = _timeit(allocating, iterations)
+        time_engine, _ = _timeit(engine.iterate, iterations)
+        print(f'{m:>7} {n:>5} {qr:>7} {time_allocating:>15.2e}'
+              f' {time_engine:>17.2e} {time_allocating/time_engine:>8.2f}')
+
+
+def benchmark_fused_step(iterations=200):
+    """Time per iteration with dense QR, NumPy calls against fused step."""
+    print('\nDOUGLAS-RACHFORD ITERATION, DENSE QR, NUMPY AGAINST FUSED')
+    if not NUMBA_AVAILABLE:
+        print('Numba is not installed, skipping.')
+        return
+    print(f'{"m":>7} {"n":>5} {"NumPy (s)":>10} {"fused (s)":>10}'
+          f' {"speedup":>8}')
+    for m, n in [
+            (100, 20), (500, 50), (2000, 100), (10000, 100), (20000, 200)]:
+        matrix, b, c, zero, nonneg, soc = feasible_program(
+            m, n, zero=m // 10, soc=(5,) * (m // 50), seed=0)
+        solver = _SetupOnly(
+            matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, qr='NUMPY',
+            verbose=False)
+        times = []
+        for fused in [False, True]:
+            engine = DouglasRachford.from_solver(solver, fused=fused)
+            engine.dr_y[:] = np.random.randn(2 * m)
+            engine.iterate()  # compile
+            times.append(_timeit(engine.iterate, iterations)[0])
+        print(f'{m:>7} {n:>5} {times[0]:>10.2e} {times[1]:>10.2e}'
+              f' {times[0]/times[1]:>8.2f}')
+
+
+def benchmark_batch(size=100, iterations=10):
+    """Time per iteration of a batch, against one engine per program."""
+    print('\nDOUGLAS-RACHFORD ITERATION, ONE ENGINE PER PROGRAM AGAINST BATCH')
+    print(f'{"m":>7} {"n":>5} {"QR":>7} {"programs":>8} {"single (s)":>11}'
+          f' {"batch (s)":>10} {"speedup":>8}')
+    for m, n, qr in [
+            (2000, 100, 'NUMPY'), (10000, 100, 'NUMPY'),
+            (20000, 200, 'NUMPY'), (20000, 20, 'PYSPQR')]:
+        matrix, b, c, zero, nonneg, soc = feasible_program(
+            m, n, zero=m // 10, soc=(5,) * (m // 50), seed=0)
+        cache = FactorizationCache()
+        solvers = [_SetupOnly(
+            matrix, b + np.random.randn(m), c + np.random.randn(n),
+            zero=zero, nonneg=nonneg, soc=soc, qr=qr, verbose=False,
+            factorization_cache=cache) for _ in range(size)]
+        engines = [DouglasRachford.from_solver(solver) for solver in solvers]
+        batch = BatchDouglasRachford.from_solvers(solvers)
+        batch.dr_y[:] = np.random.randn(2 * m, size)
+        for column, engine in enumerate(engines):
+            engine.dr_y[:] = batch.dr_y[:, column]
+            engine.iterate()  # compile, if fused
+
+        def single():
+            for engine in engines:
+                engine.iterate()
+
+        time_single, _ = _timeit(single, iterations)
+        time_batch, _ = _timeit(batch.iterate, iterations)
+        print(f'{m:>7} {n:>5} {qr:>7} {size:>8} {time_single:>11.2e}'
+              f' {time_batch:>10.2e} {time_single/time_batch:>8.2f}')
+
+
+def benchmark_second_order_projection(repeat=3):
+    """Time of projections on many second-order cones of different sizes."""
+    print('\nSECOND-ORDER CONE PROJECTION, LOOP AGAINST VECTORIZED')
+    print(f'{"cones":>8} {"sizes":>7} {"loop (s)":>9} {"grouped (s)":>12}'
+          f' {"segmented (s)":>14} {"speedup":>8}')
+    np.random.seed(0)
+    for count in [10**3, 10**4, 10**5, 10**6]:
+        for low, high in [(3, 3), (2, 50)]:
+            sizes = np.random.randint(low, high + 1, size=count)
+            z = np.random.randn(np.sum(sizes))
+            pi, reflected = np.empty_like(z), np.empty_like(z)
+
+            def loop():
+                cur = 0
+                for size in sizes:
+                    Solver.new_second_order_project(
+                        z[cur:cur+size], pi[cur:cur+size],
+                        reflected[cur:cur+size])
+                    cur += size
+
+            times = [_timeit(loop, 1)[0]]
+            for method in ['GROUPED', 'SEGMENTED']:
+                cones = SecondOrderCones(
+                    ConeLayout(0, 0, sizes), method=method)
+                times.append(_timeit(
+                    lambda: cones.project(z, pi, reflected), repeat)[0])
+            print(f'{count:>8} {f"{low}-{high}":>7} {times[0]:>9.2e}'
+                  f' {times[1]:>12.2e} {times[2]:>14.2e}'
+                  f' {times[0]/min(times[1:]):>8.1f}')
+
+
+def _root_scalar_scaled_projection(x, a):
+    """Projection on a scaled second-order cone, one root-finding per cone.
+
+    This is the previous prototype, with ``scipy.optimize.root_scalar``
+    on the multiplier ``mu``, for reference.
+    """
+    t, y = x[0], x[1:]
+    if t >= np.linalg.norm(y * a):
+        return np.copy(x)
+    if -t >= np.linalg.norm(y / a):
+        return np.zeros_like(x)
+
+    def loss(mu):
+        # the bracket includes the pole of s at -1/2
+        with np.errstate(divide='ignore'):
+            return (t / (1 + 2 * mu))**2 - np.sum(
+                (y / (1 - 2 * mu * a**2) * a)**2)
+
+    if t > 0:
+        bracket = (-.5, 0.)
+    else:
+        low = -1.
+        while loss(low) >= 0:
+            low *= 2.
+        bracket = (low, -.5)
+    mu = sp.optimize.root_scalar(
+        loss, bracket=bracket, xtol=np.finfo(float).eps,
+        rtol=4*np.finfo(float).eps).root
+    return np.concatenate([[t / (1 + 2 * mu)], y / (1 - 2 * mu * a**2)])
+
+
+def benchmark_scaled_second_order_projection(repeat=3):
+    """Time of projections on many scaled second-order cones."""
+    print('\nSCALED SECOND-ORDER CONE PROJECTION, ROOT_SCALAR AGAINST NEWTON')
+    print(f'{"cones":>8} {"loop (s)":>9} {"cold (s)":>9} {"steps":>6}'
+          f' {"warm (s)":>9} {"steps":>6} {"speedup":>8}')
+    np.random.seed(0)
+    for count in [10**2, 10**3, 10**4, 10**5]:
+        sizes = np.random.randint(2, 21, size=count)
+        heads = np.cumsum(sizes) - sizes
+        scaling = np.random.uniform(1e-2, 1e2, np.sum(sizes) - count)
+        z = np.random.randn(np.sum(sizes))
+        # next iterate, as in Douglas-Rachford close to convergence
+        z_next = z + 1e-4 * np.random.randn(len(z))
+        pi = np.empty_like(z)
+
+        def loop():
+            for i, (head, size) in enumerate(zip(heads, sizes)):
+                pi[head:head+size] = _root_scalar_scaled_projection(
+                    z[head:head+size], scaling[head-i:head-i+size-1])
+
+        time_loop = _timeit(loop, 1)[0]
+
+        def cold():
+            cones = ScaledSecondOrderCones(sizes, scaling)
+            cones.project(z, pi)
+            return cones
+
+        time_cold, cones = _timeit(cold, repeat)
+        cold_steps, cold_mu = cones.iterations, np.copy(cones.mu)
+
+        def warm():
+            cones.mu[:] = cold_mu
+            cones.project(z_next, pi)
+
+        time_warm, _ = _timeit(warm, repeat)
+        print(f'{count:>8} {time_loop:>9.2e} {time_cold:>9.2e}'
+              f' {cold_steps:>6} {time_warm:>9.2e} {cones.iterations:>6}'
+              f' {time_loop/time_warm:>8.1f}')
+
+
+def _root_scalar_exponential_projection(v):
+    """Projection on an exponential cone, one root-finding per cone.
+
+    Same formulation as :class:`cqr.cones.ExponentialCones`, with
+    ``scipy.optimize.root_scalar`` on ``rho``, for reference.
+    """
+    x, y, z = v
+    if (y > 0 and y * np.exp(x / y) <= z) or (
+            y == 0 and x <= 0 and z >= 0):
+        return np.copy(v)
+    if (x > 0 and x * np.exp(y / x) <= -np.e * z) or (
+            x == 0 and y <= 0 and z <= 0):
+        return np.zeros(3)
+    if x <= 0 and y <= 0:
+        return np.array([x, 0., max(z, 0.)])
+
+    def multipliers(rho):
+        return np.array([(rho - 1.) * x + y, x - rho * y]) / (
+            rho * rho - rho + 1.)
+
+    def scaled(rho):
+        alpha, beta = multipliers(rho)
+        return alpha * np.exp(rho - abs(rho)) - beta * np.exp(
+            -rho - abs(rho)) - z * np.exp(-abs(rho))
+
+    low = 1. - y / x if x > 0 else x / y - 1.
+    high = x / y if y > 0 else low + 1.
+    while scaled(low) > 0:
+        low -= 2. * (high - low)
+    while scaled(high) < 0:
+        high += 2. * (high - low)
+    rho = sp.optimize.root_scalar(
+        scaled, bracket=(low, high), xtol=np.finfo(float).eps,
+        rtol=4*np.finfo(float).eps).root
+    alpha, beta = multipliers(rho)
+    if rho <= 0:
+        return alpha * np.array([rho, 1., np.exp(rho)])
+    return v - beta * np.array([1., 1. - rho, -np.exp(-rho)])
+
+
+def benchmark_exponential_projection(repeat=3):
+    """Time of projections on many exponential cones, and of Jacobians."""
+    print('\nEXPONENTIAL CONE PROJECTION, ROOT_SCALAR AGAINST BATCHED NEWTON')
+    print(f'{"cones":>8} {"loop (s)":>9} {"batch (s)":>9} {"steps":>6}'
+          f' {"speedup":>8} {"error":>9} {"jacobian (s)":>12}')
+    np.random.seed(0)
+    for count in [10**3, 10**4, 10**5]:
+        v = np.random.randn(count, 3)
+        cones = ExponentialCones(count)
+        # the loop is slow, it is timed once
+        time_loop, reference = _timeit(lambda: np.array([
+            _root_scalar_exponential_projection(row) for row in v]), 1)
+        time_batch, pi = _timeit(lambda: cones.project_rows(v), repeat)
+        time_jacobian, _ = _timeit(
+            lambda: cones.derivative(v.ravel()), repeat)
+        error = np.max(np.abs(pi - reference))
+        print(f'{count:>8} {time_loop:>9.2e} {time_batch:>9.2e}'
+              f' {cones.iterations:>6} {time_loop/time_batch:>8.1f}'
+              f' {error:>9.1e} {time_jacobian:>12.2e}')
+
+
+def _iteration_programs():
+    """LPs, l1 problems and SOC portfolio problems."""
+    programs = []
+    for seed in range(3):
+        np.random.seed(seed)
+        matrix = sp.sparse.csc_matrix(np.random.randn(60, 20))
+        programs.append(('lp', feasible_linear_program(matrix, 5, seed)))
+        programs.append(('l1', l1_regularized_regression_program(seed)))
+        programs.append(('portfolio', portfolio_program(seed, n=20)))
+    return programs
+
+
+def _benchmark_iterations(settings, max_iter):
+    """Iterations to converge of the engine with each keyword arguments."""
+    for name, (matrix, b, c, zero, nonneg, soc) in _iteration_programs():
+        with contextlib.redirect_stdout(io.StringIO()):
+            solver = _SetupOnly(
+                matrix, b, c, zero=zero, nonneg=nonneg, soc=soc,
+                verbose=False)
+        engine = DouglasRachford.from_solver(solver)
+        dr_y = solver._sy_from_var_reduced(solver.var_reduced)
+        results = []
+        for kwargs in settings.values():
+            status = engine.solve(dr_y, max_iter=max_iter, eps=1e-12, **kwargs)
+            results.append(
+                engine.iterations if status == 'converged' else '-')
+        print(f'{name:>10} {matrix.shape[0]:>5} {matrix.shape[1]:>5}'
+              + ''.join(f' {result:>9}' for result in results))
+
+
+def benchmark_relaxation(max_iter=100000):
+    """Iterations to converge with fixed and adaptive relaxation."""
+    print('\nDOUGLAS-RACHFORD ITERATIONS, FIXED AND ADAPTIVE RELAXATION')
+    settings = {
+        str(relaxation): {'relaxation': relaxation}
+        for relaxation in [1., 1.5, 1.8]}
+    settings['adaptive'] = {'adaptive_relaxation': True}
+    print(f'{"program":>10} {"m":>5} {"n":>5}' + ''.join(
+        f' {name:>9}' for name in settings))
+    _benchmark_iterations(settings, max_iter)
+
+
+def benchmark_halpern(max_iter=100000):
+    """Iterations to converge of plain, Halpern and restarted Halpern."""
+    print('\nDOUGLAS-RACHFORD ITERATIONS, PLAIN, HALPERN AND RESTARTED')
+    settings = {
+        'DR': {'algorithm': 'DR'}, 'Halpern': {'algorithm': 'HALPERN'},
+        'restarted': {'algorithm': 'RESTARTED_HALPERN'}}
+    print(f'{"program":>10} {"m":>5} {"n":>5}' + ''.join(
+        f' {name:>9}' for name in settings))
+    _benchmark_iterations(settings, max_iter)
+
+
+def benchmark_mixed_precision():
+    """Solve time in double and mixed precision, with the two phases."""
+    print('\nDOUGLAS-RACHFORD, DENSE QR, DOUBLE AGAINST MIXED PRECISION')
+    print(f'{"m":>7} {"n":>5} {"double (s)":>10} {"iters":>6}'
+          f' {"mixed (s)":>10} {"single":>6} {"(s)":>9} {"(MB)":>6}'
+          f' {"double":>6} {"(s)":>9} {"(MB)":>6} {"speedup":>8}')
+    for m, n in [(2000, 100), (10000, 100), (20000, 200)]:
+        matrix, b, c, zero, nonneg, soc = feasible_program(
+            m, n, zero=m // 10, soc=(5,) * (m // 50), seed=0)
+        times, results = [], []
+        for mixed_precision in [False, True]:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                solver = Solver(
+                    matrix, b, c, zero=zero, nonneg=nonneg, soc=soc,
+                    qr='NUMPY', verbose=False,
+                    mixed_precision=mixed_precision)
+            times.append(time.perf_counter() - start)
+            assert solver.status == 'Optimal'
+            results.append(solver.statistics)
+        double, mixed = results
+        print(f'{m:>7} {n:>5} {times[0]:>10.2e} {double["iterations"]:>6}'
+              f' {times[1]:>10.2e} {mixed["single_iterations"]:>6}'
+              f' {mixed["single_seconds"]:>9.2e}'
+              f' {mixed["single_bytes"]/2**20:>6.1f}'
+              f' {mixed["double_iterations"]:>6}'
+              f' {mixed["double_seconds"]:>9.2e}'
+              f' {mixed["double_bytes"]/2**20:>6.1f}'
+              f' {times[0]/times[1]:>8.2f}')
+
+
+if __name__ == '__main__':  # pragma: no cover
+    benchmark_column_ordering_reuse()
+    benchmark_dense_qr()
+    benchmark_tsqr()
+    benchmark_row_updates()
+    benchmark_factorization_store()
+    benchmark_douglas_rachford()
+    benchmark_fused_step()
+    benchmark_batch()
+    benchmark_second_order_projection()
+    benchmark_scaled_second_order_projection()
+    benchmark_exponential_projection()
+    benchmark_relaxation()
+    benchmark_halpern()
+    benchmark_mixed_precision()
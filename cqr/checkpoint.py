@@ -0,0 +1,140 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""Checkpoints of the Douglas-Rachford iteration, to resume long solves.
+
+A checkpoint is a NumPy ``.npz`` file with the iterate ``sy = [s; y]``, the
+number of iterations done, the relaxation, the phase of the iteration,
+``'single'`` or ``'double'`` precision, see the ``mixed_precision`` option
+of :class:`cqr.Solver`, and, if the iteration is accelerated, the history
+of :class:`cqr.anderson.AndersonAcceleration`, whose arrays are prefixed by
+``anderson_``. The iterate is always stored in double precision. It is
+written to a temporary file in the same directory, which then replaces the
+old checkpoint, so a process killed while writing leaves the previous one
+intact.
+
+The iterate is in the space of the equilibrated program, so it is valid
+for another process only if the program and its equilibration are the same.
+Those are identified by :func:`program_fingerprint`; the QR factor doesn't
+enter, so the solve can be resumed with another QR backend, or with the
+factorization loaded from a cache.
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from .factorization_cache import fingerprint
+
+FORMAT_VERSION = 2
+
+_ANDERSON_PREFIX = 'anderson_'
+
+PHASES = ('single', 'double')
+
+
+def program_fingerprint(solver):
+    """Fingerprint of program data, cones and equilibration of a solver.
+
+    :param solver: Solver, after the equilibration.
+    :type solver: cqr.Solver
+
+    :returns: Hexadecimal digest.
+    :rtype: str
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(fingerprint(
+        solver.matrix, solver.zero, solver.nonneg, solver.soc, None,
+        solver.exp).encode())
+    hasher.update(repr(
+        (float(solver.equil_sigma), float(solver.equil_rho))).encode())
+    for array in (solver.b, solver.c, solver.equil_d, solver.equil_e):
+        hasher.update(np.ascontiguousarray(array, dtype=float).data)
+    return hasher.hexdigest()
+
+
+def save_checkpoint(
+        path, key, dr_y, iterations, relaxation, acceleration=None,
+        phase='double'):
+    """Write checkpoint to file, atomically.
+
+    :param path: File path.
+    :type path: str or pathlib.Path
+    :param key: Fingerprint of the program, see :func:`program_fingerprint`.
+    :type key: str
+    :param dr_y: Douglas-Rachford iterate.
+    :type dr_y: np.array
+    :param iterations: Number of iterations done.
+    :type iterations: int
+    :param relaxation: Current relaxation of the step.
+    :type relaxation: float
+    :param acceleration: Anderson acceleration, whose last point is
+        ``dr_y``. Default None.
+    :type acceleration: cqr.anderson.AndersonAcceleration or None
+    :param phase: Phase of the iteration, ``'single'`` or ``'double'``
+        precision. Default ``'double'``.
+    :type phase: str
+    """
+    assert phase in PHASES
+    arrays = {
+        'version': np.array(FORMAT_VERSION), 'key': np.array(key),
+        'dr_y': np.asarray(dr_y, dtype=float),
+        'iterations': np.array(iterations),
+        'relaxation': np.array(relaxation), 'phase': np.array(phase)}
+    if acceleration is not None:
+        for name, array in acceleration.state().items():
+            arrays[_ANDERSON_PREFIX + name] = array
+
+    path = Path(path)
+    with tempfile.NamedTemporaryFile(
+            dir=path.parent, prefix=path.name, suffix='.tmp',
+            delete=False) as file:
+        try:
+            np.savez(file, **arrays)
+            file.flush()
+            os.fsync(file.fileno())
+        except BaseException:
+            os.unlink(file.name)
+            raise
+    os.replace(file.name, path)
+
+
+def load_checkpoint(path):
+    """Load checkpoint from file.
+
+    :param path: File path.
+    :type path: str or pathlib.Path
+
+    :raises ValueError: If the file has a different format version.
+
+    :returns: Fingerprint of the program, iterate, number of iterations,
+        relaxation, phase, and state of the Anderson acceleration, or None.
+    :rtype: tuple
+    """
+    with np.load(path, allow_pickle=False) as data:
+        version = int(data['version'])
+        if version != FORMAT_VERSION:
+            raise ValueError(
+                f'{path} has format version {version}, this version of CQR'
+                f' reads version {FORMAT_VERSION}.')
+        anderson = {
+            name[len(_ANDERSON_PREFIX):]: data[name] for name in data.files
+            if name.startswith(_ANDERSON_PREFIX)}
+        return (
+            str(data['key']), data['dr_y'], int(data['iterations']),
+            float(data['relaxation']), str(data['phase']), anderson or None)
@@ -17,6 +17,9 @@
 
 import numpy as np
 
+SECOND_ORDER_METHODS = ('AUTO', 'GROUPED', 'SEGMENTED')
+
+
 def project_nonsymm_soc(x, a):
     """Project on the non-symmetric second-order cone.
 
@@ -25,80 +28,1018 @@ def project_nonsymm_soc(x, a):
     multiplication is elementwise. The standard second-order cone has scaling
     equal to all ones.
 
-    This cone is not self dual: its dual has the (elementwise) inverse scaling vector.
-    Projection is not as efficient as projection on the standard SOC, it
-    requires an iterative procedure, but can be warm-started.
+    This cone is not self dual: its dual has the (elementwise) inverse
+    scaling vector. Projection is not as efficient as projection on the
+    standard SOC, it requires an iterative procedure, see
+    :class:`ScaledSecondOrderCones`, which projects many cones at once and
+    is warm-started.
+
+    :param x: Input.
+    :type x: np.array
+    :param a: Scaling, of size ``len(x) - 1``.
+    :type a: np.array
+
+    :returns: Projection.
+    :rtype: np.array
+    """
+    pi = np.empty_like(x, dtype=float)
+    ScaledSecondOrderCones((len(x),), a).project(x, pi)
+    return pi
+
+
+class ConeLayout:
+    """Boundaries of the cones of a program, computed once, immutable.
+
+    The vector is the zero cone, then the non-negative cone, then the
+    second-order cones, then the exponential cones, as in SCS. For
+    block-wise reductions each entry of the zero and non-negative cones is
+    a block, and each second-order or exponential cone is one; the entries
+    of second-order cones are also indexed relative to their segment, for
+    the projections of :class:`SecondOrderCones`. All arrays are
+    read-only.
+
+    :param zero: Size of the zero cone.
+    :type zero: int
+    :param nonneg: Size of the non-negative cone.
+    :type nonneg: int
+    :param soc: Sizes of the second-order cones, each at least 2.
+    :type soc: iterable
+    :param exp: Number of exponential cones, see
+        :class:`ExponentialCones`. Default 0.
+    :type exp: int
+    """
+
+    def __init__(self, zero, nonneg, soc=(), exp=0):
+        soc = tuple(int(size) for size in soc)
+        assert zero >= 0
+        assert nonneg >= 0
+        assert all(size > 1 for size in soc)
+        assert exp >= 0
+        soc_sizes = np.array(soc, dtype=np.intp)
+        soc_offsets = np.cumsum(soc_sizes) - soc_sizes
+        exp_start = zero + nonneg + int(np.sum(soc_sizes))
+        self.zero = int(zero)
+        self.nonneg = int(nonneg)
+        self.soc = soc
+        self.exp = int(exp)
+        self.size = exp_start + 3 * exp
+        self.zero_slice = slice(0, zero)
+        self.nonneg_slice = slice(zero, zero + nonneg)
+        self.soc_slice = slice(zero + nonneg, exp_start)
+        self.exp_slice = slice(exp_start, self.size)
+        self.self_dual_slice = slice(zero, exp_start)
+
+        # second-order cones, relative to their segment
+        groups = []
+        for group_size in np.unique(soc_sizes):
+            indices = (soc_offsets[soc_sizes == group_size, None]
+                       + np.arange(group_size)).ravel()
+            groups.append((int(group_size), self._read_only(indices)))
+        self.soc_sizes = self._read_only(soc_sizes)
+        self.soc_offsets = self._read_only(soc_offsets)
+        self.soc_ids = self._read_only(np.repeat(
+            np.arange(len(soc), dtype=np.intp), soc_sizes))
+        self.soc_groups = tuple(groups)
+
+        # blocks, and masks of the whole vector
+        block_sizes = np.concatenate([
+            np.ones(zero + nonneg, dtype=np.intp), soc_sizes,
+            np.full(exp, 3, dtype=np.intp)])
+        cone = np.repeat(
+            np.arange(4), [zero, nonneg, exp_start - zero - nonneg, 3 * exp])
+        soc_heads = np.zeros(self.size, dtype=bool)
+        soc_heads[zero + nonneg + soc_offsets] = True
+        self.block_sizes = self._read_only(block_sizes)
+        self.block_starts = self._read_only(
+            np.cumsum(block_sizes) - block_sizes)
+        self.block_ids = self._read_only(np.repeat(
+            np.arange(len(block_sizes), dtype=np.intp), block_sizes))
+        self.zero_mask = self._read_only(cone == 0)
+        self.nonneg_mask = self._read_only(cone == 1)
+        self.soc_mask = self._read_only(cone == 2)
+        self.soc_head_mask = self._read_only(soc_heads)
+        self.exp_mask = self._read_only(cone == 3)
+        self._frozen = True
+
+    @staticmethod
+    def _read_only(array):
+        array.setflags(write=False)
+        return array
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError('ConeLayout is immutable.')
+        object.__setattr__(self, name, value)
+
+    def __eq__(self, other):
+        return isinstance(other, ConeLayout) and (
+            self.zero, self.nonneg, self.soc, self.exp) == (
+                other.zero, other.nonneg, other.soc, other.exp)
+
+    def __hash__(self):
+        return hash((self.zero, self.nonneg, self.soc, self.exp))
+
+    def __repr__(self):
+        return (f'ConeLayout(zero={self.zero}, nonneg={self.nonneg}, '
+                f'soc={self.soc}, exp={self.exp})')
+
+    def block_reduce(self, values, ufunc=np.add):
+        """Reduce values over each block.
+
+        :param values: Values, one per entry, or 2-D with one row per entry.
+        :type values: np.array
+        :param ufunc: Binary NumPy ufunc. Default ``np.add``.
+        :type ufunc: np.ufunc
+
+        :returns: One value, or row, per block.
+        :rtype: np.array
+        """
+        if self.size == 0:
+            return np.zeros((0,) + values.shape[1:], dtype=values.dtype)
+        return ufunc.reduceat(values, self.block_starts, axis=0)
+
+    def expand(self, values):
+        """Repeat one value, or row, per block over the entries of the block.
+
+        :param values: One value, or row, per block.
+        :type values: np.array
+
+        :returns: One value, or row, per entry.
+        :rtype: np.array
+        """
+        return values.take(self.block_ids, axis=0)
+
+    def project(self, z, pi, reflected, second_order_cones, dual=False,
+                exponential_cones=None):
+        """Project on the cone, or on its dual, and reflect.
+
+        :param z: Input, not modified.
+        :type z: np.array
+        :param pi: Output, projection.
+        :type pi: np.array
+        :param reflected: Output, ``2 pi - z``.
+        :type reflected: np.array
+        :param second_order_cones: Projection on the second-order cones of
+            this layout.
+        :type second_order_cones: SecondOrderCones
+        :param dual: Whether to project on the dual cone; the zero cone's
+            dual is the free cone, the exponential cones' is in
+            :class:`ExponentialCones`, the others are self-dual. Default
+            False.
+        :type dual: bool
+        :param exponential_cones: Projection on the exponential cones of
+            this layout, required if there are any. Default None.
+        :type exponential_cones: ExponentialCones or None
+        """
+        zero, nonneg, soc = self.zero_slice, self.nonneg_slice, \
+            self.soc_slice
+        if dual:
+            pi[zero] = z[zero]
+            reflected[zero] = z[zero]
+        else:
+            pi[zero] = 0.
+            np.negative(z[zero], out=reflected[zero])
+        np.maximum(z[nonneg], 0., out=pi[nonneg])
+        np.multiply(pi[nonneg], 2., out=reflected[nonneg])
+        np.subtract(reflected[nonneg], z[nonneg], out=reflected[nonneg])
+        second_order_cones.project(z[soc], pi[soc], reflected[soc])
+        if self.exp:
+            exp = self.exp_slice
+            exponential_cones.project(
+                z[exp], pi[exp], reflected[exp], dual=dual)
+
+
+class _SecondOrderGroup:
+    """Cones of equal size, as rows of a 2-D block, with their buffers.
+
+    The block and all its views are made here, since each new view of a
+    2-D array fills NumPy's cache of dimensions; for the same reason, 2-D
+    broadcasting is avoided: the per-cone scale is expanded to the shape of
+    the block with ``take`` and the norms are a product with the indicator
+    of the tail.
+
+    :param indices: Positions of the entries of the cones, in order.
+    :type indices: np.array
+    :param size: Size of each cone.
+    :type size: int
+    :param dtype: Floating point type of the buffers.
+    :type dtype: type
+    """
+
+    def __init__(self, indices, size, dtype):
+        count = len(indices) // size
+        shape = (count, size)
+        self.indices = indices
+        self.contiguous = bool(np.all(np.diff(indices) == 1))
+        self.start, self.end = int(indices[0]), int(indices[-1]) + 1
+
+        self.z = np.empty(shape, dtype=dtype)
+        self.pi = np.empty(shape, dtype=dtype)
+        self.reflected = np.empty(shape, dtype=dtype)
+        self.work = np.empty(shape, dtype=dtype)
+        self.z_flat, self.pi_flat, self.reflected_flat = \
+            self.z.reshape(-1), self.pi.reshape(-1), self.reflected.reshape(-1)
+        self.t, self.pi_head = self.z[:, 0], self.pi[:, 0]
+
+        self.norms = np.empty(count, dtype=dtype)
+        self.head = np.empty(count, dtype=dtype)
+        self.scale = np.empty(count, dtype=dtype)
+        self.inside = np.empty(count, dtype=bool)
+        self.tail = np.ones(size, dtype=dtype)
+        self.tail[0] = 0.
+        self.rows = np.repeat(np.arange(count, dtype=np.intp), size).reshape(
+            shape)
+        self.tiny = np.finfo(dtype).tiny
+
+    def project(self, z, pi, reflected):
+        """Project the cones of the group and reflect, ``2 pi - z``.
+
+        :param z: Input, all cones, not modified.
+        :type z: np.array
+        :param pi: Output, projection, only this group's entries are set.
+        :type pi: np.array
+        :param reflected: Output, reflection, same.
+        :type reflected: np.array
+        """
+        if self.contiguous:
+            np.copyto(self.z_flat, z[self.start:self.end])
+        else:
+            z.take(self.indices, out=self.z_flat)
+
+        norms, head, scale, inside, t = \
+            self.norms, self.head, self.scale, self.inside, self.t
+        np.multiply(self.z, self.z, out=self.work)
+        np.matmul(self.work, self.tail, out=norms)
+        np.sqrt(norms, out=norms)
+
+        # zero in the polar cone, where norm <= -t
+        np.add(norms, t, out=head)
+        np.multiply(head, .5, out=head)
+        np.maximum(head, 0., out=head)
+        np.less_equal(norms, t, out=inside)
+
+        # head is zero where norm is zero, unless inside
+        np.maximum(norms, self.tiny, out=scale)
+        np.divide(head, scale, out=scale)
+        np.copyto(scale, 1., where=inside)
+
+        scale.take(self.rows, out=self.work)
+        np.multiply(self.z, self.work, out=self.pi)
+        np.copyto(self.pi_head, head)
+        np.copyto(self.pi_head, t, where=inside)
+        np.multiply(self.pi, 2., out=self.reflected)
+        np.subtract(self.reflected, self.z, out=self.reflected)
+
+        if self.contiguous:
+            pi[self.start:self.end] = self.pi_flat
+            reflected[self.start:self.end] = self.reflected_flat
+        else:
+            pi[self.indices] = self.pi_flat
+            reflected[self.indices] = self.reflected_flat
+
+
+class _SecondOrderSegments:
+    """All cones, as consecutive segments of the input, of any size.
+
+    The squared tail norms are sums over the segments, with
+    ``np.add.reduceat`` at the starts of the cones, having zeroed the
+    heads; per-cone values are expanded to the entries with ``take`` on the
+    precomputed index of the cone of each entry, same as ``np.repeat`` but
+    into a preallocated buffer.
+
+    :param layout: Cones of the program.
+    :type layout: ConeLayout
+    :param dtype: Floating point type of the buffers.
+    :type dtype: type
+    """
+
+    def __init__(self, layout, dtype):
+        count, size = len(layout.soc), int(np.sum(layout.soc_sizes))
+        self.starts = layout.soc_offsets
+        self.owners = layout.soc_ids
+        self.work = np.empty(size, dtype=dtype)
+        self.t = np.empty(count, dtype=dtype)
+        self.norms = np.empty(count, dtype=dtype)
+        self.head = np.empty(count, dtype=dtype)
+        self.scale = np.empty(count, dtype=dtype)
+        self.inside = np.empty(count, dtype=bool)
+        self.tiny = np.finfo(dtype).tiny
+
+    def project(self, z, pi, reflected):
+        """Project the cones and reflect, ``2 pi - z``.
+
+        :param z: Input, not modified.
+        :type z: np.array
+        :param pi: Output, projection.
+        :type pi: np.array
+        :param reflected: Output, reflection.
+        :type reflected: np.array
+        """
+        norms, head, scale, inside, t = \
+            self.norms, self.head, self.scale, self.inside, self.t
+        z.take(self.starts, out=t)
+        np.multiply(z, z, out=self.work)
+        self.work[self.starts] = 0.
+        np.add.reduceat(self.work, self.starts, out=norms)
+        np.sqrt(norms, out=norms)
+
+        # zero in the polar cone, where norm <= -t
+        np.add(norms, t, out=head)
+        np.multiply(head, .5, out=head)
+        np.maximum(head, 0., out=head)
+        np.less_equal(norms, t, out=inside)
+
+        # head is zero where norm is zero, unless inside
+        np.maximum(norms, self.tiny, out=scale)
+        np.divide(head, scale, out=scale)
+        np.copyto(scale, 1., where=inside)
+        np.copyto(head, t, where=inside)
+
+        scale.take(self.owners, out=self.work)
+        np.multiply(z, self.work, out=pi)
+        pi[self.starts] = head
+        np.multiply(pi, 2., out=reflected)
+        np.subtract(reflected, z, out=reflected)
+
+
+class SecondOrderCones:
+    """Projection on a product of second-order cones, vectorized.
+
+    There are two methods, neither loops over the cones in Python.
+    ``'GROUPED'`` groups cones of equal size at construction into 2-D
+    blocks, one cone per row, and projects each group with a few NumPy
+    calls; the entries of each group are copied in its block, and the
+    outputs back, with slices if the cones of the group are consecutive.
+    ``'SEGMENTED'`` works on the input as is, with the tail norms computed
+    by ``np.add.reduceat`` at precomputed offsets, so its cost doesn't grow
+    with the number of distinct sizes. All buffers are allocated here, so
+    projections allocate no arrays.
+
+    :param layout: Cones of the program, only the second-order ones are
+        used; the input is their segment.
+    :type layout: ConeLayout
+    :param dtype: Floating point type of the buffers. Default
+        ``np.float64``.
+    :type dtype: type
+    :param method: ``'GROUPED'``, ``'SEGMENTED'``, or ``'AUTO'``, grouped if
+        all cones have the same size, which is faster for many small cones,
+        else segmented. Default ``'AUTO'``.
+    :type method: str
+    """
+
+    def __init__(self, layout, dtype=np.float64, method='AUTO'):
+        assert method in SECOND_ORDER_METHODS
+        self.layout = layout
+        self.size = layout.soc_slice.stop - layout.soc_slice.start
+        if method == 'AUTO':
+            method = 'GROUPED' if len(layout.soc_groups) <= 1 \
+                else 'SEGMENTED'
+        self.method = method
+
+        if method == 'SEGMENTED':
+            self._parts = [_SecondOrderSegments(layout, dtype)] \
+                if len(layout.soc) else []
+        else:
+            self._parts = [
+                _SecondOrderGroup(indices, size, dtype)
+                for size, indices in layout.soc_groups]
+
+    def project(self, z, pi, reflected):
+        """Project on the cones and reflect, ``reflected = 2 pi - z``.
+
+        :param z: Input, not modified.
+        :type z: np.array
+        :param pi: Output, projection.
+        :type pi: np.array
+        :param reflected: Output, reflection.
+        :type reflected: np.array
+        """
+        for part in self._parts:
+            part.project(z, pi, reflected)
+
+
+class ScaledSecondOrderCones:
+    """Projection on a product of non-symmetric second-order cones.
+
+    Each cone is ``{(t, y) | t >= ||a * y||_2}``, with positive scaling
+    ``a``, see :func:`project_nonsymm_soc`. If neither the input nor minus
+    it is in the cone, resp. its dual, the projection is
+
+    .. code-block:: none
+
+        s = ||a * z||_2,  z = y / (1 + lambda a^2)
+
+    with the multiplier ``lambda > 0`` the root of
+
+    .. code-block:: none
+
+        G(lambda) = 1 - lambda - t / ||a y / (1 + lambda a^2)||_2
+
+    which is positive at zero and has a single root, since it is convex
+    and decreasing if ``t > 0``, linear if ``t = 0`` with the root at
+    ``lambda = 1``, and concave if ``t < 0``. It has no pole, unlike the
+    formulation in ``mu = -lambda / 2`` with ``s = t / (1 + 2 mu)``, and the
+    reciprocal of the norm is close to linear in ``lambda``, exactly for
+    unit scaling or one-dimensional tails, so Newton converges in few
+    steps also where the root is large, close to the dual cone. Newton
+    converges monotonically from the left of the root if ``G`` is convex,
+    and from the right if it is concave. All roots are found together,
+    with per-cone brackets: a step outside the bracket restarts from the
+    end of the bracket on the monotone side, or expands it if no upper
+    bound is known yet. The tail sums are ``np.add.reduceat``
+    over the segments of the tails, as in :class:`SecondOrderCones`.
+
+    The last multiplier of each cone is kept, as ``mu``, and is the first
+    Newton point of the next projection, so inputs that change little
+    between calls, like consecutive iterates of Douglas-Rachford, take a
+    few steps instead of a root-finding from scratch.
+
+    :param sizes: Sizes of the cones, each at least 2.
+    :type sizes: iterable
+    :param scaling: Positive scaling of the tails of the cones,
+        concatenated; of size ``sum(sizes) - len(sizes)``.
+    :type scaling: np.array
+    :param max_iters: Maximum number of Newton steps. Default 100.
+    :type max_iters: int
     """
 
-    t = x[0]
-    y = x[1:]
-
-    # case 1: vector is in cone
-    if t >= np.linalg.norm(y * a):
-        print('1')
-        return np.copy(x)
-
-    # case 2: negative of vector in dual cone
-    if -t >= np.linalg.norm(y/a):
-        print('2')
-        return np.zeros_like(x)
-
-    # case 3: projection is on non-zero surface of (primal) cone
-    #
-    # Derivation:
-    #
-    # Let result be (s, z).
-    #
-    # Following equations come from zero-gradient of Lagrangian in s and z
-    # s = t / (1 + 2 * mu)
-    # z = y / (1 - 2 * mu * a**2)
-    # mu is the Lagrangia multiplier.
-    #
-    # We find it by Newton search looking for the solution of this
-    # s**2 = sum((z*a)**2)
-    # mu is < 0; it has a pole at -.5; it is either in (-.5, 0.) or
-    # in (-inf, -.5), both open intervals, depending on sign of t; might make
-    # sense to re-formulate the problem since we lose accuracy if mu is very
-    # close to the pole.
-
-    print('3')
-
-    s = lambda mu: t / (1 + 2 * mu)
-    z = lambda mu: y / (1 - 2 * mu * a**2)
-    loss = lambda mu: s(mu)**2 - np.sum((z(mu)*a)**2)
-
-    # placeholder
-    import scipy as sp
-
-    if t > 0:
-        mu0 = -.25
-        interval = (-.5, 0.)
-        print('interval', interval)
-        result = sp.optimize.root_scalar(loss, x0=mu0, bracket=interval,
-            # rtol is the minimum allowed by impl
-            xtol=np.finfo(float).eps, rtol=4*np.finfo(float).eps)
-    else:
-        low = -1.
-        for _ in range(100):
-            if loss(low) < 0:
-                break
-            low *= 2.
+    def __init__(self, sizes, scaling, max_iters=100):
+        sizes = np.array(tuple(sizes), dtype=np.intp)
+        assert np.all(sizes > 1)
+        self.scaling = np.array(scaling, dtype=float)
+        assert len(self.scaling) == np.sum(sizes) - len(sizes)
+        assert np.all(self.scaling > 0.)
+        self.max_iters = max_iters
+
+        self.heads = np.cumsum(sizes) - sizes
+        tails = np.ones(np.sum(sizes), dtype=bool)
+        tails[self.heads] = False
+        self.tails = np.flatnonzero(tails)
+        self.tail_starts = np.cumsum(sizes - 1) - (sizes - 1)
+        self.owners = np.repeat(np.arange(len(sizes)), sizes - 1)
+        self.scaling_squared = self.scaling ** 2
+        self.inverse_scaling = 1. / self.scaling
+
+        self.mu = np.full(len(sizes), np.nan)
+        self.iterations = 0
+        self._tolerance = 4. * np.finfo(float).eps
+
+    def project(self, z, pi, reflected=None):
+        """Project on the cones, and optionally reflect, ``2 pi - z``.
+
+        :param z: Input, not modified.
+        :type z: np.array
+        :param pi: Output, projection.
+        :type pi: np.array
+        :param reflected: Output, reflection. Default None, not computed.
+        :type reflected: np.array or None
+        """
+        if len(self.heads) == 0:
+            return
+        t, y = z[self.heads], z[self.tails]
+        scaled_y = self.scaling * y
+        inside = t >= np.sqrt(
+            np.add.reduceat(scaled_y ** 2, self.tail_starts))
+        polar = -t >= np.sqrt(np.add.reduceat(
+            (self.inverse_scaling * y) ** 2, self.tail_starts))
+        outer = ~(inside | polar)
+        expanded_outer = outer[self.owners]
+
+        # Newton on all cones, the ones not in the outer case are
+        # meaningless and are discarded below; without a previous
+        # multiplier, start left of the root, from zero if t > 0, and from
+        # one otherwise
+        lam = -2. * self.mu
+        np.copyto(lam, np.where(t > 0., 0., 1.), where=~(lam > 0.))
+        low, high = np.zeros_like(lam), np.full_like(lam, np.inf)
+        active = np.array(outer)
+        self.iterations = 0
+        while np.any(active) and self.iterations < self.max_iters:
+            self.iterations += 1
+            denominator = 1. + lam[self.owners] * self.scaling_squared
+            u_squared = (scaled_y / denominator) ** 2
+            with np.errstate(divide='ignore', invalid='ignore'):
+                norms = np.sqrt(np.add.reduceat(u_squared, self.tail_starts))
+                value = 1. - lam - t / norms
+                derivative = -1. - t * np.add.reduceat(
+                    u_squared * self.scaling_squared / denominator,
+                    self.tail_starts) / norms ** 3
+                new = lam - value / derivative
+
+            positive = value > 0.
+            np.copyto(low, lam, where=active & positive)
+            np.copyto(high, lam, where=active & ~positive)
+            # out of the bracket, restart from its end on the side of
+            # monotone convergence, left if convex, right if concave
+            bracketed = (new >= low) & (new <= high)
+            np.copyto(new, np.where(
+                t > 0., low, np.where(np.isinf(high), 10. * low + 1., high)),
+                where=~bracketed)
+            # converged if the value is at the level of its rounding
+            # error, or if the step is
+            with np.errstate(invalid='ignore'):
+                converged = (np.abs(value) <= self._tolerance * (
+                    np.abs(1. - lam) + np.abs(t) / norms)) | (
+                        np.abs(new - lam) <= self._tolerance * lam)
+            np.copyto(new, lam, where=converged)
+            np.copyto(lam, new, where=active)
+            active &= ~converged
+        np.copyto(self.mu, -lam / 2., where=outer)
+
+        projected = y / (1. + lam[self.owners] * self.scaling_squared)
+        np.copyto(projected, y, where=inside[self.owners])
+        projected[~(inside[self.owners] | expanded_outer)] = 0.
+        pi[self.tails] = projected
+        head = np.sqrt(np.add.reduceat(
+            (self.scaling * projected) ** 2, self.tail_starts))
+        np.copyto(head, t, where=inside)
+        pi[self.heads] = head
+        if reflected is not None:
+            np.multiply(pi, 2., out=reflected)
+            np.subtract(reflected, z, out=reflected)
+
+
+class _ExponentialWork:
+    """Work arrays of the projection on a number of exponential cones.
+
+    There is one array per intermediate value of the vectorized projection
+    in :class:`ExponentialCones`, so that it is computed only with ufuncs
+    writing into them, and masked copies.
+
+    :param count: Number of cones.
+    :type count: int
+    """
+
+    FLOATS = (
+        'x', 'y', 'z', 't', 'rho', 'low', 'high', 'end_low', 'end_high',
+        'alpha', 'beta', 'denominator', 'slope', 'd_alpha', 'd_beta',
+        'scale', 'exp_rho', 'exp_minus_rho', 'value', 'derivative', 'new',
+        'fallback', 'pi_x', 'pi_y', 'pi_z')
+    MASKS = (
+        'inside', 'polar', 'analytic', 'iterative', 'active', 'mask',
+        'other', 'positive_rho', 'bracketed', 'converged', 'to_low',
+        'to_high', 'tried_low', 'tried_high')
+
+    def __init__(self, count):
+        for name in self.FLOATS:
+            setattr(self, name, np.empty(count))
+        for name in self.MASKS:
+            setattr(self, name, np.empty(count, dtype=bool))
+
+
+class ExponentialCones:
+    """Projection on a product of exponential cones, vectorized.
+
+    Each cone is the closure of ``{(x, y, z) | y > 0, y exp(x / y) <= z}``,
+    the convention of CVXPY and SCS; its dual is the closure of ``{(u, v,
+    w) | u < 0, -u exp(v / u) <= e w}``. Inputs in the cone, in its polar,
+    or with ``x, y <= 0``, whose projection is ``(x, 0, max(z, 0))``, are
+    recognized first, and comparisons are done in logarithms, so they
+    don't overflow. For the others, following Friberg, Projection onto the
+    exponential cone: a univariate root-finding problem, 2021, the input is
+    the sum of its projection and of the projection on the polar,
+
+    .. code-block:: none
+
+        alpha (rho, 1, exp(rho)) + beta (1, 1 - rho, -exp(-rho))
+
+    which are orthogonal; the first two entries give ``alpha`` and
+    ``beta`` as functions of ``rho``, and ``rho`` is the root of
+
+    .. code-block:: none
+
+        F(rho) = alpha exp(rho) - beta exp(-rho) - z
+
+    on the interval where ``alpha, beta > 0``, from ``1 - y / x`` if ``x >
+    0`` to ``x / y`` if ``y > 0``. ``F`` is negative at the lower end and
+    positive at the upper one, also as they go to infinity, and has a
+    single root, by uniqueness of the projection. All roots are found
+    together, with Newton steps safeguarded by per-cone brackets: a step
+    outside the bracket is replaced by bisection, or by expansion where
+    the bracket is unbounded. The work arrays of :meth:`project`, one per
+    cone, are allocated once. The projection on the dual cone is ``v +
+    P(-v)``, by Moreau's decomposition.
+
+    The derivative of the projection is the identity inside the cone, zero
+    inside the polar, ``diag(1, 0, z > 0)`` in the analytic case, and
+    otherwise, with ``p`` the projection, ``g(p) = p_y exp(p_x / p_y) -
+    p_z`` and ``mu = p_z - z`` its multiplier, the top-left block of the
+    inverse of
+
+    .. code-block:: none
+
+        [[I + mu Hessian g(p), grad g(p)], [grad g(p)^T, 0]]
+
+    by differentiating the optimality conditions ``p - v + mu grad g(p) =
+    0`` and ``g(p) = 0``.
+
+    :param count: Number of cones; the input has their entries
+        concatenated.
+    :type count: int
+    :param max_iters: Maximum number of Newton steps. Default 100.
+    :type max_iters: int
+    """
+
+    def __init__(self, count, max_iters=100):
+        assert count >= 0
+        self.count = count
+        self.max_iters = max_iters
+        self.iterations = 0
+        self._tolerance = 4. * np.finfo(float).eps
+        self._work = _ExponentialWork(count)
+
+    @staticmethod
+    def _cases(work):
+        """Inputs in the cone, in the polar, in the analytic case, and the
+        others, of the iterative case."""
+        x, y, z, t = work.x, work.y, work.z, work.t
+        inside, polar, analytic, iterative = \
+            work.inside, work.polar, work.analytic, work.iterative
+        mask, other = work.mask, work.other
+
+        # y > 0, z > 0 and x <= y log(z / y), or x <= 0, y = 0 and z >= 0
+        np.divide(z, y, out=t)
+        np.log(t, out=t)
+        np.multiply(t, y, out=t)
+        np.less_equal(x, t, out=inside)
+        np.greater(y, 0., out=mask)
+        inside &= mask
+        np.greater(z, 0., out=mask)
+        inside &= mask
+        np.less_equal(x, 0., out=mask)
+        np.equal(y, 0., out=other)
+        mask &= other
+        np.greater_equal(z, 0., out=other)
+        mask &= other
+        inside |= mask
+
+        # x > 0, z < 0 and y <= x (1 + log(-z / x)), or x = 0, y <= 0 and
+        # z <= 0
+        np.divide(z, x, out=t)
+        np.negative(t, out=t)
+        np.log(t, out=t)
+        np.add(t, 1., out=t)
+        np.multiply(t, x, out=t)
+        np.less_equal(y, t, out=polar)
+        np.greater(x, 0., out=mask)
+        polar &= mask
+        np.less(z, 0., out=mask)
+        polar &= mask
+        np.equal(x, 0., out=mask)
+        np.less_equal(y, 0., out=other)
+        mask &= other
+        np.less_equal(z, 0., out=other)
+        mask &= other
+        polar |= mask
+
+        # x <= 0 and y <= 0, and neither of the above
+        np.logical_or(inside, polar, out=mask)
+        np.logical_not(mask, out=analytic)
+        np.less_equal(x, 0., out=other)
+        analytic &= other
+        np.less_equal(y, 0., out=other)
+        analytic &= other
+        np.logical_or(mask, analytic, out=iterative)
+        np.logical_not(iterative, out=iterative)
+
+    @staticmethod
+    def _multipliers(rho, low, high, work):
+        """Scales ``alpha`` and ``beta`` of the two projections.
+
+        They are written as multiples of the distances of ``rho`` from the
+        ends of the bracket, where they vanish, to avoid cancellations.
+        """
+        x, y, t, mask = work.x, work.y, work.t, work.mask
+        alpha, beta, denominator = work.alpha, work.beta, work.denominator
+        np.subtract(rho, 1., out=denominator)
+        np.multiply(denominator, rho, out=denominator)
+        np.add(denominator, 1., out=denominator)
+
+        np.subtract(rho, low, out=alpha)
+        np.multiply(alpha, x, out=alpha)
+        np.subtract(rho, 1., out=t)
+        np.multiply(t, x, out=t)
+        np.add(t, y, out=t)
+        np.isinf(low, out=mask)
+        np.copyto(alpha, t, where=mask)
+        np.divide(alpha, denominator, out=alpha)
+
+        np.subtract(high, rho, out=beta)
+        np.multiply(beta, y, out=beta)
+        np.multiply(rho, y, out=t)
+        np.subtract(x, t, out=t)
+        np.isinf(high, out=mask)
+        np.copyto(beta, t, where=mask)
+        np.divide(beta, denominator, out=beta)
+
+    def _root(self, work):
+        """Root ``rho`` of ``F``, for the inputs in ``work.active``.
+
+        Newton steps are on ``F(rho) exp(-|rho|)``, which has the same
+        sign and doesn't overflow. The other inputs give infinities and
+        nans, which are discarded.
+        """
+        x, y, z, t, other = work.x, work.y, work.z, work.t, work.other
+        rho, low, high, end_low, end_high = \
+            work.rho, work.low, work.high, work.end_low, work.end_high
+        alpha, beta, denominator = work.alpha, work.beta, work.denominator
+        slope, d_alpha, d_beta = work.slope, work.d_alpha, work.d_beta
+        scale, exp_rho, exp_minus_rho = \
+            work.scale, work.exp_rho, work.exp_minus_rho
+        value, derivative, new, fallback = \
+            work.value, work.derivative, work.new, work.fallback
+        active, mask, positive_rho, bracketed, converged = \
+            work.active, work.mask, work.positive_rho, work.bracketed, \
+            work.converged
+        to_low, to_high, tried_low, tried_high = \
+            work.to_low, work.to_high, work.tried_low, work.tried_high
+
+        np.divide(y, x, out=low)
+        np.subtract(1., low, out=low)
+        np.less_equal(x, 0., out=mask)
+        np.copyto(low, -np.inf, where=mask)
+        np.divide(x, y, out=high)
+        np.less_equal(y, 0., out=mask)
+        np.copyto(high, np.inf, where=mask)
+        np.copyto(end_low, low)
+        np.copyto(end_high, high)
+
+        np.add(low, high, out=rho)
+        np.multiply(rho, .5, out=rho)
+        np.add(low, 1., out=t)
+        np.isinf(high, out=mask)
+        np.copyto(rho, t, where=mask)
+        np.subtract(high, 1., out=t)
+        np.isinf(low, out=mask)
+        np.copyto(rho, t, where=mask)
+        tried_low.fill(False)
+        tried_high.fill(False)
+
+        self.iterations = 0
+        while active.any() and self.iterations < self.max_iters:
+            self.iterations += 1
+            self._multipliers(rho, end_low, end_high, work)
+            np.multiply(rho, 2., out=slope)
+            np.subtract(slope, 1., out=slope)
+            np.multiply(alpha, slope, out=d_alpha)
+            np.subtract(x, d_alpha, out=d_alpha)
+            np.divide(d_alpha, denominator, out=d_alpha)
+            np.multiply(beta, slope, out=d_beta)
+            np.add(d_beta, y, out=d_beta)
+            np.divide(d_beta, denominator, out=d_beta)
+            np.negative(d_beta, out=d_beta)
+
+            # exp(rho), exp(-rho) and 1, all scaled by exp(-|rho|)
+            np.greater(rho, 0., out=positive_rho)
+            np.abs(rho, out=scale)
+            np.negative(scale, out=scale)
+            np.exp(scale, out=scale)
+            np.multiply(scale, scale, out=exp_rho)
+            np.copyto(exp_minus_rho, exp_rho)
+            np.copyto(exp_rho, 1., where=positive_rho)
+            np.logical_not(positive_rho, out=mask)
+            np.copyto(exp_minus_rho, 1., where=mask)
+
+            np.multiply(alpha, exp_rho, out=value)
+            np.multiply(beta, exp_minus_rho, out=t)
+            np.subtract(value, t, out=value)
+            np.multiply(z, scale, out=t)
+            np.subtract(value, t, out=value)
+            np.add(d_alpha, alpha, out=derivative)
+            np.multiply(derivative, exp_rho, out=derivative)
+            np.subtract(d_beta, beta, out=t)
+            np.multiply(t, exp_minus_rho, out=t)
+            np.subtract(derivative, t, out=derivative)
+            np.negative(value, out=t)
+            np.copyto(t, value, where=positive_rho)
+            np.subtract(derivative, t, out=derivative)
+            np.divide(value, derivative, out=new)
+            np.subtract(rho, new, out=new)
+
+            np.greater(value, 0., out=mask)
+            np.logical_and(mask, active, out=other)
+            np.copyto(high, rho, where=other)
+            np.logical_not(mask, out=mask)
+            mask &= active
+            np.copyto(low, rho, where=mask)
+            np.greater_equal(new, low, out=bracketed)
+            np.less_equal(new, high, out=mask)
+            bracketed &= mask
+
+            # bisection, or expansion of the unbounded ends
+            np.add(low, high, out=fallback)
+            np.multiply(fallback, .5, out=fallback)
+            np.abs(low, out=t)
+            np.add(t, 1., out=t)
+            np.add(t, low, out=t)
+            np.add(t, low, out=t)
+            np.isinf(high, out=mask)
+            np.copyto(fallback, t, where=mask)
+            np.abs(high, out=t)
+            np.add(t, 1., out=t)
+            np.subtract(high, t, out=t)
+            np.add(t, high, out=t)
+            np.isinf(low, out=mask)
+            np.copyto(fallback, t, where=mask)
+
+            # past an end of the interval, where one of the two
+            # projections vanishes, the root is often too close to it
+            # to be told apart, so the end is tried before bisecting
+            np.less(new, low, out=to_low)
+            np.equal(low, end_low, out=mask)
+            to_low &= mask
+            np.logical_not(tried_low, out=mask)
+            to_low &= mask
+            np.greater(new, high, out=to_high)
+            np.equal(high, end_high, out=mask)
+            to_high &= mask
+            np.logical_not(tried_high, out=mask)
+            to_high &= mask
+            np.copyto(fallback, low, where=to_low)
+            np.copyto(fallback, high, where=to_high)
+            tried_low |= to_low
+            tried_high |= to_high
+            np.logical_not(bracketed, out=mask)
+            np.copyto(new, fallback, where=mask)
+
+            np.multiply(alpha, exp_rho, out=t)
+            np.multiply(beta, exp_minus_rho, out=derivative)
+            np.add(t, derivative, out=t)
+            np.abs(z, out=derivative)
+            np.multiply(derivative, scale, out=derivative)
+            np.add(t, derivative, out=t)
+            np.multiply(t, self._tolerance, out=t)
+            np.abs(value, out=value)
+            np.less_equal(value, t, out=converged)
+            np.abs(rho, out=t)
+            np.maximum(t, 1., out=t)
+            np.multiply(t, self._tolerance, out=t)
+            np.subtract(new, rho, out=value)
+            np.abs(value, out=value)
+            np.less_equal(value, t, out=mask)
+            converged |= mask
+            np.copyto(new, rho, where=converged)
+            np.copyto(rho, new, where=active)
+            np.logical_not(converged, out=mask)
+            active &= mask
+
+    def _iterative(self, work):
+        """Projection of the inputs in ``work.active``, and ``rho``,
+        ``alpha`` and ``beta``."""
+        x, y, z, t, mask = work.x, work.y, work.z, work.t, work.mask
+        rho, alpha, beta, scale = work.rho, work.alpha, work.beta, work.scale
+        self._root(work)
+        self._multipliers(rho, work.end_low, work.end_high, work)
+        # from the projection if rho <= 0, else from the one on the polar,
+        # so the exponential is at most one
+        np.abs(rho, out=scale)
+        np.negative(scale, out=scale)
+        np.exp(scale, out=scale)
+        np.multiply(alpha, rho, out=work.pi_x)
+        np.copyto(work.pi_y, alpha)
+        np.multiply(alpha, scale, out=work.pi_z)
+        np.greater(rho, 0., out=mask)
+        np.subtract(x, beta, out=t)
+        np.copyto(work.pi_x, t, where=mask)
+        np.subtract(1., rho, out=t)
+        np.multiply(t, beta, out=t)
+        np.subtract(y, t, out=t)
+        np.copyto(work.pi_y, t, where=mask)
+        np.multiply(beta, scale, out=t)
+        np.add(z, t, out=t)
+        np.copyto(work.pi_z, t, where=mask)
+
+    def _project(self, work):
+        """Project the inputs in ``work`` on the cones, into its ``pi_x``,
+        ``pi_y`` and ``pi_z``."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self._cases(work)
+            self.iterations = 0
+            if work.iterative.any():
+                np.copyto(work.active, work.iterative)
+                self._iterative(work)
+        for entry in (work.pi_x, work.pi_y, work.pi_z):
+            np.copyto(entry, 0., where=work.polar)
+        np.copyto(work.pi_x, work.x, where=work.inside)
+        np.copyto(work.pi_y, work.y, where=work.inside)
+        np.copyto(work.pi_z, work.z, where=work.inside)
+        # (x, 0, max(z, 0))
+        np.copyto(work.pi_x, work.x, where=work.analytic)
+        np.copyto(work.pi_y, 0., where=work.analytic)
+        np.maximum(work.z, 0., out=work.t)
+        np.copyto(work.pi_z, work.t, where=work.analytic)
+
+    @staticmethod
+    def _load(v):
+        """Work arrays of the projection of the rows of v."""
+        work = _ExponentialWork(len(v))
+        np.copyto(work.x, v[:, 0])
+        np.copyto(work.y, v[:, 1])
+        np.copyto(work.z, v[:, 2])
+        return work
+
+    def project_rows(self, v, dual=False):
+        """Project each row, of three entries, on the cone or its dual.
+
+        :param v: Input, one cone per row, of any number of rows.
+        :type v: np.array
+        :param dual: Whether to project on the dual cone. Default False.
+        :type dual: bool
+
+        :returns: Projection, in double precision.
+        :rtype: np.array
+        """
+        v = np.asarray(v, dtype=float)
+        if dual:
+            return v + self.project_rows(-v)
+        work = self._load(v)
+        self._project(work)
+        return np.stack([work.pi_x, work.pi_y, work.pi_z], axis=1)
+
+    def project(self, z, pi, reflected=None, dual=False):
+        """Project on the cones, or their duals, and optionally reflect.
+
+        The projection is done in work arrays allocated once, so it doesn't
+        allocate.
+
+        :param z: Input, the entries of the cones concatenated, not
+            modified.
+        :type z: np.array
+        :param pi: Output, projection.
+        :type pi: np.array
+        :param reflected: Output, ``2 pi - z``. Default None, not computed.
+        :type reflected: np.array or None
+        :param dual: Whether to project on the dual cones. Default False.
+        :type dual: bool
+        """
+        assert len(z) == 3 * self.count
+        work = self._work
+        if dual:
+            np.negative(z[0::3], out=work.x)
+            np.negative(z[1::3], out=work.y)
+            np.negative(z[2::3], out=work.z)
         else:
-            raise NotImplementedError
-        interval = (low, -.5)
-        print('interval', interval)
-        result = sp.optimize.root_scalar(loss, x0=(low - 0.5)/2., bracket=interval,
-            # rtol is the minimum allowed by impl
-            xtol=np.finfo(float).eps, rtol=4*np.finfo(float).eps)
-    print('obtained mu', result.root)
-    print('accuracy condition', loss(result.root))
-    print(result)
-    mu = result.root
-
-    assert s(mu) > 0
-    assert s(mu) > t
-
-    return np.concatenate([[s(mu)], z(mu)])
+            np.copyto(work.x, z[0::3])
+            np.copyto(work.y, z[1::3])
+            np.copyto(work.z, z[2::3])
+        self._project(work)
+        if dual:
+            # v + P(-v), by Moreau's decomposition
+            np.subtract(work.pi_x, work.x, out=work.pi_x)
+            np.subtract(work.pi_y, work.y, out=work.pi_y)
+            np.subtract(work.pi_z, work.z, out=work.pi_z)
+        pi[0::3] = work.pi_x
+        pi[1::3] = work.pi_y
+        pi[2::3] = work.pi_z
+        if reflected is not None:
+            np.multiply(pi, 2., out=reflected)
+            np.subtract(reflected, z, out=reflected)
+
+    def derivative(self, z, dual=False):
+        """Jacobians of the projection on each cone, or on its dual.
+
+        :param z: Point, the entries of the cones concatenated.
+        :type z: np.array
+        :param dual: Whether of the projection on the dual cones. Default
+            False.
+        :type dual: bool
+
+        :returns: One 3 by 3 Jacobian per cone.
+        :rtype: np.array
+        """
+        v = np.asarray(z, dtype=float).reshape(-1, 3)
+        if dual:
+            return np.eye(3) - self.derivative(-v.ravel())
+        work = self._load(v)
+        self._project(work)
+        analytic, iterative = work.analytic, work.iterative
+        jacobians = np.zeros((len(v), 3, 3))
+        jacobians[work.inside] = np.eye(3)
+        jacobians[analytic, 0, 0] = 1.
+        jacobians[analytic, 2, 2] = work.z[analytic] > 0.
+
+        if np.any(iterative):
+            rho, alpha, beta = work.rho[iterative], \
+                work.alpha[iterative], work.beta[iterative]
+            # the Hessian is c w w^T, with w = (1, -rho, 0) and curvature c
+            # = multiplier exp(rho) / p_y = beta / alpha, so the inverse of
+            # the top-left block is I - w w^T beta / (alpha + beta |w|^2);
+            # the gradient is scaled by exp(-max(rho, 0)), which doesn't
+            # change the result, so nothing overflows
+            w = np.stack([np.ones_like(rho), -rho, np.zeros_like(rho)], 1)
+            inverse = np.eye(3) - (beta / (
+                alpha + beta * (1. + rho ** 2)))[:, None, None] * (
+                    w[:, :, None] * w[:, None, :])
+            scale = np.exp(-np.abs(rho))
+            exp_rho = np.where(rho > 0., 1., scale)
+            gradient = np.stack([
+                exp_rho, exp_rho * (1. - rho),
+                -np.where(rho > 0., scale, 1.)], axis=1)
+            direction = np.einsum('kij,kj->ki', inverse, gradient)
+            jacobians[iterative] = inverse - (
+                direction[:, :, None] * direction[:, None, :]) / np.einsum(
+                    'ki,ki->k', gradient, direction)[:, None, None]
+        return jacobians
 
 
 if __name__ == "__main__":
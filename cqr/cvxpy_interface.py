@@ -22,7 +22,7 @@ import cvxpy.settings as s
 from cvxpy.reductions.solution import Solution, failure_solution
 from cvxpy.reductions.solvers import utilities
 from cvxpy.reductions.solvers.conic_solvers.conic_solver import (
-    SOC, ConicSolver, NonNeg, Zero)
+    SOC, ConicSolver, ExpCone, NonNeg, Zero)
 from cvxpy.error import SolverError
 
 from .solver import Solver
@@ -37,9 +37,12 @@ class CQR(ConicSolver):
     """
 
     MIP_CAPABLE = False
-    SUPPORTED_CONSTRAINTS = [Zero, NonNeg, SOC]
+    SUPPORTED_CONSTRAINTS = [Zero, NonNeg, SOC, ExpCone]
     REQUIRES_CONSTR = False
 
+    # entries of each exponential cone in the order of SCS
+    EXP_CONE_ORDER = [0, 1, 2]
+
     def import_solver(self):
         import cqr
 
@@ -49,24 +52,30 @@ class CQR(ConicSolver):
     def solve_via_data(
             self, data: dict, warm_start: bool, verbose: bool, solver_opts,
             solver_cache=None):
-        """Main method."""
+        """Main method.
+
+        Solver options, for example ``anderson=True``, are passed to
+        :class:`cqr.Solver`.
+        """
 
         solver = Solver(
             matrix=data['A'], b=data['b'], c=data['c'], zero=data['dims'].zero,
-            nonneg=data['dims'].nonneg, soc=data['dims'].soc)
+            nonneg=data['dims'].nonneg, soc=data['dims'].soc,
+            exp=data['dims'].exp, **solver_opts)
         solvers.append(solver)
         return {
             'status': solver.status, 'value': np.dot(solver.x, data['c']),
-            'x': solver.x, 'y': solver.y}
+            'x': solver.x, 'y': solver.y, 'statistics': solver.statistics}
 
     def invert(self, solution, inverse_data):
         """CVXPY interface to propagate solution back."""
 
         attr = {}
 
-        if solution['status'] == 'Optimal':
+        if solution['status'] in ['Optimal', Solver.INACCURATE]:
 
-            status = s.OPTIMAL
+            status = s.OPTIMAL if solution['status'] == 'Optimal' \
+                else s.OPTIMAL_INACCURATE
 
             primal_val = solution["value"]
             opt_val = primal_val + inverse_data[s.OFFSET]
@@ -86,6 +95,7 @@ class CQR(ConicSolver):
             dual_vars = {}
             dual_vars.update(eq_dual_vars)
             dual_vars.update(ineq_dual_vars)
+            attr[s.EXTRA_STATS] = solution['statistics']
             return Solution(status, opt_val, primal_vars, dual_vars, attr)
 
         elif solution['status'] == 'Infeasible':
@@ -0,0 +1,564 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""Douglas-Rachford iteration on preallocated buffers.
+
+The variable is ``sy = [s; y]``, of size ``2m``, and each iteration is
+
+.. code-block:: none
+
+    pi = Pi_K(sy)
+    sy += Pi_L(2 pi - sy) - pi
+
+where ``Pi_K`` projects on the program cone times its dual and ``Pi_L`` on
+the affine subspace of the QR-transformed program, see
+:meth:`cqr.Solver.admm_linspace_project`. The step can be relaxed, ``sy +=
+alpha step`` with ``alpha`` in ``(0, 2)``, since the operator is firmly
+non-expansive.
+
+The Halpern variant anchors the iterates to the initial point ``sy_0``,
+
+.. code-block:: none
+
+    sy_{k+1} = sy_0 / (k + 2) + (k + 1) / (k + 2) (sy_k + step_k)
+
+which has a ``O(1/k)`` rate on the fixed-point residual. With restarts of
+the anchor, as in Lu and Yang, Restarted Halpern PDHG for linear
+programming, 2024, it converges linearly on sharp problems such as LPs.
+
+All buffers are allocated once, by
+:class:`DouglasRachford`, and every operation writes in place, so that on
+large programs the iteration is not slowed down by the memory allocator.
+No array is allocated in the iteration if the orthogonal factor itself
+doesn't allocate, which is the case for the sparse and dense backends.
+"""
+
+import time
+
+import numpy as np
+
+from .cones import ExponentialCones, SecondOrderCones
+from .factors import DenseHouseholderQ
+from .fused_step import NUMBA_AVAILABLE, fused_step
+
+ALGORITHMS = ('DR', 'HALPERN', 'RESTARTED_HALPERN')
+
+
+class DouglasRachford:
+    """Douglas-Rachford engine, with the workspace it owns.
+
+    The affine subspace is ``s = b - Q_1 x``, ``y = y0 + Q_2 z``, where
+    ``[Q_1, Q_2]`` is the orthogonal factor of the program matrix, with the
+    gap constraint ``[x; z] - var0`` orthogonal to ``gap_direction``.
+
+    :param orthogonal: Square orthogonal factor, implements ``matvec_to``
+        and ``rmatvec_to``.
+    :type orthogonal: cqr.factors.OrthogonalFactor
+    :param rank: Number of columns of ``Q_1``.
+    :type rank: int
+    :param b: QR-transformed primal constants.
+    :type b: np.array
+    :param y0: Particular dual vector.
+    :type y0: np.array
+    :param var0: Particular solution of the gap constraint.
+    :type var0: np.array
+    :param gap_direction: Unit normal of the gap constraint.
+    :type gap_direction: np.array
+    :param cone_layout: Cones of the program.
+    :type cone_layout: cqr.cones.ConeLayout
+    :param fused: Whether to compute the step with the single call of
+        :func:`cqr.fused_step.fused_step`, which requires a dense orthogonal
+        factor and no exponential cones. Default None, if it is dense, Numba
+        is installed and there are no exponential cones.
+    :type fused: bool or None
+    :param dtype: Floating point type of the data and buffers,
+        ``np.float64`` (default) or ``np.float32``; it must be that of the
+        orthogonal factor.
+    :type dtype: type
+    """
+
+    # iterations between tests of convergence of the step, initial and
+    # largest; the interval doubles after each certificate check that fails
+    DIFFERENCE_INTERVAL = 10
+    MAX_DIFFERENCE_INTERVAL = 640
+    DIFFERENCE_TOLERANCE = 1e-6
+
+    # iterations between calls of the termination check of solve
+    TERMINATION_INTERVAL = 50
+
+    # iterations between updates of adaptive relaxation, and its range
+    RELAXATION_INTERVAL = 50
+    RELAXATION_BOUNDS = (.5, 1.95)
+    RELAXATION_STEP = .2
+
+    # restart criteria of restarted Halpern: sufficient and necessary
+    # decrease of the step norm since the restart, and maximum fraction of
+    # the iterations since the restart
+    RESTART_SUFFICIENT = .2
+    RESTART_NECESSARY = .8
+    RESTART_ARTIFICIAL = .36
+
+    # the iteration stalled if the step norm, relative to the iterate, is
+    # this multiple of the machine epsilon, or if it decreased by less than
+    # this fraction in as many termination intervals; these are many, since
+    # the step norm of DR has long plateaus before the active set changes
+    STALL_ROUNDOFF = 10.
+    STALL_DECREASE = .99
+    STALL_INTERVALS = 20
+
+    def __init__(
+            self, orthogonal, rank, b, y0, var0, gap_direction, cone_layout,
+            fused=None, dtype=np.float64):
+        self.orthogonal = orthogonal
+        self.m = orthogonal.shape[0]
+        self.rank = rank
+        self.dtype = np.dtype(dtype).type
+        assert orthogonal.dtype == self.dtype
+        self.b = np.ascontiguousarray(b, dtype=dtype)
+        self.y0 = np.ascontiguousarray(y0, dtype=dtype)
+        self.var0 = np.ascontiguousarray(var0, dtype=dtype)
+        self.gap_direction = np.ascontiguousarray(gap_direction, dtype=dtype)
+        assert len(self.b) == len(self.y0) == self.m
+        assert len(self.var0) == len(self.gap_direction) == self.m
+        self.cone_layout = cone_layout
+        self.zero = cone_layout.zero
+        self.nonneg = cone_layout.nonneg
+        self.soc = list(cone_layout.soc)
+        assert cone_layout.size == self.m
+        dense = isinstance(orthogonal, DenseHouseholderQ)
+        # the fused step has no projection on exponential cones
+        fusable = dense and not cone_layout.exp
+        self.fused = (fusable and NUMBA_AVAILABLE) if fused is None else fused
+        assert fusable or not self.fused
+        self._second_order_cones = SecondOrderCones(cone_layout, dtype=dtype)
+        self._exponential_cones = ExponentialCones(cone_layout.exp)
+
+        # buffers of size 2m
+        self.dr_y = np.zeros(2 * self.m, dtype=dtype)
+        self._last_step = np.zeros(2 * self.m, dtype=dtype)
+        self._anchor = np.empty(2 * self.m, dtype=dtype)
+        self.pi = np.empty(2 * self.m, dtype=dtype)
+        self.reflected = np.empty(2 * self.m, dtype=dtype)
+        self.step = np.empty(2 * self.m, dtype=dtype)
+
+        # buffers of size m
+        self._work = np.empty(self.m, dtype=dtype)
+        self._transformed = np.empty(self.m, dtype=dtype)
+        self._var = np.empty(self.m, dtype=dtype)
+
+        self.relaxation = 1.
+        self.iterations = 0
+        self.restarts = 0
+
+        # adaptive relaxation, see _adapt_relaxation
+        self._interval_norm = np.inf
+        self._last_rate = None
+        self._relaxation_change = self.RELAXATION_STEP
+
+        # stall detection, see _stalled
+        self._stall_norm = np.inf
+        self._stall_intervals = 0
+
+    @property
+    def nbytes(self):
+        """Memory of the orthogonal factor and the buffers, in bytes.
+
+        :returns: Bytes of the orthogonal factor and of the arrays of the
+            engine.
+        :rtype: int
+        """
+        return self.orthogonal.nbytes + sum(
+            array.nbytes for array in [
+                self.b, self.y0, self.var0, self.gap_direction, self.dr_y,
+                self._last_step, self._anchor, self.pi, self.reflected,
+                self.step, self._work, self._transformed, self._var])
+
+    @classmethod
+    def from_solver(cls, solver, fused=None, dtype=np.float64):
+        """Build from the QR-transformed data of a solver.
+
+        :param solver: Solver, after the QR transformation of the gap.
+        :type solver: cqr.Solver
+        :param fused: Whether to use the fused step, see the class.
+        :type fused: bool or None
+        :param dtype: Floating point type; with ``np.float32`` the orthogonal
+            factor, which must be dense, is copied in single precision.
+        :type dtype: type
+
+        :returns: Engine.
+        :rtype: DouglasRachford
+        """
+        data = cls.data_from_solver(solver)
+        if np.dtype(dtype) != data['orthogonal'].dtype:
+            data['orthogonal'] = data['orthogonal'].astype(dtype)
+        return cls(**data, fused=fused, dtype=dtype)
+
+    @staticmethod
+    def data_from_solver(solver):
+        """Constructor arguments from the QR-transformed data of a solver.
+
+        :param solver: Solver, after the QR transformation of the gap.
+        :type solver: cqr.Solver
+
+        :returns: Keyword arguments, except ``fused``.
+        :rtype: dict
+        """
+        orthogonal = solver.matrix_qr_transf.orthogonal
+        rank = solver.matrix_qr_transf.shape[1]
+        assert solver.nullspace_projector.orthogonal is orthogonal
+        assert solver.nullspace_projector.start == rank
+
+        # first column of the reflection, H H^T = I - g g^T
+        reflector = solver.gap_NS
+        gap_direction = (-reflector.beta * reflector.vector[0]) * \
+            reflector.vector
+        gap_direction[0] += 1.
+
+        return {
+            'orthogonal': orthogonal, 'rank': rank, 'b': solver.b_qr_transf,
+            'y0': solver.y0, 'var0': solver.var0,
+            'gap_direction': gap_direction,
+            'cone_layout': solver.cone_layout}
+
+    def cone_project(self, sy, pi, reflected):
+        """Project on the cone and reflect, ``reflected = 2 pi - sy``.
+
+        :param sy: Input, not modified.
+        :type sy: np.array
+        :param pi: Output, projection.
+        :type pi: np.array
+        :param reflected: Output, reflection.
+        :type reflected: np.array
+        """
+        m, layout = self.m, self.cone_layout
+        layout.project(
+            sy[:m], pi[:m], reflected[:m], self._second_order_cones,
+            exponential_cones=self._exponential_cones)
+        layout.project(
+            sy[m:], pi[m:], reflected[m:], self._second_order_cones,
+            dual=True, exponential_cones=self._exponential_cones)
+
+    def linspace_project(self, sy, out):
+        """Project on the affine subspace.
+
+        :param sy: Input, not modified.
+        :type sy: np.array
+        :param out: Output, can not be the input.
+        :type out: np.array
+        """
+        m, rank = self.m, self.rank
+        work, transformed, var = self._work, self._transformed, self._var
+
+        # var = [Q_1^T (b - s); Q_2^T (y - y0)] - var0
+        np.subtract(self.b, sy[:m], out=work)
+        self.orthogonal.rmatvec_to(work, transformed)
+        var[:rank] = transformed[:rank]
+        if rank < m:
+            np.subtract(sy[m:], self.y0, out=work)
+            self.orthogonal.rmatvec_to(work, transformed)
+            var[rank:] = transformed[rank:]
+        var -= self.var0
+
+        # project on gap constraint
+        np.multiply(
+            self.gap_direction, np.dot(self.gap_direction, var),
+            out=transformed)
+        var -= transformed
+        var += self.var0
+
+        # s = b - Q_1 x, y = y0 + Q_2 z
+        work[:rank] = var[:rank]
+        work[rank:] = 0.
+        self.orthogonal.matvec_to(work, out[:m])
+        np.subtract(self.b, out[:m], out=out[:m])
+        if rank < m:
+            work[:rank] = 0.
+            work[rank:] = var[rank:]
+            self.orthogonal.matvec_to(work, out[m:])
+            out[m:] += self.y0
+        else:
+            out[m:] = self.y0
+
+    def compute_step(self):
+        """Compute the step from ``dr_y`` into ``step``.
+
+        :returns: Norm of the step.
+        :rtype: float
+        """
+        if self.fused:
+            return fused_step(
+                self.orthogonal.householder_reflections,
+                self.orthogonal.householder_coefficients, self.rank, self.b,
+                self.y0, self.var0, self.gap_direction, self.zero,
+                self.nonneg, self.cone_layout.soc_sizes, self.dr_y, self.pi,
+                self.reflected, self.step, self._work, self._transformed)
+        self.cone_project(self.dr_y, self.pi, self.reflected)
+        self.linspace_project(self.reflected, self.step)
+        self.step -= self.pi
+        return np.sqrt(np.dot(self.step, self.step))
+
+    def _relaxed_step(self):
+        """Compute the step, scaled by the relaxation.
+
+        :returns: Norm of the step before relaxation.
+        :rtype: float
+        """
+        norm = self.compute_step()
+        if self.relaxation != 1.:
+            self.step *= self.relaxation
+        return norm
+
+    def iterate(self):
+        """One iteration, ``dr_y`` is updated and ``step`` is its change.
+
+        :returns: Norm of the step before relaxation.
+        :rtype: float
+        """
+        norm = self._relaxed_step()
+        self.dr_y += self.step
+        return norm
+
+    def difference_converged(self):
+        """Check if the step converged since the last call.
+
+        On infeasible or unbounded programs the iterates diverge and their
+        differences, the steps, converge to a non-zero vector from which
+        certificates are built. This costs two vector operations.
+
+        :returns: Whether the change of the step relative to its norm is
+            below ``DIFFERENCE_TOLERANCE``.
+        :rtype: bool
+        """
+        change = self._last_step
+        change -= self.step
+        change_norm = np.sqrt(np.dot(change, change))
+        change[:] = self.step
+        return bool(change_norm <= self.DIFFERENCE_TOLERANCE * np.sqrt(
+            np.dot(self.step, self.step)))
+
+    def _halpern_update(self, anchor_iterations):
+        """Anchored update, in place.
+
+        :param anchor_iterations: Iterations since the anchor was set.
+        :type anchor_iterations: int
+        """
+        # sy = anchor + (k + 1) / (k + 2) (sy + step - anchor)
+        self.dr_y += self.step
+        self.dr_y -= self._anchor
+        self.dr_y *= (anchor_iterations + 1.) / (anchor_iterations + 2.)
+        self.dr_y += self._anchor
+
+    def _safeguarded_step(self, acceleration, accelerated, norm):
+        """Compute step at new iterate, reject it if accelerated and worse.
+
+        :returns: Norm of the step.
+        :rtype: float
+        """
+        new_norm = self._relaxed_step()
+        if accelerated:
+            if new_norm <= acceleration.safeguard * norm:
+                acceleration.accepted += 1
+            else:
+                acceleration.rejected += 1
+                np.add(acceleration.x, acceleration.g, out=self.dr_y)
+                new_norm = self._relaxed_step()
+        if acceleration is not None:
+            acceleration.update(self.dr_y, self.step)
+        return new_norm
+
+    def _adapt_relaxation(self, norm):
+        """Move relaxation in the direction that improved contraction.
+
+        The observed contraction of the step norm over the last interval is
+        compared with the one of the interval before; if it got worse, the
+        direction of the relaxation change is reversed and its size halved.
+
+        :param norm: Current norm of the step before relaxation.
+        :type norm: float
+
+        :returns: Whether the relaxation changed; if so ``step`` is scaled.
+        :rtype: bool
+        """
+        if not 0. < norm < np.inf:
+            return False
+        rate = np.log(norm / self._interval_norm)
+        if self._last_rate is not None and rate > self._last_rate:
+            self._relaxation_change *= -.5
+        self._last_rate = rate
+        self._interval_norm = norm
+        old = self.relaxation
+        self.relaxation = float(np.clip(
+            old + self._relaxation_change, *self.RELAXATION_BOUNDS))
+        if self.relaxation == old:
+            return False
+        self.step *= self.relaxation / old
+        return True
+
+    def _stalled(self, norm):
+        """Check if the step norm stopped decreasing, see ``STALL_*``.
+
+        :param norm: Current norm of the step.
+        :type norm: float
+
+        :returns: Whether the iteration stalled.
+        :rtype: bool
+        """
+        if norm <= self.STALL_ROUNDOFF * np.finfo(self.dtype).eps * np.sqrt(
+                np.dot(self.dr_y, self.dr_y)):
+            return True
+        if norm > self.STALL_DECREASE * self._stall_norm:
+            self._stall_intervals += 1
+        else:
+            self._stall_norm = norm
+            self._stall_intervals = 0
+        return self._stall_intervals >= self.STALL_INTERVALS
+
+    def solve(
+            self, dr_y, max_iter, eps, acceleration=None, relaxation=1.,
+            adaptive_relaxation=False, time_limit=None, check=None,
+            certificate=None, algorithm='DR', stall=False,
+            reset_acceleration=True):
+        """Run the iteration.
+
+        :param dr_y: Initial point, copied.
+        :type dr_y: np.array
+        :param max_iter: Maximum number of iterations.
+        :type max_iter: int
+        :param eps: Convergence tolerance on the norm of the step.
+        :type eps: float
+        :param acceleration: Anderson acceleration, its history is reset
+            unless ``reset_acceleration`` is False. Accelerated iterates
+            whose step is larger than the safeguard factor times the current
+            one are replaced by the plain iterate. Default None, no
+            acceleration.
+        :type acceleration: cqr.anderson.AndersonAcceleration or None
+        :param relaxation: Relaxation of the step, in ``(0, 2)``. Default 1,
+            no relaxation.
+        :type relaxation: float
+        :param adaptive_relaxation: Whether to tune the relaxation, starting
+            from the given one, from the observed contraction of the step
+            norm, every ``RELAXATION_INTERVAL`` iterations. The final value
+            is in ``relaxation``. Default False.
+        :type adaptive_relaxation: bool
+        :param time_limit: Wall-clock time limit in seconds. Default None, no
+            limit.
+        :type time_limit: float or None
+        :param check: Termination check, called with ``dr_y`` every
+            ``TERMINATION_INTERVAL`` iterations; the iteration stops if it
+            returns True. Default None.
+        :type check: callable or None
+        :param certificate: Certificate check, called with the converged
+            step if the test of :meth:`difference_converged`, done at an
+            adaptive interval, passes; the iteration stops if it returns
+            True. Default None.
+        :type certificate: callable or None
+        :param algorithm: ``'DR'``, plain iteration, ``'HALPERN'``, anchored
+            to the initial point, or ``'RESTARTED_HALPERN'``, with the anchor
+            reset to the current iterate when the step norm decreased enough,
+            see ``RESTART_*``; the number of restarts is in ``restarts``.
+            Halpern variants can not be accelerated. Default ``'DR'``.
+        :type algorithm: str
+        :param stall: Whether to stop when the step norm, tested every
+            ``TERMINATION_INTERVAL`` iterations, stops decreasing, e.g.,
+            because it reached the accuracy of the floating point type.
+            Default False.
+        :type stall: bool
+        :param reset_acceleration: Whether to reset the history of the
+            acceleration; if False, it is continued, e.g., restored from a
+            checkpoint, and its last point must be ``dr_y`` with its step.
+            Default True.
+        :type reset_acceleration: bool
+
+        :returns: ``'converged'``, ``'certificate'`` if the certificate check
+            passed, ``'tolerance'`` if the termination check
+            passed, ``'stalled'``, ``'max_iter'`` or ``'time_limit'``. The
+            last iterate is in ``dr_y`` and the number of iterations in
+            ``iterations``.
+        :rtype: str
+        """
+        assert 0. < relaxation < 2.
+        assert algorithm in ALGORITHMS
+        anchored = algorithm != 'DR'
+        assert not (anchored and acceleration is not None)
+        deadline = None if time_limit is None else \
+            time.perf_counter() + time_limit
+        self.dr_y[:] = dr_y
+        self.relaxation = relaxation
+        norm = self._relaxed_step()
+        if acceleration is not None and reset_acceleration:
+            acceleration.reset()
+            acceleration.update(self.dr_y, self.step)
+        self._anchor[:] = self.dr_y
+        anchor_iterations = 0
+        restart_norm = norm
+        self.restarts = 0
+        self._last_step[:] = 0.
+        difference_interval = self.DIFFERENCE_INTERVAL
+        next_difference_test = difference_interval
+        if adaptive_relaxation:
+            self._interval_norm = norm
+            self._last_rate = None
+            self._relaxation_change = self.RELAXATION_STEP
+        self._stall_norm = norm
+        self._stall_intervals = 0
+
+        for i in range(max_iter):
+            self.iterations = i
+            if norm < eps:
+                return 'converged'
+            if deadline is not None and time.perf_counter() > deadline:
+                return 'time_limit'
+            if check is not None and i % self.TERMINATION_INTERVAL == \
+                    self.TERMINATION_INTERVAL - 1:
+                if check(self.dr_y):
+                    return 'tolerance'
+            if stall and i % self.TERMINATION_INTERVAL == \
+                    self.TERMINATION_INTERVAL - 1 and self._stalled(norm):
+                return 'stalled'
+            accelerated = False
+            if acceleration is not None:
+                accelerated = acceleration.extrapolate(out=self.dr_y)
+            elif anchored:
+                self._halpern_update(anchor_iterations)
+                anchor_iterations += 1
+            else:
+                self.dr_y += self.step
+            last_norm = norm
+            norm = self._safeguarded_step(acceleration, accelerated, norm)
+            if algorithm == 'RESTARTED_HALPERN' and (
+                    norm <= self.RESTART_SUFFICIENT * restart_norm or (
+                        norm <= self.RESTART_NECESSARY * restart_norm
+                        and norm > last_norm) or anchor_iterations
+                    >= self.RESTART_ARTIFICIAL * (i + 1)):
+                self._anchor[:] = self.dr_y
+                anchor_iterations = 0
+                restart_norm = norm
+                self.restarts += 1
+            if certificate is not None and i + 1 == next_difference_test:
+                if self.difference_converged():
+                    if certificate(self.step):
+                        self.iterations = i + 1
+                        return 'certificate'
+                    difference_interval = min(
+                        2 * difference_interval, self.MAX_DIFFERENCE_INTERVAL)
+                next_difference_test += difference_interval
+            if adaptive_relaxation and i % self.RELAXATION_INTERVAL == \
+                    self.RELAXATION_INTERVAL - 1:
+                if self._adapt_relaxation(norm) and acceleration is not None:
+                    # the fixed-point operator changed
+                    acceleration.reset()
+                    acceleration.update(self.dr_y, self.step)
+        self.iterations = max_iter
+        return 'max_iter'
@@ -23,14 +23,9 @@ import numpy as np
 import scipy.sparse as sp
 import scipy.sparse.linalg as spl
 
-logger = logging.getLogger(__name__)
-
+from .cones import ConeLayout
 
-def _cones_separation_matrix(zero, nonneg, second_order):
-    """Sparse matrix that maps entries into which cone they belong to."""
-    return sp.block_diag(
-        [sp.eye(zero+nonneg)] + [np.ones((1, el)) for el in second_order]
-        + [1.])  # we add the one for use below
+logger = logging.getLogger(__name__)
 
 
 def hsde_ruiz_equilibration(  # pylint: disable=too-many-arguments
@@ -44,8 +39,10 @@ def hsde_ruiz_equilibration(  # pylint: disable=too-many-arguments
     :type b: np.array
     :param b: Cost vector.
     :type b: np.array
-    :param b: Dimensions of the problem cones.
-    :type dimensions: dict
+    :param dimensions: Layout of the problem cones, or dict with keys
+        ``'zero'``, ``'nonneg'`` and ``'second_order'``, and optionally
+        ``'exponential'``.
+    :type dimensions: cqr.cones.ConeLayout or dict
     :param d: Initial value of the row scaler; if None, the default, will be
         initialized with ones. If provided you must ensure that the entries
         corresponding to the same cone are all equal.
@@ -77,11 +74,11 @@ def hsde_ruiz_equilibration(  # pylint: disable=too-many-arguments
         np.array, np.array)
     """
 
-    cones_mapper = _cones_separation_matrix(**dimensions)
-
-    # TODO: very inefficient, just to test
-    bool_mapper = cones_mapper.todense().astype(int).astype(bool).A
-    cones_sizes = cones_mapper.sum(1).A1.ravel()
+    if not isinstance(dimensions, ConeLayout):
+        dimensions = ConeLayout(
+            dimensions['zero'], dimensions['nonneg'],
+            dimensions['second_order'], dimensions.get('exponential', 0))
+    layout = dimensions
 
     m, n = matrix.shape
 
@@ -118,8 +115,9 @@ def hsde_ruiz_equilibration(  # pylint: disable=too-many-arguments
             norm_rows_and_c[-1] = np.linalg.norm(work_c)
 
             # here we apply the cones separation, each block gets equal values
-            norm_rows_and_c = np.sqrt(
-                cones_mapper.T @ ((cones_mapper @ norm_rows_and_c**2)/cones_sizes))
+            norm_rows_and_c[:-1] = np.sqrt(layout.expand(
+                layout.block_reduce(norm_rows_and_c[:-1]**2)
+                / layout.block_sizes))
 
             norm_cols_and_b[:-1] = spl.norm(work_matrix, axis=0)**2
             norm_cols_and_b[:-1] += work_c**2
@@ -133,10 +131,8 @@ def hsde_ruiz_equilibration(  # pylint: disable=too-many-arguments
             norm_rows_and_c[-1] = np.max(work_c)
 
             # here we apply the cones separation, each block gets equal values
-            maxes = np.array(
-                [np.max(norm_rows_and_c[bool_mapper[i]])
-                    for i in range(len(bool_mapper))])
-            norm_rows_and_c = cones_mapper.T @ maxes
+            norm_rows_and_c[:-1] = layout.expand(
+                layout.block_reduce(norm_rows_and_c[:-1], np.maximum))
 
             norm_cols_and_b[:-1] = work_matrix.max(axis=0).todense().flatten()
             norm_cols_and_b[:-1] += np.maximum(norm_cols_and_b[:-1], work_c)
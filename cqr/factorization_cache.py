@@ -0,0 +1,239 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""Cache of matrix factorizations, for parametric re-solves.
+
+When the same program matrix is solved many times with different ``b`` and
+``c`` only the equilibration of the matrix and its QR factorization can be
+reused. Entries are dictionaries of :class:`cqr.Solver` attributes, keyed by a
+fingerprint of the CSC arrays, cone dimensions and QR backend.
+
+When only the values of the matrix change, its sparsity pattern being the
+same, the fill-reducing column ordering of the sparse QR can be reused. Those
+are stored separately, keyed by a fingerprint of the sparsity pattern.
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import scipy as sp
+
+
+def _nbytes(value, _seen=None):
+    """Estimate memory used by a cached value, in bytes.
+
+    Shared arrays (views, factors referenced by more than one operator) are
+    counted once.
+    """
+    if _seen is None:
+        _seen = set()
+    if isinstance(value, np.ndarray):
+        while isinstance(value.base, np.ndarray):
+            value = value.base
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if sp.sparse.issparse(value):
+        return sum(
+            _nbytes(getattr(value, attr), _seen)
+            for attr in ('data', 'indices', 'indptr', 'row', 'col')
+            if hasattr(value, attr))
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(el, _seen) for el in value)
+    if isinstance(value, dict):
+        return sum(_nbytes(el, _seen) for el in value.values())
+    if isinstance(value, sp.sparse.linalg.LinearOperator):
+        return sum(_nbytes(el, _seen) for el in vars(value).values())
+    if callable(value) and getattr(value, '__closure__', None):
+        # operators built from lambdas hold their factors in closures
+        return sum(
+            _nbytes(cell.cell_contents, _seen) for cell in value.__closure__)
+    return 0
+
+
+def fingerprint(matrix, zero, nonneg, soc, qr, exp=0):
+    """Fingerprint of program matrix, cone dimensions and QR backend.
+
+    :param matrix: Problem data matrix.
+    :type matrix: sp.sparse.csc_matrix
+    :param zero: Size of the zero cone.
+    :type zero: int
+    :param nonneg: Size of the non-negative cone.
+    :type nonneg: int
+    :param soc: Sizes of the second-order cones.
+    :type soc: iterable
+    :param qr: QR backend.
+    :type qr: str
+    :param exp: Number of exponential cones. Default 0.
+    :type exp: int
+
+    :returns: Hexadecimal digest.
+    :rtype: str
+    """
+    matrix = sp.sparse.csc_matrix(matrix)
+    if not matrix.has_canonical_format:
+        matrix = matrix.copy()
+        matrix.sum_duplicates()
+    hasher = hashlib.blake2b(digest_size=16)
+    cones = (zero, nonneg, tuple(soc)) + ((exp,) if exp else ())
+    hasher.update(repr((matrix.shape,) + cones + (qr,)).encode())
+    for array in (matrix.indptr, matrix.indices, matrix.data):
+        hasher.update(np.ascontiguousarray(array).data)
+    return hasher.hexdigest()
+
+
+def sparsity_fingerprint(matrix):
+    """Fingerprint of the sparsity pattern of a matrix.
+
+    :param matrix: Matrix.
+    :type matrix: sp.sparse.csc_matrix
+
+    :returns: Hexadecimal digest.
+    :rtype: str
+    """
+    matrix = sp.sparse.csc_matrix(matrix)
+    if not matrix.has_canonical_format:
+        matrix = matrix.copy()
+        matrix.sum_duplicates()
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(repr(matrix.shape).encode())
+    for array in (matrix.indptr, matrix.indices):
+        hasher.update(np.ascontiguousarray(array).data)
+    return hasher.hexdigest()
+
+
+class FactorizationCache:
+    """Bounded LRU cache of factorizations.
+
+    :param max_entries: Maximum number of stored factorizations.
+    :type max_entries: int
+    :param max_bytes: Memory budget for all stored factorizations, estimated
+        from the sizes of the arrays they hold. Factorizations larger than the
+        budget are not stored.
+    :type max_bytes: int
+    :param max_orderings: Maximum number of stored column orderings. These
+        are small, they are not counted in the memory budget.
+    :type max_orderings: int
+    """
+
+    def __init__(self, max_entries=16, max_bytes=2**30, max_orderings=64):
+        assert max_entries > 0
+        assert max_bytes > 0
+        assert max_orderings > 0
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_orderings = max_orderings
+        self._entries = OrderedDict()
+        self._orderings = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.ordering_hits = 0
+        self.ordering_misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Get factorization, or None if missing.
+
+        :param key: Fingerprint of the factorization.
+        :type key: str
+
+        :returns: Stored attributes, or None.
+        :rtype: dict or None
+        """
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return self._entries[key][0]
+
+    def put(self, key, entry):
+        """Store factorization, evicting least recently used ones.
+
+        :param key: Fingerprint of the factorization.
+        :type key: str
+        :param entry: Attributes to store.
+        :type entry: dict
+        """
+        nbytes = _nbytes(entry)
+        if key in self._entries:
+            self.nbytes -= self._entries.pop(key)[1]
+        if nbytes > self.max_bytes:
+            return
+        self._entries[key] = (entry, nbytes)
+        self.nbytes += nbytes
+        while (len(self._entries) > self.max_entries) or (
+                self.nbytes > self.max_bytes):
+            _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+            self.nbytes -= evicted_nbytes
+            self.evictions += 1
+
+    def get_ordering(self, key):
+        """Get column ordering, or None if missing.
+
+        :param key: Fingerprint of the sparsity pattern.
+        :type key: str
+
+        :returns: Column permutation, or None.
+        :rtype: np.array or None
+        """
+        if key not in self._orderings:
+            self.ordering_misses += 1
+            return None
+        self.ordering_hits += 1
+        self._orderings.move_to_end(key)
+        return self._orderings[key]
+
+    def put_ordering(self, key, permutation):
+        """Store column ordering, evicting least recently used ones.
+
+        :param key: Fingerprint of the sparsity pattern.
+        :type key: str
+        :param permutation: Column permutation.
+        :type permutation: np.array
+        """
+        self._orderings[key] = permutation
+        self._orderings.move_to_end(key)
+        while len(self._orderings) > self.max_orderings:
+            self._orderings.popitem(last=False)
+
+    def clear(self):
+        """Remove all stored factorizations, counters are kept."""
+        self._entries.clear()
+        self._orderings.clear()
+        self.nbytes = 0
+
+    def statistics(self):
+        """Cache counters.
+
+        :returns: Hits, misses, evictions, number of entries and bytes used,
+            hits and misses of the column orderings.
+        :rtype: dict
+        """
+        return {
+            'hits': self.hits, 'misses': self.misses,
+            'evictions': self.evictions, 'entries': len(self._entries),
+            'nbytes': self.nbytes, 'ordering_hits': self.ordering_hits,
+            'ordering_misses': self.ordering_misses}
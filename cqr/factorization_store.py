@@ -0,0 +1,375 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""On-disk store of factorizations, memory-mapped by many processes.
+
+It has the same interface as :class:`cqr.factorization_cache.
+FactorizationCache`, so it can be passed to :class:`cqr.Solver` in its place.
+Each factorization is a file in a directory, named by its fingerprint. The
+first process that factorizes a matrix writes the file; the others load it
+as read-only memory maps, so the pages are shared through the page cache.
+
+The file format is:
+
+- 8 bytes magic string, ``CQRFACT`` followed by a zero byte;
+- format version and header length, little-endian 64 bit unsigned integers;
+- JSON header, with the list of arrays (dtype, shape, memory order and
+  offset) and the encoded factorization, which refers to arrays by index;
+- the arrays, raw, each aligned to 64 bytes.
+
+Only plain data and the factor classes of :mod:`cqr.factors` are encoded;
+loading a file never executes code from it.
+"""
+
+import json
+import os
+import struct
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import scipy as sp
+
+from . import factors
+
+MAGIC = b'CQRFACT\x00'
+FORMAT_VERSION = 1
+_ALIGNMENT = 64
+
+# classes whose instances can be encoded, by their state
+_CLASSES = {
+    cls.__name__: cls for cls in [
+        factors.SparseHouseholderQ, factors.DenseHouseholderQ,
+        factors.TSQRHouseholderQ, factors.AppendedRowsQ,
+        factors.DeletedRowQ, factors.ColumnBlock,
+        factors.HouseholderReflector, factors.TriangularFactor]}
+
+# names of the same classes, looked up by the exact type of instances, so
+# that subclasses are not encoded as their base
+_CLASS_NAMES = {cls: name for name, cls in _CLASSES.items()}
+
+_SPARSE = {'csc': sp.sparse.csc_matrix, 'csr': sp.sparse.csr_matrix}
+
+
+class _Encoder:
+    """Encode factorization as JSON-compatible value and list of arrays."""
+
+    def __init__(self):
+        self.arrays = []
+        self.objects = []
+        self._memo = {}
+
+    def encode(self, value):
+        """Encode a value, shared arrays and objects are stored once.
+
+        :param value: Plain data, array, sparse matrix, or instance of one of
+            the factor classes, possibly nested.
+        :type value: object
+
+        :raises TypeError: If the value, or one nested in it, can not be
+            stored.
+
+        :returns: JSON-compatible value; arrays are appended to
+            ``self.arrays`` and objects to ``self.objects``, and referred to
+            by index.
+        :rtype: object
+        """
+        if value is None or isinstance(value, (bool, str)):
+            return value
+        if isinstance(value, np.bool_):
+            return bool(value)
+        if isinstance(value, (int, np.integer)):
+            return int(value)
+        if isinstance(value, (float, np.floating)):
+            return {'float': repr(float(value))}
+        if isinstance(value, np.dtype):
+            return {'dtype': value.str}
+        if isinstance(value, (tuple, list)):
+            return {'list': [self.encode(el) for el in value],
+                    'tuple': isinstance(value, tuple)}
+        if isinstance(value, dict):
+            return {'dict': {key: self.encode(el)
+                             for key, el in value.items()}}
+        if id(value) in self._memo:
+            return self._memo[id(value)]
+        if isinstance(value, np.ndarray):
+            self.arrays.append(value)
+            result = {'array': len(self.arrays) - 1}
+        elif sp.sparse.issparse(value) and value.format in _SPARSE:
+            result = {'sparse': value.format, 'shape': list(value.shape),
+                      'data': self.encode(value.data),
+                      'indices': self.encode(value.indices),
+                      'indptr': self.encode(value.indptr)}
+        elif type(value) in _CLASS_NAMES:
+            # the memo is set before the state, which could refer back to it
+            self.objects.append(None)
+            result = {'object': len(self.objects) - 1}
+            self._memo[id(value)] = result
+            self.objects[result['object']] = {
+                'class': _CLASS_NAMES[type(value)],
+                'state': self.encode(vars(value))}
+        else:
+            raise TypeError(f'Can not store value of type {type(value)}.')
+        self._memo[id(value)] = result
+        return result
+
+
+class _Decoder:
+    """Decode factorization from JSON-compatible value and arrays."""
+
+    def __init__(self, arrays, objects):
+        self.arrays = arrays
+        self.objects = objects
+        self._decoded = [None] * len(objects)
+
+    def decode(self, value):
+        """Decode a value.
+
+        :param value: JSON-compatible value, as returned by
+            :meth:`_Encoder.encode`.
+        :type value: object
+
+        :raises ValueError: If the value is not a valid encoding.
+
+        :returns: Decoded value; arrays are the ones in ``self.arrays``,
+            and objects are decoded once.
+        :rtype: object
+        """
+        if value is None or isinstance(value, (bool, str, int)):
+            return value
+        if 'float' in value:
+            return float(value['float'])
+        if 'dtype' in value:
+            return np.dtype(value['dtype'])
+        if 'list' in value:
+            result = [self.decode(el) for el in value['list']]
+            return tuple(result) if value['tuple'] else result
+        if 'dict' in value:
+            return {key: self.decode(el) for key, el in value['dict'].items()}
+        if 'array' in value:
+            return self.arrays[value['array']]
+        if 'sparse' in value:
+            return _SPARSE[value['sparse']](
+                (self.decode(value['data']), self.decode(value['indices']),
+                 self.decode(value['indptr'])),
+                shape=tuple(value['shape']), copy=False)
+        if 'object' in value:
+            index = value['object']
+            if self._decoded[index] is None:
+                encoded = self.objects[index]
+                result = _CLASSES[encoded['class']].__new__(
+                    _CLASSES[encoded['class']])
+                self._decoded[index] = result
+                result.__dict__.update(self.decode(encoded['state']))
+            return self._decoded[index]
+        raise ValueError('Corrupted factorization file.')
+
+
+def _aligned(offset):
+    """Next multiple of the alignment."""
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def save_factorization(path, entry, key=None):
+    """Write factorization to file, atomically.
+
+    :param path: File path.
+    :type path: str or pathlib.Path
+    :param entry: Solver attributes, as stored in the factorization cache.
+    :type entry: dict
+    :param key: Fingerprint of the factorization, stored in the header.
+    :type key: str or None
+    """
+    encoder = _Encoder()
+    encoded = encoder.encode(entry)
+    arrays = []
+    offset = 0
+    for array in encoder.arrays:
+        order = 'F' if (
+            array.flags.f_contiguous and not array.flags.c_contiguous) \
+            else 'C'
+        arrays.append({
+            'dtype': array.dtype.str, 'shape': list(array.shape),
+            'order': order, 'offset': offset})
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({
+        'key': key, 'arrays': arrays, 'objects': encoder.objects,
+        'entry': encoded}).encode()
+    start = _aligned(len(MAGIC) + 16 + len(header))
+
+    path = Path(path)
+    with tempfile.NamedTemporaryFile(
+            dir=path.parent, prefix=path.name, suffix='.tmp',
+            delete=False) as file:
+        try:
+            file.write(MAGIC)
+            file.write(struct.pack('<QQ', FORMAT_VERSION, len(header)))
+            file.write(header)
+            for array, description in zip(encoder.arrays, arrays):
+                file.seek(start + description['offset'])
+                file.write(np.asarray(array).tobytes(
+                    order=description['order']))
+            file.truncate(start + offset)
+            file.flush()
+            os.fsync(file.fileno())
+        except BaseException:
+            os.unlink(file.name)
+            raise
+    os.replace(file.name, path)
+
+
+def load_factorization(path):
+    """Load factorization from file, arrays are read-only memory maps.
+
+    :param path: File path.
+    :type path: str or pathlib.Path
+
+    :raises ValueError: If the file is not a factorization, or it has a
+        different format version.
+
+    :returns: Fingerprint and solver attributes.
+    :rtype: tuple
+    """
+    with open(path, 'rb') as file:
+        magic = file.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a factorization file.')
+        version, header_length = struct.unpack('<QQ', file.read(16))
+        if version != FORMAT_VERSION:
+            raise ValueError(
+                f'{path} has format version {version}, this version of CQR'
+                f' reads version {FORMAT_VERSION}.')
+        header = json.loads(file.read(header_length))
+    start = _aligned(len(MAGIC) + 16 + header_length)
+
+    mapped = np.memmap(path, dtype=np.uint8, mode='r')
+    arrays = []
+    for description in header['arrays']:
+        dtype = np.dtype(description['dtype'])
+        count = int(np.prod(description['shape'], dtype=np.int64))
+        offset = start + description['offset']
+        array = mapped[offset:offset + count * dtype.itemsize].view(dtype)
+        arrays.append(array.reshape(
+            description['shape'], order=description['order']))
+    return header['key'], _Decoder(arrays, header['objects']).decode(
+        header['entry'])
+
+
+class FactorizationStore:
+    """Directory of factorization files, used like a factorization cache.
+
+    Column orderings of the sparse QR are stored in the same directory.
+
+    :param directory: Directory of the files, created if missing.
+    :type directory: str or pathlib.Path
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.ordering_hits = 0
+        self.ordering_misses = 0
+
+    def _path(self, key, suffix):
+        return self.directory / f'{key}{suffix}'
+
+    def __contains__(self, key):
+        return self._path(key, '.cqr').exists()
+
+    def __len__(self):
+        return len(list(self.directory.glob('*.cqr')))
+
+    def get(self, key):
+        """Load factorization, or None if missing.
+
+        :param key: Fingerprint of the factorization.
+        :type key: str
+
+        :returns: Stored attributes, or None.
+        :rtype: dict or None
+        """
+        try:
+            stored_key, entry = load_factorization(self._path(key, '.cqr'))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        assert stored_key == key
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        """Write factorization.
+
+        :param key: Fingerprint of the factorization.
+        :type key: str
+        :param entry: Attributes to store.
+        :type entry: dict
+        """
+        save_factorization(self._path(key, '.cqr'), entry, key=key)
+
+    def get_ordering(self, key):
+        """Load column ordering, or None if missing.
+
+        :param key: Fingerprint of the sparsity pattern.
+        :type key: str
+
+        :returns: Column permutation, or None.
+        :rtype: np.array or None
+        """
+        try:
+            result = np.load(self._path(key, '.ordering.npy'))
+        except FileNotFoundError:
+            self.ordering_misses += 1
+            return None
+        self.ordering_hits += 1
+        return result
+
+    def put_ordering(self, key, permutation):
+        """Write column ordering.
+
+        :param key: Fingerprint of the sparsity pattern.
+        :type key: str
+        :param permutation: Column permutation.
+        :type permutation: np.array
+        """
+        path = self._path(key, '.ordering.npy')
+        with tempfile.NamedTemporaryFile(
+                dir=self.directory, suffix='.tmp', delete=False) as file:
+            np.save(file, permutation)
+        os.replace(file.name, path)
+
+    def clear(self):
+        """Remove all stored files, counters are kept."""
+        for path in self.directory.glob('*.cqr'):
+            path.unlink()
+        for path in self.directory.glob('*.ordering.npy'):
+            path.unlink()
+
+    def statistics(self):
+        """Store counters.
+
+        :returns: Hits, misses, number of files and bytes used on disk, hits
+            and misses of the column orderings.
+        :rtype: dict
+        """
+        paths = list(self.directory.glob('*.cqr'))
+        return {
+            'hits': self.hits, 'misses': self.misses,
+            'entries': len(paths),
+            'nbytes': sum(path.stat().st_size for path in paths),
+            'ordering_hits': self.ordering_hits,
+            'ordering_misses': self.ordering_misses}
@@ -0,0 +1,1036 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""Factors of QR decompositions, as linear operators.
+
+The orthogonal factor is never formed. It is stored as a sequence of
+Householder reflections, which is what QR algorithms produce, and is applied
+one reflection at a time (or in blocks, by LAPACK, for dense matrices). The
+solver only uses blocks of consecutive columns of it, see
+:class:`ColumnBlock`. The triangular factor is kept sparse, with its column
+permutation.
+"""
+
+import numpy as np
+import scipy as sp
+
+# this is the SPQR qmult kernel compiled in PySPQR
+from _pyspqr import q_multiply as _q_multiply
+
+from .fused_step import _jit
+
+# number of Householder reflections applied together by LAPACK
+_BLOCK_SIZE = 32
+
+
+@_jit
+def _rotate_forward(vector, cosines, sines):
+    """Apply Givens rotations on adjacent coordinates, first to last."""
+    for i in range(len(cosines)):
+        first = vector[i]
+        second = vector[i + 1]
+        vector[i] = cosines[i] * first - sines[i] * second
+        vector[i + 1] = sines[i] * first + cosines[i] * second
+
+
+@_jit
+def _rotate_backward(vector, cosines, sines):
+    """Apply transposed Givens rotations, last to first."""
+    for i in range(len(cosines) - 1, -1, -1):
+        first = vector[i]
+        second = vector[i + 1]
+        vector[i] = cosines[i] * first + sines[i] * second
+        vector[i + 1] = -sines[i] * first + cosines[i] * second
+
+
+class OrthogonalFactor(sp.sparse.linalg.LinearOperator):
+    """Base class of square orthogonal factors applied implicitly.
+
+    Subclasses implement ``matvec_inplace``, ``rmatvec_to`` and ``nbytes``.
+    """
+
+    def matvec_to(self, vector, result):
+        """Multiply by Q, writing into result.
+
+        :param vector: Input, overwritten.
+        :type vector: np.array
+        :param result: Output, can not be the input.
+        :type result: np.array
+        """
+        result[:] = self.matvec_inplace(vector)
+
+    def matmat_to(self, matrix, result):
+        """Multiply the columns of a matrix by Q, writing into result.
+
+        :param matrix: Input, Fortran-ordered, overwritten.
+        :type matrix: np.array
+        :param result: Output, Fortran-ordered, can not be the input.
+        :type result: np.array
+        """
+        for column in range(matrix.shape[1]):
+            self.matvec_to(matrix[:, column], result[:, column])
+
+    def rmatmat_to(self, matrix, result):
+        """Multiply the columns of a matrix by Q^T, writing into result.
+
+        :param matrix: Input, Fortran-ordered.
+        :type matrix: np.array
+        :param result: Output, Fortran-ordered.
+        :type result: np.array
+        """
+        for column in range(matrix.shape[1]):
+            self.rmatvec_to(matrix[:, column], result[:, column])
+
+    def _matvec(self, x):
+        return self.matvec_inplace(
+            np.array(x, dtype=float, copy=True).ravel())
+
+    def _rmatvec(self, x):
+        result = np.empty(self.shape[0])
+        self.rmatvec_to(np.ravel(x), result)
+        return result
+
+    def column_block(self, start, stop):
+        """Linear operator of consecutive columns.
+
+        :param start: First column.
+        :type start: int
+        :param stop: One past the last column.
+        :type stop: int
+
+        :returns: Block of columns.
+        :rtype: ColumnBlock
+        """
+        return ColumnBlock(self, start, stop)
+
+
+class SparseHouseholderQ(OrthogonalFactor):
+    """Square orthogonal factor of a sparse QR, in Householder form.
+
+    It is ``Q = P H_0 H_1 ... H_{k-1}``, where ``H_i = I - tau_i h_i h_i^T``
+    and ``P`` is the row permutation, ``Q @ x = (H_0 ... H_{k-1} x)[P]``.
+
+    :param householder_reflections: Householder vectors, one per column.
+    :type householder_reflections: sp.sparse.csc_matrix
+    :param householder_coefficients: Householder coefficients.
+    :type householder_coefficients: np.array
+    :param row_permutation: Row permutation.
+    :type row_permutation: np.array
+    """
+
+    def __init__(
+            self, householder_reflections, householder_coefficients,
+            row_permutation):
+        self.householder_reflections = sp.sparse.csc_matrix(
+            householder_reflections)
+        self.householder_coefficients = np.ascontiguousarray(
+            householder_coefficients, dtype=float)
+        # as intp, else indexing converts it at each product
+        self.row_permutation = np.ascontiguousarray(
+            row_permutation, dtype=np.intp)
+        m = len(self.row_permutation)
+        assert self.householder_reflections.shape[0] == m
+        assert self.householder_reflections.shape[1] == len(
+            self.householder_coefficients)
+        super().__init__(dtype=float, shape=(m, m))
+
+    @classmethod
+    def from_pyspqr(cls, q):
+        """Build from orthogonal factor returned by PySPQR.
+
+        :param q: Orthogonal factor.
+        :type q: pyspqr.HouseholderOrthogonal
+
+        :returns: Orthogonal factor.
+        :rtype: SparseHouseholderQ
+        """
+        return cls(
+            q.householder_reflections, q.householder_coefficients,
+            q.permutation_array)
+
+    @property
+    def nbytes(self):
+        """Memory used by the factor, in bytes.
+
+        :returns: Bytes of the arrays of the factor.
+        :rtype: int
+        """
+        h = self.householder_reflections
+        return (
+            h.data.nbytes + h.indices.nbytes + h.indptr.nbytes
+            + self.householder_coefficients.nbytes
+            + self.row_permutation.nbytes)
+
+    def _householder_multiply(self, vector, backward):
+        """Apply reflections in place, backward is the order for Q @ x."""
+        h = self.householder_reflections
+        _q_multiply(
+            len(vector), len(self.householder_coefficients), backward,
+            vector, self.householder_coefficients, h.data, h.indices,
+            h.indptr)
+
+    def matvec_inplace(self, vector):
+        """Multiply by Q, vector is used as workspace.
+
+        :param vector: Input, overwritten.
+        :type vector: np.array
+
+        :returns: Result.
+        :rtype: np.array
+        """
+        self._householder_multiply(vector, backward=True)
+        return vector[self.row_permutation]
+
+    def matvec_to(self, vector, result):
+        """Multiply by Q, writing into result.
+
+        :param vector: Input, overwritten.
+        :type vector: np.array
+        :param result: Output, can not be the input.
+        :type result: np.array
+        """
+        self._householder_multiply(vector, backward=True)
+        # with the default mode='raise', take buffers the output
+        np.take(vector, self.row_permutation, out=result, mode='clip')
+
+    def rmatvec_to(self, vector, result):
+        """Multiply by Q^T, writing into result.
+
+        :param vector: Input.
+        :type vector: np.array
+        :param result: Output.
+        :type result: np.array
+        """
+        result[self.row_permutation] = vector
+        self._householder_multiply(result, backward=False)
+
+
+class DenseHouseholderQ(OrthogonalFactor):
+    """Square orthogonal factor of a dense QR, in LAPACK Householder form.
+
+    This is the compact representation returned by ``geqrf``: the
+    Householder vectors are stored below the diagonal of an ``(m, k)`` array,
+    with ``k = min(m, n)``, so memory is ``O(mk)`` rather than ``O(m^2)``.
+    The reflections are grouped in blocks, each applied as ``I - V T V^T``
+    by ``gemqrt``; unlike ``ormqr``, it never writes the Householder vectors,
+    so they can be read-only, e.g., memory-mapped from a file.
+
+    :param householder_reflections: Output of ``geqrf``, only the lower
+        trapezoid is used.
+    :type householder_reflections: np.array
+    :param householder_coefficients: Householder coefficients.
+    :type householder_coefficients: np.array
+    :param dtype: Floating point type, ``np.float64`` (default) or
+        ``np.float32``, which halves memory and its traffic in the products.
+    :type dtype: type
+    """
+
+    def __init__(
+            self, householder_reflections, householder_coefficients,
+            dtype=np.float64):
+        dtype = np.dtype(dtype).type
+        assert dtype in (np.float64, np.float32)
+        self.householder_coefficients = np.ascontiguousarray(
+            householder_coefficients, dtype=dtype)
+        k = len(self.householder_coefficients)
+        self.householder_reflections = np.asfortranarray(
+            householder_reflections[:, :k], dtype=dtype)
+        m = self.householder_reflections.shape[0]
+        assert k <= m
+        self.block_reflector = self._block_reflector(
+            self.householder_reflections, self.householder_coefficients)
+        super().__init__(dtype=dtype, shape=(m, m))
+
+    def astype(self, dtype):
+        """Copy of the factor in another floating point type.
+
+        :param dtype: ``np.float64`` or ``np.float32``.
+        :type dtype: type
+
+        :returns: Orthogonal factor.
+        :rtype: DenseHouseholderQ
+        """
+        return DenseHouseholderQ(
+            self.householder_reflections, self.householder_coefficients,
+            dtype=dtype)
+
+    @staticmethod
+    def _block_reflector(householder_reflections, householder_coefficients):
+        """Triangular factors ``T`` of the blocks, as in ``geqrt``."""
+        k = len(householder_coefficients)
+        size = max(min(k, _BLOCK_SIZE), 1)
+        result = np.zeros(
+            (size, k), order='F', dtype=householder_reflections.dtype)
+        for start in range(0, k, size):
+            width = min(size, k - start)
+            vectors = np.tril(
+                householder_reflections[start:, start:start + width], -1)
+            vectors[np.arange(width), np.arange(width)] = 1.
+            products = vectors.T @ vectors
+            block = result[:width, start:start + width]
+            tau = householder_coefficients[start:start + width]
+            for i in range(width):
+                block[i, i] = tau[i]
+                block[:i, i] = -tau[i] * (block[:i, :i] @ products[:i, i])
+        return result
+
+    @classmethod
+    def from_matrix(cls, matrix, pivoting=False):
+        """Householder QR of a dense matrix.
+
+        :param matrix: Matrix to factorize.
+        :type matrix: np.array
+        :param pivoting: Whether to use column pivoting, ``geqp3``.
+        :type pivoting: bool
+
+        :returns: Orthogonal factor and upper triangular (or trapezoidal)
+            factor, with ``min(m, n)`` rows; if pivoting, also the column
+            permutation, so that ``matrix[:, permutation] = Q_1 R``.
+        :rtype: tuple
+        """
+        if pivoting:
+            (householder, coefficients), triangular, permutation = \
+                sp.linalg.qr(
+                    np.asarray(matrix, dtype=float), mode='raw',
+                    pivoting=True)
+            return cls(householder, coefficients), triangular, permutation
+        (householder, coefficients), triangular = sp.linalg.qr(
+            np.asarray(matrix, dtype=float), mode='raw')
+        return cls(householder, coefficients), triangular
+
+    @property
+    def nbytes(self):
+        """Memory used by the factor, in bytes.
+
+        :returns: Bytes of the arrays of the factor.
+        :rtype: int
+        """
+        return (
+            self.householder_reflections.nbytes
+            + self.householder_coefficients.nbytes
+            + self.block_reflector.nbytes)
+
+    def _gemqrt(self, vector, trans):
+        """Apply Q or Q^T in place, if vector (or matrix) is contiguous."""
+        if len(self.householder_coefficients) == 0:
+            return vector
+        gemqrt = sp.linalg.lapack.sgemqrt if \
+            self.householder_reflections.dtype == np.float32 else \
+            sp.linalg.lapack.dgemqrt
+        if vector.ndim == 2:
+            result, info = gemqrt(
+                self.householder_reflections, self.block_reflector, vector,
+                side='L', trans=trans, overwrite_c=1)
+            assert info == 0
+            return result
+        result, info = gemqrt(
+            self.householder_reflections, self.block_reflector,
+            vector.reshape(-1, 1, order='F'), side='L', trans=trans,
+            overwrite_c=1)
+        assert info == 0
+        return result.ravel()
+
+    def matvec_inplace(self, vector):
+        """Multiply by Q, vector is used as workspace.
+
+        :param vector: Input, overwritten.
+        :type vector: np.array
+
+        :returns: Result.
+        :rtype: np.array
+        """
+        return self._gemqrt(vector, 'N')
+
+    def rmatvec_to(self, vector, result):
+        """Multiply by Q^T, writing into result.
+
+        :param vector: Input.
+        :type vector: np.array
+        :param result: Output.
+        :type result: np.array
+        """
+        result[:] = vector
+        result[:] = self._gemqrt(result, 'T')
+
+    def matmat_to(self, matrix, result):
+        """Multiply the columns of a matrix by Q, writing into result.
+
+        A single call of ``gemqrt``, with matrix-matrix products.
+
+        :param matrix: Input, overwritten.
+        :type matrix: np.array
+        :param result: Output, can not be the input.
+        :type result: np.array
+        """
+        result[:] = self._gemqrt(matrix, 'N')
+
+    def rmatmat_to(self, matrix, result):
+        """Multiply the columns of a matrix by Q^T, writing into result.
+
+        :param matrix: Input, Fortran-ordered.
+        :type matrix: np.array
+        :param result: Output, Fortran-ordered.
+        :type result: np.array
+        """
+        result[:] = matrix
+        result[:] = self._gemqrt(result, 'T')
+
+
+class TSQRHouseholderQ(OrthogonalFactor):
+    """Square orthogonal factor of a tall-skinny QR (TSQR).
+
+    The matrix is split in row blocks ``A_i = Q_i [R_i; 0]``, and the stacked
+    triangular factors are factorized again, ``[R_1; ...; R_p] = Q_0 [R; 0]``.
+    The orthogonal factor is ``Q = diag(Q_i) P (Q_0 + I)``, where ``P`` moves
+    the rows of each ``R_i`` to the top and ``Q_0 + I`` is the block diagonal
+    of ``Q_0`` and the identity. The root ``Q_0`` can itself be a TSQR
+    factor, which makes a reduction tree.
+
+    :param leaves: Orthogonal factors of the row blocks, each with
+        ``matvec_inplace`` and ``rmatvec_to``.
+    :type leaves: list
+    :param ranks: Number of rows of the triangular factor of each block.
+    :type ranks: list
+    :param root: Orthogonal factor of the stacked triangular factors.
+    :type root: sp.sparse.linalg.LinearOperator
+    """
+
+    def __init__(self, leaves, ranks, root):
+        self.leaves = leaves
+        sizes = np.array([leaf.shape[0] for leaf in leaves], dtype=int)
+        ranks = np.array(ranks, dtype=int)
+        assert np.all(ranks <= sizes)
+        self.row_offsets = np.concatenate([[0], np.cumsum(sizes)])
+        self.root = root
+        top = np.sum(ranks)
+        assert root.shape[0] == top
+
+        # position of each row of the stacked local vectors of the blocks in
+        # the vector transformed by P^T
+        top_offsets = np.concatenate([[0], np.cumsum(ranks)])
+        bottom_offsets = top + np.concatenate([[0], np.cumsum(sizes - ranks)])
+        self.scatter = np.concatenate([
+            np.concatenate([
+                top_offsets[i] + np.arange(ranks[i]),
+                bottom_offsets[i] + np.arange(sizes[i] - ranks[i])])
+            for i in range(len(leaves))]).astype(int)
+        super().__init__(dtype=float, shape=(sizes.sum(), sizes.sum()))
+
+    @classmethod
+    def from_matrix(cls, matrix, blocks, map_function=map):
+        """Tall-skinny QR, with column pivoting at the root of the tree.
+
+        Each level of the reduction tree halves the number of blocks.
+
+        :param matrix: Matrix to factorize.
+        :type matrix: np.array or sp.sparse.csr_matrix
+        :param blocks: Number of row blocks of the first level.
+        :type blocks: int
+        :param map_function: Used to factorize the blocks of each level, for
+            example the ``map`` method of an executor. Default the builtin
+            ``map``, serial.
+        :type map_function: callable
+
+        :returns: Orthogonal factor, upper triangular (or trapezoidal) factor
+            with ``min(m, n)`` rows, column permutation so that
+            ``matrix[:, permutation] = Q_1 R``.
+        :rtype: tuple
+        """
+        m, n = matrix.shape
+        # blocks are at least as tall as wide, or there is no reduction
+        blocks = max(min(blocks, m // max(n, 1)), 1)
+        if m <= 2 * n:
+            return DenseHouseholderQ.from_matrix(
+                _dense(matrix), pivoting=True)
+        # with one block, pivoting is only applied to its triangular factor
+        bounds = np.linspace(0, m, blocks + 1).astype(int)
+        factors = list(map_function(
+            lambda bound: DenseHouseholderQ.from_matrix(
+                _dense(matrix[bound[0]:bound[1]])),
+            zip(bounds[:-1], bounds[1:])))
+        root, triangular, permutation = cls.from_matrix(
+            np.vstack([el[1] for el in factors]), max(blocks // 2, 1),
+            map_function=map_function)
+        return cls(
+            leaves=[el[0] for el in factors],
+            ranks=[el[1].shape[0] for el in factors],
+            root=root), triangular, permutation
+
+    @property
+    def nbytes(self):
+        """Memory used by the factor, in bytes.
+
+        :returns: Bytes of the arrays of the factor.
+        :rtype: int
+        """
+        return sum(leaf.nbytes for leaf in self.leaves) + self.root.nbytes \
+            + self.row_offsets.nbytes + self.scatter.nbytes
+
+    def matvec_inplace(self, vector):
+        """Multiply by Q, vector is used as workspace.
+
+        :param vector: Input, overwritten.
+        :type vector: np.array
+
+        :returns: Result.
+        :rtype: np.array
+        """
+        top = self.root.shape[0]
+        vector[:top] = self.root.matvec_inplace(vector[:top])
+        local = vector[self.scatter]
+        for leaf, start, stop in zip(
+                self.leaves, self.row_offsets[:-1], self.row_offsets[1:]):
+            vector[start:stop] = leaf.matvec_inplace(local[start:stop])
+        return vector
+
+    def rmatvec_to(self, vector, result):
+        """Multiply by Q^T, writing into result.
+
+        :param vector: Input.
+        :type vector: np.array
+        :param result: Output.
+        :type result: np.array
+        """
+        local = np.empty(self.shape[0])
+        for leaf, start, stop in zip(
+                self.leaves, self.row_offsets[:-1], self.row_offsets[1:]):
+            leaf.rmatvec_to(vector[start:stop], local[start:stop])
+        result[self.scatter] = local
+        top = self.root.shape[0]
+        self.root.rmatvec_to(result[:top].copy(), result[:top])
+
+
+class AppendedRowsQ(OrthogonalFactor):
+    """Orthogonal factor of a QR after appending rows to the matrix.
+
+    If ``A = Q [R; 0]`` with ``R`` square and ``W`` are new rows, the
+    triangular-pentagonal QR ``[R; W] = Q_0 [R'; 0]`` of LAPACK ``tpqrt``
+    gives ``[A; W] = (Q + I) Q_0 [R'; 0]``, where ``Q + I`` is the block
+    diagonal of ``Q`` and the identity and ``Q_0`` acts on the first ``n`` and
+    last ``k`` coordinates. The new rows are then moved to their position. The
+    null-space columns of the result are still the last ones. Products use a
+    workspace owned by the factor, so they don't allocate.
+
+    :param orthogonal: Orthogonal factor before the update.
+    :type orthogonal: OrthogonalFactor
+    :param householder_reflections: Householder vectors of ``Q_0``, of shape
+        ``(k, n)``.
+    :type householder_reflections: np.array
+    :param block_reflector: Triangular factors of the blocked reflector.
+    :type block_reflector: np.array
+    :param position: Row index of the first new row.
+    :type position: int
+    """
+
+    def __init__(
+            self, orthogonal, householder_reflections, block_reflector,
+            position):
+        self.orthogonal = orthogonal
+        self.householder_reflections = np.asfortranarray(
+            householder_reflections, dtype=float)
+        self.block_reflector = np.asfortranarray(block_reflector, dtype=float)
+        self.rows, self.rank = self.householder_reflections.shape
+        old_m = orthogonal.shape[0]
+        assert self.rank <= old_m
+        assert 0 <= position <= old_m
+        self.position = position
+        self._work = np.empty(old_m)
+        super().__init__(
+            dtype=float, shape=(old_m + self.rows, old_m + self.rows))
+
+    @classmethod
+    def from_update(cls, orthogonal, triangular, rows, position):
+        """Update QR factors by appending rows.
+
+        :param orthogonal: Orthogonal factor before the update.
+        :type orthogonal: OrthogonalFactor
+        :param triangular: Square upper triangular factor, before the update.
+        :type triangular: np.array
+        :param rows: New rows, in the column order of the triangular factor.
+        :type rows: np.array
+        :param position: Row index of the first new row.
+        :type position: int
+
+        :returns: Updated orthogonal and triangular factors.
+        :rtype: tuple
+        """
+        n = triangular.shape[1]
+        assert triangular.shape == (n, n)
+        triangular, householder, block, info = sp.linalg.lapack.dtpqrt(
+            0, min(n, _BLOCK_SIZE),
+            np.array(triangular, dtype=float, order='F'),
+            np.array(rows, dtype=float, order='F'))
+        assert info == 0
+        return cls(orthogonal, householder, block, position), np.triu(
+            triangular)
+
+    @property
+    def nbytes(self):
+        """Memory used by the factor, in bytes.
+
+        :returns: Bytes of the arrays of the factor.
+        :rtype: int
+        """
+        return self.orthogonal.nbytes + self.householder_reflections.nbytes \
+            + self.block_reflector.nbytes + self._work.nbytes
+
+    def _tpmqrt(self, vector, trans):
+        """Apply Q_0 or its transpose in place, vector is contiguous."""
+        old_m = self.orthogonal.shape[0]
+        top, bottom, info = sp.linalg.lapack.dtpmqrt(
+            0, self.householder_reflections, self.block_reflector,
+            vector[:self.rank].reshape(-1, 1),
+            vector[old_m:].reshape(-1, 1), side='L', trans=trans,
+            overwrite_a=1, overwrite_b=1)
+        assert info == 0
+        # no copies if LAPACK wrote in place
+        vector[:self.rank] = top.ravel()
+        vector[old_m:] = bottom.ravel()
+
+    def matvec_inplace(self, vector):
+        """Multiply by Q, vector is used as workspace.
+
+        :param vector: Input, overwritten.
+        :type vector: np.array
+
+        :returns: Result.
+        :rtype: np.array
+        """
+        result = np.empty(self.shape[0])
+        self.matvec_to(vector, result)
+        return result
+
+    def matvec_to(self, vector, result):
+        """Multiply by Q, writing into result.
+
+        :param vector: Input, overwritten.
+        :type vector: np.array
+        :param result: Output, can not be the input.
+        :type result: np.array
+        """
+        old_m = self.orthogonal.shape[0]
+        stop = self.position + self.rows
+        self._tpmqrt(vector, 'N')
+        self.orthogonal.matvec_to(vector[:old_m], self._work)
+        result[:self.position] = self._work[:self.position]
+        result[self.position:stop] = vector[old_m:]
+        result[stop:] = self._work[self.position:]
+
+    def rmatvec_to(self, vector, result):
+        """Multiply by Q^T, writing into result.
+
+        :param vector: Input.
+        :type vector: np.array
+        :param result: Output.
+        :type result: np.array
+        """
+        old_m = self.orthogonal.shape[0]
+        stop = self.position + self.rows
+        self._work[:self.position] = vector[:self.position]
+        self._work[self.position:] = vector[stop:]
+        self.orthogonal.rmatvec_to(self._work, result[:old_m])
+        result[old_m:] = vector[self.position:stop]
+        self._tpmqrt(result, 'T')
+
+
+class DeletedRowQ(OrthogonalFactor):
+    """Orthogonal factor of a QR after deleting a row of the matrix.
+
+    If ``A = Q [R; 0]`` and ``q = Q^T e_p`` where ``p`` is the deleted row,
+    a reflector on the null-space coordinates and Givens rotations on
+    adjacent coordinates, from the bottom up, give ``G q = +-e_0``. Then
+    ``G [R; 0] = [v^T; R'; 0]`` with ``R'`` upper triangular, and the updated
+    orthogonal factor is ``Q G^T`` without row ``p`` and column 0, see
+    Golub and Van Loan, Matrix Computations, section 12.5. The rotations are
+    applied by a loop compiled by Numba, if it is installed, and products use
+    workspaces owned by the factor, so they don't allocate.
+
+    :param orthogonal: Orthogonal factor before the update.
+    :type orthogonal: OrthogonalFactor
+    :param position: Index of the deleted row.
+    :type position: int
+    :param rank: Number of rows of the triangular factor before the update;
+        the reflector acts on the following coordinates.
+    :type rank: int
+    :param reflector: Householder vector of the reflector, can be empty.
+    :type reflector: np.array
+    :param beta: Coefficient of the reflector.
+    :type beta: float
+    :param cosines: Cosines of the rotations, the i-th acts on coordinates
+        ``i`` and ``i+1``.
+    :type cosines: np.array
+    :param sines: Sines of the rotations.
+    :type sines: np.array
+    """
+
+    def __init__(
+            self, orthogonal, position, rank, reflector, beta, cosines,
+            sines):
+        self.orthogonal = orthogonal
+        old_m = orthogonal.shape[0]
+        assert 0 <= position < old_m
+        self.position = position
+        self.rank = rank
+        self.reflector = np.array(reflector, dtype=float)
+        assert len(self.reflector) in (0, old_m - rank)
+        self.beta = beta
+        self.cosines = np.array(cosines, dtype=float)
+        self.sines = np.array(sines, dtype=float)
+        self._extended = np.empty(old_m)
+        self._work = np.empty(old_m)
+        super().__init__(dtype=float, shape=(old_m - 1, old_m - 1))
+
+    @classmethod
+    def from_update(cls, orthogonal, triangular, position):
+        """Update QR factors by deleting a row.
+
+        :param orthogonal: Orthogonal factor before the update.
+        :type orthogonal: OrthogonalFactor
+        :param triangular: Upper triangular (or trapezoidal) factor before
+            the update, with ``min(m, n)`` rows.
+        :type triangular: np.array
+        :param position: Index of the deleted row.
+        :type position: int
+
+        :returns: Updated orthogonal and triangular factors.
+        :rtype: tuple
+        """
+        old_m = orthogonal.shape[0]
+        rank, n = triangular.shape
+        unit = np.zeros(old_m)
+        unit[position] = 1.
+        q = orthogonal.T @ unit
+
+        # compress null-space part of q in its first coordinate
+        reflector, beta = np.zeros(0), 0.
+        if old_m > rank + 1:
+            reflector = np.array(q[rank:])
+            norm = np.linalg.norm(reflector)
+            if norm > 0.:
+                sign = 1. if reflector[0] >= 0. else -1.
+                reflector[0] += sign * norm
+                beta = 2. / (reflector @ reflector)
+                q[rank] = -sign * norm
+
+        # rotations act on the first coordinates, up to this one
+        last = min(rank, old_m - 1)
+        q = q[:last + 1]
+        extended = np.zeros((last + 1, n))
+        extended[:rank] = triangular
+        cosines, sines = np.empty(last), np.empty(last)
+        for i in range(last - 1, -1, -1):
+            cosines[i], sines[i], q[i] = sp.linalg.lapack.dlartg(
+                q[i], q[i+1])
+            q[i+1] = 0.
+            extended[i, i:], extended[i+1, i:] = sp.linalg.blas.drot(
+                extended[i, i:], extended[i+1, i:], cosines[i], sines[i])
+        return cls(
+            orthogonal, position, rank, reflector, beta, cosines,
+            sines), np.triu(extended[1:])
+
+    @property
+    def nbytes(self):
+        """Memory used by the factor, in bytes.
+
+        :returns: Bytes of the arrays of the factor.
+        :rtype: int
+        """
+        return self.orthogonal.nbytes + self.reflector.nbytes \
+            + self.cosines.nbytes + self.sines.nbytes \
+            + self._extended.nbytes + self._work.nbytes
+
+    def _reflect(self, vector):
+        """Apply the reflector in place."""
+        if len(self.reflector) > 0:
+            tail, work = vector[self.rank:], self._work[self.rank:]
+            np.multiply(
+                self.reflector, self.beta * np.dot(self.reflector, tail),
+                out=work)
+            tail -= work
+
+    def matvec_inplace(self, vector):
+        """Multiply by Q, vector is used as workspace.
+
+        :param vector: Input, overwritten.
+        :type vector: np.array
+
+        :returns: Result.
+        :rtype: np.array
+        """
+        result = np.empty(self.shape[0])
+        self.matvec_to(vector, result)
+        return result
+
+    def matvec_to(self, vector, result):
+        """Multiply by Q, writing into result.
+
+        :param vector: Input, overwritten.
+        :type vector: np.array
+        :param result: Output, can not be the input.
+        :type result: np.array
+        """
+        extended, work = self._extended, self._work
+        extended[0] = 0.
+        extended[1:] = vector
+        _rotate_forward(extended, self.cosines, self.sines)
+        self._reflect(extended)
+        self.orthogonal.matvec_to(extended, work)
+        result[:self.position] = work[:self.position]
+        result[self.position:] = work[self.position + 1:]
+
+    def rmatvec_to(self, vector, result):
+        """Multiply by Q^T, writing into result.
+
+        :param vector: Input.
+        :type vector: np.array
+        :param result: Output.
+        :type result: np.array
+        """
+        extended, work = self._extended, self._work
+        work[:self.position] = vector[:self.position]
+        work[self.position] = 0.
+        work[self.position + 1:] = vector[self.position:]
+        self.orthogonal.rmatvec_to(work, extended)
+        self._reflect(extended)
+        _rotate_backward(extended, self.cosines, self.sines)
+        result[:] = extended[1:]
+
+
+def _dense(matrix):
+    """Numpy 2-d array from dense or sparse matrix."""
+    if sp.sparse.issparse(matrix):
+        return matrix.toarray()
+    return np.asarray(matrix, dtype=float)
+
+
+class ColumnBlock(sp.sparse.linalg.LinearOperator):
+    """Block of consecutive columns of a square orthogonal operator.
+
+    The orthogonal operator must implement ``matvec_inplace`` and
+    ``rmatvec_to``, like the subclasses of :class:`OrthogonalFactor`. The
+    null space of a matrix with QR factors is represented this way, without
+    forming ``I - Q_1 Q_1^T``.
+
+    :param orthogonal: Square orthogonal operator.
+    :type orthogonal: sp.sparse.linalg.LinearOperator
+    :param start: First column.
+    :type start: int
+    :param stop: One past the last column.
+    :type stop: int
+    """
+
+    def __init__(self, orthogonal, start, stop):
+        self.orthogonal = orthogonal
+        self.start = start
+        self.stop = stop
+        m = orthogonal.shape[0]
+        assert 0 <= start <= stop <= m
+        super().__init__(dtype=float, shape=(m, stop - start))
+
+    def _matvec(self, x):
+        padded = np.zeros(self.shape[0])
+        padded[self.start:self.stop] = np.ravel(x)
+        return self.orthogonal.matvec_inplace(padded)
+
+    def _rmatvec(self, x):
+        result = np.empty(self.shape[0])
+        self.orthogonal.rmatvec_to(np.ravel(x), result)
+        return result[self.start:self.stop]
+
+
+class HouseholderReflector(sp.sparse.linalg.LinearOperator):
+    """Orthonormal basis of the complement of a vector, by one reflection.
+
+    The reflection ``H = I - beta v v^T`` maps the given vector onto a
+    multiple of the first unit vector, so the last columns of ``H`` are an
+    orthonormal basis of its orthogonal complement. This operator is that
+    basis, of shape ``(m, m-1)``; it is applied in ``O(m)``.
+
+    :param vector: Vector whose complement is represented.
+    :type vector: np.array
+    """
+
+    def __init__(self, vector):
+        self.vector = np.array(vector, dtype=float, copy=True).ravel()
+        m = len(self.vector)
+        assert m > 0
+        norm = np.linalg.norm(self.vector)
+        if norm == 0.:
+            self.vector[:] = 0.
+            self.vector[0] = 1.
+        else:
+            # sign chosen to avoid cancellation
+            self.vector[0] += norm if self.vector[0] >= 0. else -norm
+        self.beta = 2. / (self.vector @ self.vector)
+        super().__init__(dtype=float, shape=(m, m-1))
+
+    def _matvec(self, x):
+        x = np.ravel(x)
+        result = np.empty(self.shape[0])
+        result[0] = 0.
+        result[1:] = x
+        result -= (self.beta * (self.vector[1:] @ x)) * self.vector
+        return result
+
+    def _rmatvec(self, x):
+        x = np.ravel(x)
+        return x[1:] - (self.beta * (self.vector @ x)) * self.vector[1:]
+
+
+class TriangularFactor(sp.sparse.linalg.LinearOperator):
+    """Sparse upper triangular factor of a QR, with column permutation.
+
+    This is the operator ``r`` such that ``r[:, column_permutation] = R``,
+    so that ``matrix = Q_1 r`` where ``Q_1`` are the first columns of the
+    orthogonal factor. It is split as ``R = [[R11, R12], [0, R22]]`` where
+    ``R11`` is the leading block with non-zero diagonal, up to the first
+    (numerically) zero one. Systems with ``r`` and ``r^T`` are solved by
+    sparse triangular solves with ``R11``; all the rank deficiency, if any, is
+    in the trailing block ``R22``, which is handled densely with minimum-norm
+    least squares.
+
+    :param triangular: Upper triangular (or trapezoidal) factor.
+    :type triangular: sp.sparse.csr_matrix or np.array
+    :param column_permutation: Column permutation.
+    :type column_permutation: np.array
+    :param tolerance: Absolute threshold below which diagonal elements are
+        considered zero. Default None, same default as SPQR, scaled from the
+        largest column norm.
+    :type tolerance: float or None
+    """
+
+    def __init__(self, triangular, column_permutation, tolerance=None):
+        triangular = sp.sparse.csr_matrix(triangular)
+        rows, n = triangular.shape
+        assert rows <= n
+        self.column_permutation = np.ascontiguousarray(column_permutation)
+        assert len(self.column_permutation) == n
+
+        diagonal = np.abs(triangular.diagonal())
+        if tolerance is None:
+            tolerance = 20 * (rows + n) * np.finfo(float).eps * (
+                np.max(sp.sparse.linalg.norm(triangular, axis=0))
+                if triangular.nnz > 0 else 0.)
+        dead = np.flatnonzero(diagonal <= tolerance)
+        self.split = dead[0] if len(dead) > 0 else rows
+
+        self.r11 = triangular[:self.split, :self.split]
+        self.r11_transpose = sp.sparse.csr_matrix(self.r11.T)
+        self.r12 = triangular[:self.split, self.split:]
+        self.r22 = triangular[self.split:, self.split:].toarray()
+
+        # truncated SVD of trailing block, for minimum norm solutions
+        if self.r22.size > 0:
+            u, s, vt = np.linalg.svd(self.r22, full_matrices=False)
+        else:
+            u, s, vt = np.zeros((self.r22.shape[0], 0)), np.zeros(0), \
+                np.zeros((0, self.r22.shape[1]))
+        keep = s > tolerance
+        self._r22_u, self._r22_s, self._r22_vt = u[:, keep], s[keep], vt[keep]
+        self.rank = self.split + np.sum(keep)
+        super().__init__(dtype=float, shape=(rows, n))
+
+    @property
+    def nbytes(self):
+        """Memory used by the factor, in bytes.
+
+        :returns: Bytes of the arrays of the factor.
+        :rtype: int
+        """
+        return sum(
+            matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+            for matrix in (self.r11, self.r11_transpose, self.r12)) + sum(
+            array.nbytes for array in (
+                self.r22, self._r22_u, self._r22_s, self._r22_vt,
+                self.column_permutation))
+
+    def dense(self):
+        """Upper triangular factor ``R`` as dense array, in its column order.
+
+        :returns: Triangular factor.
+        :rtype: np.array
+        """
+        result = np.zeros(self.shape)
+        result[:self.split, :self.split] = self.r11.toarray()
+        result[:self.split, self.split:] = self.r12.toarray()
+        result[self.split:, self.split:] = self.r22
+        return result
+
+    def _triangular_matvec(self, vector):
+        """Multiply by R."""
+        return np.concatenate([
+            self.r11 @ vector[:self.split]
+                + self.r12 @ vector[self.split:],
+            self.r22 @ vector[self.split:]])
+
+    def _triangular_rmatvec(self, vector):
+        """Multiply by R^T."""
+        return np.concatenate([
+            self.r11_transpose @ vector[:self.split],
+            self.r12.T @ vector[:self.split]
+                + self.r22.T @ vector[self.split:]])
+
+    def _matvec(self, x):
+        return self._triangular_matvec(np.ravel(x)[self.column_permutation])
+
+    def _rmatvec(self, x):
+        result = np.empty(self.shape[1])
+        result[self.column_permutation] = self._triangular_rmatvec(
+            np.ravel(x))
+        return result
+
+    def _r22_lstsq(self, vector, transpose):
+        """Minimum norm least squares with trailing block."""
+        if transpose:
+            return self._r22_u @ ((self._r22_vt @ vector) / self._r22_s)
+        return self._r22_vt.T @ ((self._r22_u.T @ vector) / self._r22_s)
+
+    def _solve_triangular(self, matrix, vector, lower):
+        """Sparse triangular solve, also with empty matrix."""
+        if self.split == 0:
+            return np.zeros(0)
+        return sp.sparse.linalg.spsolve_triangular(
+            matrix, vector, lower=lower)
+
+    def solve(self, vector, transpose=False):
+        """Solve linear system with r, or r^T, in least squares sense.
+
+        Where the system is singular the solution has minimum norm in the
+        coordinates of the trailing block. The caller should check if the
+        solution is exact.
+
+        :param vector: Right hand side.
+        :type vector: np.array
+        :param transpose: Whether to solve with ``r^T`` instead.
+        :type transpose: bool
+
+        :returns: Solution.
+        :rtype: np.array
+        """
+        vector = np.ravel(vector)
+        if transpose:
+            permuted = vector[self.column_permutation]
+            result1 = self._solve_triangular(
+                self.r11_transpose, permuted[:self.split], lower=True)
+            result2 = self._r22_lstsq(
+                permuted[self.split:] - self.r12.T @ result1, transpose=True)
+            return np.concatenate([result1, result2])
+
+        result2 = self._r22_lstsq(vector[self.split:], transpose=False)
+        result1 = self._solve_triangular(
+            self.r11, vector[:self.split] - self.r12 @ result2, lower=False)
+        result = np.empty(self.shape[1])
+        result[self.column_permutation] = np.concatenate([result1, result2])
+        return result
@@ -0,0 +1,185 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""Douglas-Rachford step in a single compiled call, for the dense backend.
+
+:meth:`cqr.douglas_rachford.DouglasRachford.compute_step` is a sequence of
+NumPy and LAPACK calls, whose overhead dominates at moderate sizes. Here the
+whole step, cone projection, products by the Householder reflections of
+:class:`cqr.factors.DenseHouseholderQ` and projection on the gap constraint,
+is a single function, compiled by Numba if it is installed. The two products
+by ``Q^T``, and the two by ``Q``, are done in one pass over the reflections.
+
+Numba is optional; without it the functions are plain Python, which gives the
+same results but is only useful for testing, so the engine falls back to its
+NumPy implementation, see :data:`NUMBA_AVAILABLE`.
+"""
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # pragma: no cover
+    numba = None
+
+NUMBA_AVAILABLE = numba is not None
+
+
+def _jit(function):
+    """Compile with Numba if available."""
+    if numba is None:  # pragma: no cover
+        return function
+    return numba.njit(cache=True, nogil=True, fastmath=True)(function)
+
+
+@_jit
+def _reflect_pair(householder, coefficients, first, second, transpose):
+    """Multiply two vectors by Q, or Q^T, in place."""
+    k = householder.shape[1]
+    for index in range(k):
+        j = (index if transpose else k - 1 - index)
+        # loops on views with zero offset, so that they are vectorized
+        column = householder[j + 1:, j]
+        first_tail = first[j + 1:]
+        second_tail = second[j + 1:]
+        first_dot = 0.
+        second_dot = 0.
+        for i in range(len(column)):
+            first_dot += column[i] * first_tail[i]
+            second_dot += column[i] * second_tail[i]
+        first_dot = coefficients[j] * (first[j] + first_dot)
+        second_dot = coefficients[j] * (second[j] + second_dot)
+        first[j] -= first_dot
+        second[j] -= second_dot
+        for i in range(len(column)):
+            first_tail[i] -= first_dot * column[i]
+            second_tail[i] -= second_dot * column[i]
+
+
+@_jit
+def _self_dual_cone_project(z, pi, reflected, nonneg, soc):
+    """Project on non-negative and second-order cones, and reflect."""
+    for i in range(nonneg):
+        pi[i] = max(z[i], 0.)
+        reflected[i] = 2. * pi[i] - z[i]
+    cur = nonneg
+    for size in soc:
+        t = z[cur]
+        norm_y = 0.
+        for i in range(cur + 1, cur + size):
+            norm_y += z[i] * z[i]
+        norm_y = np.sqrt(norm_y)
+        if norm_y <= t:
+            for i in range(cur, cur + size):
+                pi[i] = z[i]
+                reflected[i] = z[i]
+        elif norm_y <= -t:
+            for i in range(cur, cur + size):
+                pi[i] = 0.
+                reflected[i] = -z[i]
+        else:
+            pi[cur] = (norm_y + t) / 2.
+            reflected[cur] = norm_y
+            for i in range(cur + 1, cur + size):
+                pi[i] = z[i] * (1. + t / norm_y) / 2.
+                reflected[i] = z[i] * t / norm_y
+        cur += size
+
+
+@_jit
+def fused_step(
+        householder, coefficients, rank, b, y0, var0, gap_direction, zero,
+        nonneg, soc, dr_y, pi, reflected, step, first, second):
+    """Douglas-Rachford step, same as the engine's ``compute_step``.
+
+    :param householder: Householder reflections, ``(m, k)``.
+    :type householder: np.array
+    :param coefficients: Householder coefficients.
+    :type coefficients: np.array
+    :param rank: Number of columns of ``Q_1``.
+    :type rank: int
+    :param b: QR-transformed primal constants.
+    :type b: np.array
+    :param y0: Particular dual vector.
+    :type y0: np.array
+    :param var0: Particular solution of the gap constraint.
+    :type var0: np.array
+    :param gap_direction: Unit normal of the gap constraint.
+    :type gap_direction: np.array
+    :param zero: Size of the zero cone.
+    :type zero: int
+    :param nonneg: Size of the non-negative cone.
+    :type nonneg: int
+    :param soc: Sizes of the second-order cones.
+    :type soc: np.array
+    :param dr_y: Iterate, not modified.
+    :type dr_y: np.array
+    :param pi: Output, projection on the cone.
+    :type pi: np.array
+    :param reflected: Output, reflection.
+    :type reflected: np.array
+    :param step: Output, step.
+    :type step: np.array
+    :param first: Workspace of size ``m``.
+    :type first: np.array
+    :param second: Workspace of size ``m``.
+    :type second: np.array
+
+    :returns: Norm of the step.
+    :rtype: float
+    """
+    m = len(b)
+
+    # cone projection and reflection of s and y
+    for i in range(zero):
+        pi[i] = 0.
+        reflected[i] = -dr_y[i]
+        pi[m + i] = dr_y[m + i]
+        reflected[m + i] = dr_y[m + i]
+    _self_dual_cone_project(
+        dr_y[zero:m], pi[zero:m], reflected[zero:m], nonneg, soc)
+    _self_dual_cone_project(
+        dr_y[m + zero:], pi[m + zero:], reflected[m + zero:], nonneg, soc)
+
+    # var = [Q_1^T (b - s); Q_2^T (y - y0)] - var0
+    for i in range(m):
+        first[i] = b[i] - reflected[i]
+        second[i] = reflected[m + i] - y0[i]
+    _reflect_pair(householder, coefficients, first, second, True)
+    product = 0.
+    for i in range(m):
+        if i >= rank:
+            first[i] = second[i]
+        first[i] -= var0[i]
+        product += gap_direction[i] * first[i]
+
+    # project on gap constraint, split in x and z
+    for i in range(m):
+        value = first[i] - product * gap_direction[i] + var0[i]
+        if i < rank:
+            first[i] = value
+            second[i] = 0.
+        else:
+            first[i] = 0.
+            second[i] = value
+
+    # s = b - Q_1 x, y = y0 + Q_2 z
+    _reflect_pair(householder, coefficients, first, second, False)
+    norm = 0.
+    for i in range(m):
+        step[i] = b[i] - first[i] - pi[i]
+        step[m + i] = y0[i] + second[i] - pi[m + i]
+        norm += step[i] * step[i] + step[m + i] * step[m + i]
+    return np.sqrt(norm)
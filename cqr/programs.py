@@ -0,0 +1,188 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""Random cone programs, for the unit tests and the benchmarks.
+
+Programs are built directly in the form of :class:`cqr.Solver`, ``A x + s =
+b`` with ``s`` in the cone, so that they don't need CVXPY. Each function
+returns the matrix, ``b``, ``c``, and the sizes of the zero cone, of the
+non-negative cone and of the second-order cones.
+"""
+
+import numpy as np
+import scipy as sp
+
+
+def feasible_program(m, n, zero, soc, seed, exp=0):
+    """Random sparse program with a primal-dual solution.
+
+    :param m: Number of rows.
+    :type m: int
+    :param n: Number of columns.
+    :type n: int
+    :param zero: Size of the zero cone.
+    :type zero: int
+    :param soc: Sizes of the second-order cones, after the non-negative one.
+    :type soc: list or tuple
+    :param seed: Seed of NumPy's global random generator.
+    :type seed: int
+    :param exp: Number of exponential cones, after the second-order ones.
+        Default 0.
+    :type exp: int
+
+    :returns: Program data and cone sizes.
+    :rtype: tuple
+    """
+    np.random.seed(seed)
+    matrix = sp.sparse.random(m, n, density=.3, format='csc')
+    matrix += sp.sparse.eye(m, n, format='csc')
+    cones = sum(soc) + 3 * exp
+    nonneg = m - zero - cones
+    z = np.random.randn(m)
+    s = np.concatenate([np.zeros(zero), np.maximum(z[zero:m-cones], 0.)])
+    y = np.concatenate([z[:zero], np.maximum(-z[zero:m-cones], 0.)])
+    for size in soc:
+        cone = np.random.randn(size)
+        cone[0] = np.linalg.norm(cone[1:]) + 1.
+        s = np.concatenate([s, cone])
+        y = np.concatenate([y, np.zeros(size)])
+    x = np.random.randn(n)
+    # (x, 1, exp(x) + 1), in the interior of the exponential cone
+    heads = np.random.randn(exp)
+    s = np.concatenate([s, np.stack(
+        [heads, np.ones(exp), np.exp(heads) + 1.], axis=1).ravel()])
+    y = np.concatenate([y, np.zeros(3 * exp)])
+    return matrix, matrix @ x + s, -matrix.T @ y, zero, nonneg, soc
+
+
+def feasible_linear_program(matrix, zero, seed):
+    """Linear program with a primal-dual solution, from its matrix.
+
+    :param matrix: Program matrix.
+    :type matrix: scipy.sparse.csc_matrix
+    :param zero: Size of the zero cone, the other rows are non-negative.
+    :type zero: int
+    :param seed: Seed of NumPy's global random generator.
+    :type seed: int
+
+    :returns: Program data and cone sizes.
+    :rtype: tuple
+    """
+    m, n = matrix.shape
+    np.random.seed(seed)
+    z = np.random.randn(m)
+    y = np.concatenate([z[:zero], np.maximum(z[zero:], 0.)])
+    x = np.random.randn(n)
+    return matrix, matrix @ x + y - z, -matrix.T @ y, zero, m - zero, []
+
+
+def l1_regression_program(seed, m=41, n=30):
+    """Constrained l1 regression, a linear program which can be difficult.
+
+    Minimize ``||A x - b||_1`` subject to ``|x| <= .75`` and ``D^T x = 2``,
+    with ``D`` of 5 columns, in the variables ``(x, t)``, ``|A x - b| <=
+    t``.
+
+    :param seed: Seed of NumPy's global random generator.
+    :type seed: int
+    :param m: Number of rows of ``A``. Default 41.
+    :type m: int
+    :param n: Number of columns of ``A``. Default 30.
+    :type n: int
+
+    :returns: Program data and cone sizes.
+    :rtype: tuple
+    """
+    np.random.seed(seed)
+    a = sp.sparse.csc_matrix(np.random.randn(m, n))
+    b = np.random.randn(m)
+    d = np.random.randn(n, 5)
+    eye_m, eye_n = sp.sparse.eye(m), sp.sparse.eye(n)
+    matrix = sp.sparse.bmat([
+        [d.T, None], [a, -eye_m], [-a, -eye_m], [eye_n, None],
+        [-eye_n, None]], format='csc')
+    return (
+        matrix, np.concatenate([np.full(5, 2.), b, -b, np.full(2 * n, .75)]),
+        np.concatenate([np.zeros(n), np.ones(m)]), 5, 2 * (m + n), [])
+
+
+def l1_regularized_regression_program(seed, m=41, n=30):
+    """Regression with l1 loss and l1 regularization, a linear program.
+
+    Minimize ``||A x - b||_1 + ||x||_1``, in the variables ``(x, t, u)``,
+    ``|A x - b| <= t`` and ``|x| <= u``.
+
+    :param seed: Seed of NumPy's global random generator.
+    :type seed: int
+    :param m: Number of rows of ``A``. Default 41.
+    :type m: int
+    :param n: Number of columns of ``A``. Default 30.
+    :type n: int
+
+    :returns: Program data and cone sizes.
+    :rtype: tuple
+    """
+    np.random.seed(seed)
+    a = sp.sparse.csc_matrix(np.random.randn(m, n))
+    b = np.random.randn(m)
+    eye_m, eye_n = sp.sparse.eye(m), sp.sparse.eye(n)
+    matrix = sp.sparse.bmat([
+        [a, -eye_m, None], [-a, -eye_m, None], [eye_n, None, -eye_n],
+        [-eye_n, None, -eye_n]], format='csc')
+    return (
+        matrix, np.concatenate([b, -b, np.zeros(2 * n)]),
+        np.concatenate([np.zeros(n), np.ones(m + n)]), 0, 2 * (m + n), [])
+
+
+def portfolio_program(seed, n=10):
+    """Portfolio rebalancing with a factor risk limit, with one SOC.
+
+    Minimize ``mu^T w + 1e-5 ||w - w_0||_1`` subject to ``sum(w) = 0``,
+    ``||w - w_0||_1 <= .05``, ``||w||_1 <= 1`` and ``||F w||_2^2 <=
+    5e-5``, with ``F`` of ``n // 10`` rows, in the variables ``(w, u,
+    v)``, ``|w - w_0| <= u`` and ``|w| <= v``.
+
+    :param seed: Seed of NumPy's global random generator.
+    :type seed: int
+    :param n: Number of assets. Default 10.
+    :type n: int
+
+    :returns: Program data and cone sizes.
+    :rtype: tuple
+    """
+    np.random.seed(seed)
+    w0 = np.random.randn(n)
+    w0 -= np.sum(w0) / n
+    w0 /= np.sum(np.abs(w0))
+    mu = np.random.randn(n) * 1e-3
+    sigma = np.random.randn(n, n)
+    eigenvalues, eigenvectors = np.linalg.eigh(sigma.T @ sigma)
+    k = n // 10
+    assert k > 0
+    factors = np.sqrt(1e-4 * eigenvalues[-k:])[:, None] * \
+        eigenvectors[:, -k:].T
+
+    eye, ones = sp.sparse.eye(n), np.ones((1, n))
+    matrix = sp.sparse.bmat([
+        [ones, None, None],
+        [eye, -eye, None], [-eye, -eye, None], [None, ones, None],
+        [eye, None, -eye], [-eye, None, -eye], [None, None, ones],
+        [np.zeros((1, n)), None, None], [-factors, None, None]],
+        format='csc')
+    b = np.concatenate([
+        [0.], w0, -w0, [.05], np.zeros(2 * n), [1.], [np.sqrt(5e-5)],
+        np.zeros(k)])
+    c = np.concatenate([mu, np.full(n, 1e-5), np.zeros(n)])
+    return matrix, b, c, 1, 4 * n + 2, [k + 1]
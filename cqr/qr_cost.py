@@ -0,0 +1,138 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""Cost model of QR factorizations, used to pick the backend.
+
+The triangular factor of the QR of ``A`` has the sparsity pattern of the
+Cholesky factor of ``A^T A``, so the number of non-zeros of the upper
+triangle of ``A^T A`` is used as a cheap symbolic estimate of the fill. With
+a fill-reducing ordering the actual fill is usually within a factor of 2 of
+it. The multifrontal sparse QR does about ``4 fill h / n`` flops, where ``h``
+estimates the non-zeros of the Householder vectors as the larger of the fill
+and half the non-zeros of the matrix. The dense Householder QR does
+``2 m n^2 - 2/3 n^3``, and the tall-skinny QR the same flops split in
+parallel row blocks, plus ``4 n^3`` for each level of its reduction tree.
+The two rates below were measured with PySPQR and LAPACK on the same
+machine; only their ratio matters to choose the backend.
+"""
+
+import numpy as np
+import scipy as sp
+
+DENSE_FLOPS_PER_SECOND = 3e10
+SPARSE_FLOPS_PER_SECOND = 5e8
+
+BACKENDS = ('NUMPY', 'PYSPQR', 'TSQR')
+
+# above this many flops to build the pattern of A^T A, bound it instead
+_MAX_SYMBOLIC_WORK = 10**8
+
+
+def symbolic_fill(matrix):
+    """Estimate number of non-zeros of the triangular factor of a sparse QR.
+
+    :param matrix: Matrix to factorize.
+    :type matrix: sp.sparse.csc_matrix
+
+    :returns: Estimated number of non-zeros.
+    :rtype: int
+    """
+    matrix = sp.sparse.csr_matrix(matrix)
+    m, n = matrix.shape
+    k = min(m, n)
+    # non-zeros of a full k x n upper trapezoid
+    maximum = k * n - (k * (k - 1)) // 2
+
+    row_counts = np.diff(matrix.indptr).astype(np.int64)
+    work = int(np.sum(row_counts**2))
+    if work > _MAX_SYMBOLIC_WORK:
+        # bound on non-zeros of upper triangle of A^T A
+        return int(min((work + n) // 2, maximum))
+    pattern = sp.sparse.csr_matrix(
+        (np.ones(matrix.nnz), matrix.indices, matrix.indptr),
+        shape=matrix.shape)
+    return int(min(sp.sparse.triu(pattern.T @ pattern).nnz, maximum))
+
+
+def estimate_qr_cost(matrix, workers=1):
+    """Estimate time and memory of dense, sparse and tall-skinny QR.
+
+    :param matrix: Matrix to factorize.
+    :type matrix: sp.sparse.csc_matrix
+    :param workers: Number of parallel workers of the tall-skinny QR.
+    :type workers: int
+
+    :returns: Shape and number of non-zeros of the matrix, estimated fill of
+        the sparse triangular factor, and for each backend (``'NUMPY'``,
+        ``'PYSPQR'`` and ``'TSQR'``) a dictionary with predicted ``flops``,
+        ``seconds`` and ``bytes``.
+    :rtype: dict
+    """
+    matrix = sp.sparse.csc_matrix(matrix)
+    m, n = matrix.shape
+    k = min(m, n)
+    fill = symbolic_fill(matrix)
+
+    dense_flops = 2. * max(m, n) * k**2 - 2. / 3. * k**3
+    # dense copy of the matrix, Householder vectors and coefficients, R
+    dense_bytes = 8 * (m * n + m * k + k + k * n)
+
+    # flops of each worker; same as the dense QR if there is one block
+    blocks = max(min(workers, m // max(n, 1)), 1)
+    tsqr_flops = dense_flops
+    if blocks > 1:
+        levels = int(np.ceil(np.log2(blocks)))
+        tsqr_flops = 2. * (m / blocks) * k**2 + levels * 4. * k**3
+    # blocks are copied to dense, Householder vectors of blocks and tree, R
+    tsqr_bytes = 8 * (m * n + m * k + 2 * blocks * k * n + k * n)
+
+    householder = max(fill, matrix.nnz // 2)
+    sparse_flops = 4. * fill * householder / max(n, 1)
+    # R and the Householder vectors, with int64 indices
+    sparse_bytes = 16 * (fill + householder) + 8 * (m + 2 * n)
+
+    return {
+        'm': m, 'n': n, 'nnz': matrix.nnz, 'fill': fill,
+        'NUMPY': {
+            'flops': dense_flops,
+            'seconds': dense_flops / DENSE_FLOPS_PER_SECOND,
+            'bytes': dense_bytes},
+        'PYSPQR': {
+            'flops': sparse_flops,
+            'seconds': sparse_flops / SPARSE_FLOPS_PER_SECOND,
+            'bytes': sparse_bytes},
+        'TSQR': {
+            'flops': tsqr_flops,
+            'seconds': tsqr_flops / DENSE_FLOPS_PER_SECOND,
+            'bytes': tsqr_bytes},
+        }
+
+
+def choose_qr_backend(estimate, max_bytes=None):
+    """Fastest QR backend whose predicted memory is within budget.
+
+    :param estimate: Output of :func:`estimate_qr_cost`.
+    :type estimate: dict
+    :param max_bytes: Memory budget. Default None, no limit.
+    :type max_bytes: int or None
+
+    :returns: Backend name, or None if no backend fits in the budget.
+    :rtype: str or None
+    """
+    # on ties, the first in BACKENDS
+    for backend in sorted(BACKENDS, key=lambda el: estimate[el]['seconds']):
+        if max_bytes is None or estimate[backend]['bytes'] <= max_bytes:
+            return backend
+    return None
@@ -23,13 +23,52 @@ Experiments (new features, ...) should be done as subclasses.
 """
 
 # import cvxpy as cp
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import scipy as sp
 
+from .anderson import ANDERSON_TYPES, AndersonAcceleration
+from .checkpoint import load_checkpoint, program_fingerprint, save_checkpoint
+from .cones import ConeLayout, ExponentialCones, SecondOrderCones
+from .douglas_rachford import ALGORITHMS, DouglasRachford
 from .equilibrate import hsde_ruiz_equilibration
+from .factorization_cache import fingerprint, sparsity_fingerprint
+from .factors import (
+    AppendedRowsQ, DeletedRowQ, DenseHouseholderQ, HouseholderReflector,
+    SparseHouseholderQ, TriangularFactor, TSQRHouseholderQ)
+from .fused_step import NUMBA_AVAILABLE
+from .qr_cost import choose_qr_backend, estimate_qr_cost
 # from .line_search import LineSearcher, LineSearchFailed
 
-from pyspqr import qr
+from pyspqr import qr, Permutation
+
+
+def sparse_qr(matrix, column_ordering=None):
+    """Sparse QR with PySPQR, optionally with given column ordering.
+
+    :param matrix: Matrix to factorize.
+    :type matrix: sp.sparse.csc_matrix
+    :param column_ordering: Fill-reducing column permutation, for example
+        computed by a previous factorization of a matrix with the same
+        sparsity pattern. If None, the default, it is computed with AMD.
+    :type column_ordering: np.array or None
+
+    :returns: Orthogonal factor, triangular factor, column permutation.
+    :rtype: pyspqr.HouseholderOrthogonal, sp.sparse.csc_matrix,
+        pyspqr.Permutation
+    """
+    if column_ordering is None:
+        q, r, e = qr(matrix, ordering='AMD')
+        if not isinstance(e, Permutation):
+            e = Permutation(np.arange(matrix.shape[1]))
+        return q, r, e
+    q, r, e = qr(matrix[:, column_ordering], ordering='FIXED')
+    if isinstance(e, Permutation):  # in case SPQR permutes anyway
+        return q, r, Permutation(column_ordering[e.permutation])
+    return q, r, Permutation(column_ordering)
 
 
 class Unbounded(Exception):
@@ -40,6 +79,29 @@ class Infeasible(Exception):
     """Program infeasible."""
 
 
+class FactorizationTooLarge(MemoryError):
+    """Predicted memory of the QR factorization exceeds the budget."""
+
+
+# Relative error of the factorization on a probe vector above which the
+# updated factors are discarded and the matrix is factorized again.
+_QR_UPDATE_DRIFT_TOLERANCE = 1e-10
+
+# Maximum number of chained updates of the orthogonal factor, each of which
+# adds to the cost of multiplying by it. This holds only for cheap updates;
+# the Givens rotations of a row deletion are applied by a compiled loop, so
+# without Numba, where they would cost more than the product by the base
+# factor, rows are removed by factorizing again.
+_MAX_QR_UPDATES = 32
+
+# Attributes that depend only on the program matrix and cones, which are
+# stored in the factorization cache.
+_FACTORIZATION_ATTRIBUTES = (
+    'equil_d', 'equil_e', 'equil_sigma', 'equil_rho', 'matrix_ruiz_equil',
+    'matrix_qr_transf', 'nullspace_projector', 'r', 'qr_backend',
+    '_qr_updates')
+
+
 class Solver:
     """Solver class.
 
@@ -53,41 +115,176 @@ class Solver:
     :type zero: int
     :param nonneg: Size of the non-negative cone.
     :type nonneg: int
+    :param soc: Sizes of the second-order cones. Default empty.
+    :type soc: iterable
+    :param exp: Number of exponential cones, after the second-order cones,
+        with the entries of each in the order of CVXPY and SCS, see
+        :class:`cqr.cones.ExponentialCones`. Default 0.
+    :type exp: int
     :param x0: Initial guess of the primal variable. Default None,
         equivalent to zero vector.
     :type x0: np.array or None.
     :param y0: Initial guess of the dual variable. Default None,
         equivalent to zero vector.
     :type y0: np.array or None.
+    :param qr: QR backend, ``'NUMPY'`` for dense, ``'PYSPQR'`` for sparse,
+        ``'TSQR'`` for tall-skinny QR parallel over row blocks, or ``'AUTO'``
+        to choose with a cost model of the factorization. Default
+        ``'PYSPQR'``.
+    :type qr: str
+    :param tsqr_workers: Number of threads of the tall-skinny QR, which is
+        also its number of row blocks. Default None, the number of CPUs.
+    :type tsqr_workers: int or None
+    :param max_factorization_bytes: Memory budget of the QR factorization.
+        If its predicted memory exceeds it the solver refuses to start and
+        raises :class:`FactorizationTooLarge`; with ``qr='AUTO'`` the fastest
+        backend that fits is chosen. Default None, no limit.
+    :type max_factorization_bytes: int or None
+    :param factorization_cache: Cache of equilibrations and factorizations,
+        reused when solving again with the same matrix and cones; with the
+        PySPQR backend the column ordering is also reused when solving with a
+        matrix with the same sparsity pattern. A
+        :class:`cqr.factorization_store.FactorizationStore` shares them
+        on disk between processes. Default None, no caching.
+    :type factorization_cache: cqr.factorization_cache.FactorizationCache,
+        cqr.factorization_store.FactorizationStore or None
+    :param anderson: Whether to use Anderson acceleration of the
+        Douglas-Rachford iteration. Accelerated iterates that increase the
+        fixed-point residual are rejected; the acceptance rate is in
+        ``statistics``. Default False.
+    :type anderson: bool
+    :param anderson_memory: Number of past iterates used by Anderson
+        acceleration. Default 10.
+    :type anderson_memory: int
+    :param anderson_type: Type of Anderson acceleration, ``'I'`` or
+        ``'II'``. Default ``'II'``.
+    :type anderson_type: str
+    :param algorithm: Fixed-point iteration, ``'DR'`` for plain
+        Douglas-Rachford, ``'HALPERN'`` for its anchored variant, or
+        ``'RESTARTED_HALPERN'`` with adaptive restarts of the anchor, which
+        is usually much faster on LPs; the number of restarts is in
+        ``statistics``. Halpern variants can not be used with Anderson
+        acceleration. Default ``'DR'``.
+    :type algorithm: str
+    :param relaxation: Relaxation of the Douglas-Rachford step, in
+        ``(0, 2)``. Default 1, no relaxation.
+    :type relaxation: float
+    :param adaptive_relaxation: Whether to tune the relaxation, starting from
+        the given one, from the observed contraction of the fixed-point
+        residual; the final value is in ``statistics``. Default False.
+    :type adaptive_relaxation: bool
+    :param eps_abs: Absolute tolerance on the primal residual, dual residual
+        and duality gap, in the space of the original program; they are
+        checked every ``DouglasRachford.TERMINATION_INTERVAL`` iterations.
+        Default 0.
+    :type eps_abs: float
+    :param eps_rel: Relative tolerance on the same, with respect to the
+        largest norm of the terms of each. If both tolerances are zero the
+        iteration stops only at a fixed point. Default 0.
+    :type eps_rel: float
+    :param eps_infeas: Tolerance of the certificates of infeasibility and
+        unboundedness, normalized to have unit objective, in the space of
+        the original program. Default 1e-8.
+    :type eps_infeas: float
+    :param max_iter: Maximum number of iterations. Default 100000.
+    :type max_iter: int
+    :param fused_step: Whether to compute the Douglas-Rachford step in a
+        single call compiled by Numba, with the dense backend, see
+        :mod:`cqr.fused_step`. Default None, if Numba is installed and the
+        orthogonal factor is dense.
+    :type fused_step: bool or None
+    :param mixed_precision: Whether to iterate first with the orthogonal
+        factor and the buffers in single precision, until the fixed-point
+        residual stalls, and then finish from there in double precision.
+        Iterations, time and memory of the two phases are in
+        ``statistics``. Only with the dense backend, ignored otherwise.
+        Default False.
+    :type mixed_precision: bool
+    :param time_limit: Wall-clock time limit in seconds, including the
+        factorization. Default None, no limit.
+    :type time_limit: float or None
+    :param checkpoint: Path of a checkpoint file of the Douglas-Rachford
+        iteration, see :mod:`cqr.checkpoint`. If it exists and is of the
+        same program, the iteration resumes from it, counting its
+        iterations in ``max_iter``. It is written every
+        ``checkpoint_interval`` seconds, tested with the termination
+        criteria, and when stopped by ``max_iter`` or ``time_limit``.
+        The anchor of the Halpern variants restarts from the checkpoint.
+        With ``mixed_precision`` both phases are checkpointed, and a solve
+        interrupted in the single precision phase resumes in it. Default
+        None, no checkpoint.
+    :type checkpoint: str, pathlib.Path or None
+    :param checkpoint_interval: Seconds between writes of the checkpoint.
+        Default 60.
+    :type checkpoint_interval: float
     """
 
+    # status when the iteration stops at max_iter or time_limit, with the
+    # best iterate found
+    INACCURATE = 'Inaccurate'
+
     def __init__(
-            self, matrix, b, c, zero, nonneg, soc=(), x0=None, y0=None,
-            qr='PYSPQR', verbose=True):
+            self, matrix, b, c, zero, nonneg, soc=(), exp=0, x0=None,
+            y0=None, qr='PYSPQR', verbose=True, factorization_cache=None,
+            max_factorization_bytes=None, tsqr_workers=None, anderson=False,
+            anderson_memory=10, anderson_type='II', algorithm='DR',
+            relaxation=1., adaptive_relaxation=False, eps_abs=0., eps_rel=0.,
+            eps_infeas=1e-8, max_iter=100000, time_limit=None,
+            fused_step=None, mixed_precision=False, checkpoint=None,
+            checkpoint_interval=60.):
+
+        self._start_time = time.perf_counter()
 
         # process program data
         self.matrix = sp.sparse.csc_matrix(matrix)
         self.m, self.n = matrix.shape
-        assert zero >= 0
-        assert nonneg >= 0
-        for soc_dim in soc:
-            assert soc_dim > 1
-        assert zero + nonneg + sum(soc) == self.m
-        self.zero = zero
-        self.nonneg = nonneg
-        self.soc = soc
+        self._set_cone_layout(ConeLayout(zero, nonneg, soc, exp))
+        assert self.cone_layout.size == self.m
         assert len(b) == self.m
         self.b = np.array(b, dtype=float)
         assert len(c) == self.n
         self.c = np.array(c, dtype=float)
-        assert qr in ['NUMPY', 'PYSPQR']
+        assert qr in ['NUMPY', 'PYSPQR', 'TSQR', 'AUTO']
         self.qr = qr
+        self.tsqr_workers = os.cpu_count() if tsqr_workers is None \
+            else tsqr_workers
+        assert self.tsqr_workers > 0
         self.verbose = verbose
+        self.factorization_cache = factorization_cache
+        self.max_factorization_bytes = max_factorization_bytes
+        assert anderson_memory > 0
+        assert anderson_type in ANDERSON_TYPES
+        self.anderson = anderson
+        self.anderson_memory = anderson_memory
+        self.anderson_type = anderson_type
+        assert algorithm in ALGORITHMS
+        assert algorithm == 'DR' or not anderson
+        self.algorithm = algorithm
+        assert 0. < relaxation < 2.
+        self.relaxation = relaxation
+        self.adaptive_relaxation = adaptive_relaxation
+        assert eps_abs >= 0.
+        assert eps_rel >= 0.
+        self.eps_abs = eps_abs
+        self.eps_rel = eps_rel
+        assert eps_infeas > 0.
+        self.eps_infeas = eps_infeas
+        assert max_iter >= 0
+        self.max_iter = max_iter
+        assert time_limit is None or time_limit >= 0.
+        self.time_limit = time_limit
+        self.fused_step = fused_step
+        self.mixed_precision = mixed_precision
+        self.checkpoint = checkpoint
+        assert checkpoint_interval >= 0.
+        self.checkpoint_interval = checkpoint_interval
+        self.statistics = {}
 
         if self.verbose:
             print(
                 f'Program: m={self.m}, n={self.n}, nnz={self.matrix.nnz},'
-                f' zero={self.zero}, nonneg={self.nonneg}, soc={self.soc}')
+                f' zero={self.zero}, nonneg={self.nonneg}, soc={self.soc},'
+                f' exp={self.exp}')
 
         self.x = np.zeros(self.n) if x0 is None else np.array(x0)
         assert len(self.x) == self.n
@@ -97,14 +294,72 @@ class Solver:
         # self.y = np.empty(self.m, dtype=float)
         # self.update_variables(x0=x0, y0=y0)
 
+        self._factorize()
+        self._solve()
+
+    @property
+    def zero(self):
+        """Size of the zero cone."""
+        return self.cone_layout.zero
+
+    @property
+    def nonneg(self):
+        """Size of the non-negative cone."""
+        return self.cone_layout.nonneg
+
+    @property
+    def soc(self):
+        """Sizes of the second-order cones."""
+        return self.cone_layout.soc
+
+    @property
+    def exp(self):
+        """Number of exponential cones."""
+        return self.cone_layout.exp
+
+    def _set_cone_layout(self, layout):
+        """Set layout of the cones, and the projections on them."""
+        self.cone_layout = layout
+        self._second_order_cones = SecondOrderCones(layout)
+        self._exponential_cones = ExponentialCones(layout.exp)
+
+    def _solve(self):
+        """Solve program with current factorization, set status."""
+        self.statistics = {
+            key: value for key, value in self.statistics.items()
+            if key.startswith('qr_') or key == 'factorization_cache_hit'}
+        if self._transform_program():
+            self._iterate_and_invert(self.new_toy_douglas_rachford_solve)
+        self._finalize()
+
+    def _transform_program(self):
+        """Equilibrate and QR-transform program vectors and variables.
+
+        :returns: Whether the iteration is needed, else the status is set.
+        :rtype: bool
+        """
         try:
-            self._equilibrate()
+            self._equilibrate_vectors()
             self._qr_transform_program_data()
             self._qr_transform_dual_space()
             self._qr_transform_gap()
 
             self.admm_intercept = self.admm_linspace_project(np.zeros(self.m*2))
+            return True
+        except Unbounded:
+            self._invert_qr_transform()
+            self.status = 'Unbounded'
+            return False
+
+    def _iterate_and_invert(self, iterate):
+        """Run iteration, decide solution or certificate, set status.
 
+        :param iterate: Runs the iteration, returns ``'converged'``,
+            ``'tolerance'`` or ``'inaccurate'``, or raises ``Infeasible`` or
+            ``Unbounded``, see :meth:`new_toy_douglas_rachford_solve`.
+        :type iterate: callable
+        """
+        try:
             #### self.toy_solve()
             ##### self.x_transf, self.y = self.solve_program_cvxpy(
             #####     self.matrix_qr_transf, b, self.c_qr_transf)
@@ -115,40 +370,38 @@ class Solver:
 
             # self.decide_solution_or_certificate()
             # self.toy_douglas_rachford_solve()
-            self.new_toy_douglas_rachford_solve()
-            self.decide_solution_or_certificate()
+            status = iterate()
+            if status == 'converged':
+                self.decide_solution_or_certificate()
 
             self._invert_qr_transform_gap()
             self._invert_qr_transform_dual_space()
             self._invert_qr_transform()
-            self.status = 'Optimal'
+            self.status = self.INACCURATE if status == 'inaccurate' \
+                else 'Optimal'
         except Infeasible:
             self.status = 'Infeasible'
         except Unbounded:
             self._invert_qr_transform()
             self.status = 'Unbounded'
 
+    def _finalize(self):
+        """Invert equilibration, compute residuals of a solution."""
         self._invert_equilibrate()
+        if self.status in ['Optimal', self.INACCURATE]:
+            self.statistics.update(self.residuals(self.x, self.y))
 
         print('Resulting status:', self.status)
 
     def backsolve_r(self, vector, transpose=True):
-        """Simple triangular solve with matrix R."""
+        """Sparse triangular solve with matrix R."""
+        result = self.r.solve(vector, transpose=transpose)
+
         if transpose:  # forward transform c
             r = self.r.T
         else:  # backward tranform x
             r = self.r
 
-        # TODO: handle all degeneracies here
-        # try:
-        #     result = sp.linalg.solve_triangular(r, vector, lower=transpose)
-        #     ...
-        # except np.linalg.LinAlgError:
-        #
-
-        # TODO: this case can be handled much more efficiently
-        result = np.linalg.lstsq(r, vector, rcond=None)[0]
-
         if not np.allclose(r @ result, vector):
             if transpose:
                 # TODO: make sure this tested, what do we need to set on exit?
@@ -159,6 +412,148 @@ class Solver:
                 raise Exception('Solver error.')
         return result
 
+    def add_rows(self, rows, b, cone='nonneg'):
+        """Add constraint rows to the program and solve it again.
+
+        The QR factorization is updated, not recomputed, unless the backend
+        is PySPQR, and the current solution is used as initial guess. The new
+        rows are scaled like the
+        equilibrated rows, the rest of the equilibration is kept.
+
+        :param rows: New rows of the program matrix.
+        :type rows: sp.sparse.csr_matrix or np.array
+        :param b: New entries of the dual cost vector.
+        :type b: np.array
+        :param cone: Cone of the new rows, ``'zero'`` or ``'nonneg'``; they
+            are added at the end of its block.
+        :type cone: str
+        """
+        self._start_time = time.perf_counter()
+        rows = sp.sparse.csr_matrix(rows)
+        assert rows.shape[1] == self.n
+        b = np.array(b, dtype=float).ravel()
+        assert len(b) == rows.shape[0]
+        assert cone in ['zero', 'nonneg']
+        position = self.zero if cone == 'zero' else self.zero + self.nonneg
+
+        # scale new rows to median norm of equilibrated rows
+        rows_equil = rows @ sp.sparse.diags(self.equil_e)
+        norms = sp.sparse.linalg.norm(rows_equil, axis=1)
+        target = np.median(sp.sparse.linalg.norm(
+            self.matrix_ruiz_equil, axis=1))
+        scale = np.ones(len(norms))
+        scale[norms > 0] = target / norms[norms > 0]
+        rows_equil = sp.sparse.diags(scale) @ rows_equil
+
+        def insert(matrix, new):
+            return sp.sparse.vstack([
+                matrix[:position], new, matrix[position:]], format='csc')
+
+        self.matrix = insert(self.matrix, rows)
+        self.matrix_ruiz_equil = insert(self.matrix_ruiz_equil, rows_equil)
+        self.equil_d = np.insert(self.equil_d, position, scale)
+        self.b = np.insert(self.b, position, b)
+        self.y = np.insert(self.y, position, np.zeros(len(b)))
+        old_m = self.m
+        self.m += len(b)
+        if cone == 'zero':
+            self._set_cone_layout(ConeLayout(
+                self.zero + len(b), self.nonneg, self.soc, self.exp))
+        else:
+            self._set_cone_layout(ConeLayout(
+                self.zero, self.nonneg + len(b), self.soc, self.exp))
+
+        updates = 0
+        if old_m >= self.n and self._can_update_qr(1):
+            q, r = AppendedRowsQ.from_update(
+                self.matrix_qr_transf.orthogonal, self.r.dense(),
+                rows_equil[:, self.r.column_permutation].toarray(), position)
+            self._set_qr_factors(q, r, 1)
+            updates = len(b)
+        self._update_or_refactorize(updates)
+        self._solve()
+
+    def remove_rows(self, indices):
+        """Remove constraint rows from the program and solve it again.
+
+        The QR factorization is updated, not recomputed, unless the backend
+        is PySPQR or Numba is not installed, and the current solution is used
+        as initial guess.
+
+        :param indices: Indices of the rows to remove, which must belong to
+            the zero or non-negative cones.
+        :type indices: iterable
+        """
+        self._start_time = time.perf_counter()
+        indices = np.unique(np.array(indices, dtype=int))
+        assert np.all(indices >= 0)
+        assert np.all(indices < self.zero + self.nonneg)
+        keep = np.ones(self.m, dtype=bool)
+        keep[indices] = False
+
+        updates = 0
+        if NUMBA_AVAILABLE and self._can_update_qr(len(indices)):
+            q, r = self.matrix_qr_transf.orthogonal, self.r.dense()
+            # from the last, so that indices of the others don't change
+            for index in indices[::-1]:
+                q, r = DeletedRowQ.from_update(q, r, index)
+            self._set_qr_factors(q, r, len(indices))
+            updates = len(indices)
+
+        self.matrix = self.matrix[keep]
+        self.matrix_ruiz_equil = self.matrix_ruiz_equil[keep]
+        self.equil_d = self.equil_d[keep]
+        self.b = self.b[keep]
+        self.y = self.y[keep]
+        self.m -= len(indices)
+        removed_zero = int(np.sum(indices < self.zero))
+        self._set_cone_layout(ConeLayout(
+            self.zero - removed_zero,
+            self.nonneg - len(indices) + removed_zero, self.soc, self.exp))
+
+        self._update_or_refactorize(updates)
+        self._solve()
+
+    def _can_update_qr(self, factors):
+        """Whether to update the QR factors, chaining new orthogonal factors.
+
+        The updates work on the dense triangular factor, which is cheap only
+        next to the dense orthogonal factors of the NUMPY and TSQR backends;
+        with PySPQR the sparse factorization is computed again.
+        """
+        return self.qr_backend != 'PYSPQR' and \
+            self._qr_updates + factors <= _MAX_QR_UPDATES
+
+    def _set_qr_factors(self, orthogonal, triangular, factors):
+        """Set QR factors after chaining updates to the orthogonal factor."""
+        shape1 = min(self.n, orthogonal.shape[0])
+        self.matrix_qr_transf = orthogonal.column_block(0, shape1)
+        self.nullspace_projector = orthogonal.column_block(
+            shape1, orthogonal.shape[0])
+        self.r = TriangularFactor(triangular, self.r.column_permutation)
+        self._qr_updates += factors
+
+    def _factorization_drift(self):
+        """Relative error of the QR factors on a probe vector."""
+        probe = np.random.default_rng(0).standard_normal(self.n)
+        exact = self.matrix_ruiz_equil @ probe
+        if self.matrix_qr_transf.shape[0] != self.m:
+            return np.inf
+        error = exact - self.matrix_qr_transf @ (self.r @ probe)
+        return np.linalg.norm(error) / max(
+            np.linalg.norm(exact), np.finfo(float).tiny)
+
+    def _update_or_refactorize(self, updates):
+        """Check updated QR factors, factorize again if they drifted."""
+        self.statistics['qr_updates'] = self.statistics.get(
+            'qr_updates', 0) + updates
+        if self._factorization_drift() > _QR_UPDATE_DRIFT_TOLERANCE:
+            if self.verbose:
+                print('Factorizing again the updated program matrix.')
+            self._qr_factorize()
+            self.statistics['qr_refactorizations'] = self.statistics.get(
+                'qr_refactorizations', 0) + 1
+
     # def update_variables(self, x0=None, y0=None):
     #     """Update initial values of the primal and dual variables.
 
@@ -181,15 +576,42 @@ class Solver:
     #         assert len(y0) == self.m
     #         self.y[:] = np.array(y0, dtype=float)
 
+    def _factorize(self):
+        """Equilibrate and factorize program matrix, or get from cache."""
+        if self.factorization_cache is not None:
+            key = fingerprint(
+                self.matrix, self.zero, self.nonneg, self.soc, self.qr,
+                self.exp)
+            entry = self.factorization_cache.get(key)
+            if entry is not None:
+                if self.verbose:
+                    print('Factorization cache hit.')
+                self.__dict__.update(entry)
+                self.statistics['qr_backend'] = self.qr_backend
+                self.statistics['factorization_cache_hit'] = True
+                return
+            self.statistics['factorization_cache_hit'] = False
+
+        self._equilibrate()
+        self._qr_factorize()
+
+        if self.factorization_cache is not None:
+            self.factorization_cache.put(key, {
+                name: getattr(self, name)
+                for name in _FACTORIZATION_ATTRIBUTES})
+
     def _equilibrate(self):
-        """Apply Ruiz equilibration to program data."""
+        """Apply Ruiz equilibration to program matrix."""
         self.equil_d, self.equil_e, self.equil_sigma, self.equil_rho, \
-            self.matrix_ruiz_equil, self.b_ruiz_equil, self.c_ruiz_equil = \
-            hsde_ruiz_equilibration(
-                self.matrix, self.b, self.c, dimensions={
-                    'zero': self.zero, 'nonneg': self.nonneg, 'second_order': self.soc},
+            self.matrix_ruiz_equil, _, _ = hsde_ruiz_equilibration(
+                self.matrix, self.b, self.c, dimensions=self.cone_layout,
                 max_iters=5, l_norm=2, eps_cols=1e-12, eps_rows=1e-12)
 
+    def _equilibrate_vectors(self):
+        """Apply Ruiz equilibration to program vectors and variables."""
+        self.b_ruiz_equil = self.equil_sigma * (self.equil_d * self.b)
+        self.c_ruiz_equil = self.equil_rho * (self.equil_e * self.c)
+
         self.x_equil = self.equil_sigma * (self.x / self.equil_e)
         self.y_equil = self.equil_rho * (self.y / self.equil_d)
 
@@ -207,40 +629,92 @@ class Solver:
     def _qr_transform_program_data_pyspqr(self):
         """Apply QR decomposition to equilibrated program data."""
 
-        q, r, e = qr(self.matrix_ruiz_equil, ordering='AMD')
+        if self.factorization_cache is None:
+            q, r, e = sparse_qr(self.matrix_ruiz_equil)
+        else:
+            key = sparsity_fingerprint(self.matrix_ruiz_equil)
+            q, r, e = sparse_qr(
+                self.matrix_ruiz_equil,
+                column_ordering=self.factorization_cache.get_ordering(key))
+            self.factorization_cache.put_ordering(key, e.permutation)
+        q = SparseHouseholderQ.from_pyspqr(q)
         shape1 = min(self.n, self.m)
-        self.matrix_qr_transf = sp.sparse.linalg.LinearOperator(
-            shape=(self.m, shape1),
-            matvec=lambda x: q @ np.concatenate([x, np.zeros(self.m-shape1)]),
-            rmatvec=lambda y: (
-                q.T @ np.array(y, copy=True).reshape(y.size))[:shape1],
-        )
+        self.matrix_qr_transf = q.column_block(0, shape1)
         shape2 = max(self.m - self.n, 0)
-        self.nullspace_projector = sp.sparse.linalg.LinearOperator(
-            shape=(self.m, shape2),
-            matvec=lambda x: q @ np.concatenate([np.zeros(self.m-shape2), x]),
-            rmatvec=lambda y: (
-                q.T @ np.array(y, copy=True).reshape(y.size))[self.m-shape2:]
-        )
-        self.r = (r.todense() @ e)[:self.n]
+        self.nullspace_projector = q.column_block(self.m - shape2, self.m)
+        self.r = TriangularFactor(r[:shape1], e.permutation)
 
     def _qr_transform_program_data_numpy(self):
         """Apply QR decomposition to equilibrated program data."""
 
-        q, r = np.linalg.qr(self.matrix_ruiz_equil.todense(), mode='complete')
-        self.matrix_qr_transf = q[:, :self.n].A
-        self.nullspace_projector = q[:, self.n:].A
-        self.r = r[:self.n].A
+        q, r = DenseHouseholderQ.from_matrix(
+            self.matrix_ruiz_equil.toarray())
+        shape1 = min(self.n, self.m)
+        self.matrix_qr_transf = q.column_block(0, shape1)
+        self.nullspace_projector = q.column_block(shape1, self.m)
+        self.r = TriangularFactor(r, np.arange(self.n))
 
-    def _qr_transform_program_data(self):
-        """Delegate to either Numpy or PySPQR, create constants."""
-        if self.qr == 'NUMPY':
+    def _qr_transform_program_data_tsqr(self):
+        """Apply tall-skinny QR to equilibrated program data."""
+
+        with ThreadPoolExecutor(max_workers=self.tsqr_workers) as executor:
+            q, r, permutation = TSQRHouseholderQ.from_matrix(
+                sp.sparse.csr_matrix(self.matrix_ruiz_equil),
+                blocks=self.tsqr_workers, map_function=executor.map)
+        shape1 = min(self.n, self.m)
+        self.matrix_qr_transf = q.column_block(0, shape1)
+        self.nullspace_projector = q.column_block(shape1, self.m)
+        self.r = TriangularFactor(r, permutation)
+
+    def _choose_qr_backend(self):
+        """Predict cost of factorization, choose backend if automatic."""
+        estimate = estimate_qr_cost(
+            self.matrix_ruiz_equil, workers=self.tsqr_workers)
+        if self.qr == 'AUTO':
+            backend = choose_qr_backend(
+                estimate, max_bytes=self.max_factorization_bytes)
+        else:
+            backend = self.qr
+            if self.max_factorization_bytes is not None and (
+                    estimate[backend]['bytes'] > self.max_factorization_bytes):
+                backend = None
+        if backend is None:
+            raise FactorizationTooLarge(
+                'Predicted memory of the QR factorization exceeds the budget'
+                f' of {self.max_factorization_bytes} bytes.')
+        self.statistics['qr_backend'] = backend
+        self.statistics['qr_predicted_fill'] = estimate['fill']
+        self.statistics['qr_predicted_seconds'] = estimate[backend]['seconds']
+        self.statistics['qr_predicted_bytes'] = estimate[backend]['bytes']
+        if self.verbose and self.qr == 'AUTO':
+            print(
+                f'QR backend: {backend}, predicted time '
+                f'{estimate[backend]["seconds"]:.2e}s, predicted memory '
+                f'{estimate[backend]["bytes"]/2**20:.1f}MB')
+        return backend
+
+    def _qr_factorize(self):
+        """Delegate to either Numpy or PySPQR."""
+        self.qr_backend = self._choose_qr_backend()
+        self._qr_updates = 0
+        start = time.perf_counter()
+        if self.qr_backend == 'NUMPY':
             self._qr_transform_program_data_numpy()
-        elif self.qr == 'PYSPQR':
+        elif self.qr_backend == 'PYSPQR':
             self._qr_transform_program_data_pyspqr()
+        elif self.qr_backend == 'TSQR':
+            self._qr_transform_program_data_tsqr()
         else:
             raise SyntaxError('Wrong qr setting!')
+        self.statistics['qr_seconds'] = time.perf_counter() - start
+        self.statistics['qr_bytes'] = (
+            self.matrix_qr_transf.orthogonal.nbytes + self.r.nbytes)
 
+        if self.verbose and self.r.rank < min(self.m, self.n):
+            print(f'Program matrix is rank deficient, rank={self.r.rank}')
+
+    def _qr_transform_program_data(self):
+        """Create constants of QR-transformed program."""
         self.c_qr_transf = self.backsolve_r(self.c_ruiz_equil)
 
         # TODO: unclear if this helps
@@ -283,36 +757,10 @@ class Solver:
         """Invert QR transformation of dual space."""
         self.y_equil = self.y0 + self.nullspace_projector @ self.y_reduced
 
-    def _qr_transform_gap_pyspqr(self):
-        """Apply QR transformation to zero-gap residual."""
-        mat = np.concatenate([
-            self.c_qr_transf, self.b_reduced]).reshape((self.m, 1))
-        mat = sp.sparse.csc_matrix(mat)
-        q, r, e = qr(mat)
-
-        self.gap_NS = sp.sparse.linalg.LinearOperator(
-            shape=(self.m, self.m-1),
-            matvec=lambda var_reduced: q @ np.concatenate(
-                [[0.], var_reduced]),
-            rmatvec=lambda var: (q.T @ var)[1:]
-        )
-
-    def _qr_transform_gap_numpy(self):
-        """Apply QR transformation to zero-gap residual."""
-        Q, R = np.linalg.qr(
-            np.concatenate(
-                [self.c_qr_transf, self.b_reduced]).reshape((self.m, 1)),
-            mode='complete')
-        self.gap_NS = Q[:, 1:]
-
     def _qr_transform_gap(self):
-        """Delegate to either Numpy or PySPQR, create constants."""
-        if self.qr == 'NUMPY':
-            self._qr_transform_gap_numpy()
-        elif self.qr == 'PYSPQR':
-            self._qr_transform_gap_pyspqr()
-        else:
-            raise SyntaxError('Wrong qr setting!')
+        """Apply QR transformation to zero-gap residual, create constants."""
+        self.gap_NS = HouseholderReflector(
+            np.concatenate([self.c_qr_transf, self.b_reduced]))
 
         self.var0 = - self.b0 * np.concatenate(
             [self.c_qr_transf, self.b_reduced]) / np.linalg.norm(
@@ -393,22 +841,26 @@ class Solver:
         """Project on self-dual cones."""
         result = np.empty_like(conic_var)
         result[:self.nonneg] = np.maximum(conic_var[:self.nonneg], 0.)
-        cur = self.nonneg
-        for soc_dim in self.soc:
-            self.second_order_project(
-                conic_var[cur:cur+soc_dim], result[cur:cur+soc_dim])
-            cur += soc_dim
+        self._second_order_cones.project(
+            conic_var[self.nonneg:], result[self.nonneg:],
+            np.empty_like(result[self.nonneg:]))
         return result
 
     def cone_project(self, s):
         """Project on program cone."""
-        return np.concatenate([
-            np.zeros(self.zero), self.self_dual_cone_project(s[self.zero:])])
+        pi, reflected = np.empty_like(s), np.empty_like(s)
+        self.cone_layout.project(
+            s, pi, reflected, self._second_order_cones,
+            exponential_cones=self._exponential_cones)
+        return pi
 
     def dual_cone_project_basic(self, y):
         """Project on dual of program cone."""
-        return np.concatenate([
-            y[:self.zero], self.self_dual_cone_project(y[self.zero:])])
+        pi, reflected = np.empty_like(y), np.empty_like(y)
+        self.cone_layout.project(
+            y, pi, reflected, self._second_order_cones, dual=True,
+            exponential_cones=self._exponential_cones)
+        return pi
 
     ##
     # ADMM Idea
@@ -416,58 +868,19 @@ class Solver:
 
     def admm_cone_project(self, sy):
         """Project ADMM variable on the cone."""
-        s = sy[:self.m]
-        y = sy[self.m:]
-        pi_s = self.cone_project(s)
-        pi_y = self.dual_cone_project_basic(y)
-        return np.concatenate([pi_s, pi_y])
+        return self.new_admm_cone_project(sy)[0]
 
     def new_admm_cone_project(self, sy):
         """Project ADMM variable on the cone."""
-        s = sy[:self.m]
-        y = sy[self.m:]
-        pi = np.empty(self.m*2)
-        two_pi_minus_sy = np.empty(self.m*2)
-
-        cur = 0
-
-        # s, zero cone
-        pi[:self.zero] = np.zeros(self.zero)
-        two_pi_minus_sy[:self.zero] = -s[:self.zero]
-
-        cur += self.zero
-
-        # s, nonneg cone
-        pi[cur:cur+self.nonneg] = np.maximum(s[cur:cur+self.nonneg], 0.)
-        two_pi_minus_sy[cur:cur+self.nonneg] = 2 * pi[cur:cur+self.nonneg] - s[cur:cur+self.nonneg]
-
-        cur += self.nonneg
-
-        # s, soc cones
-        for q in self.soc:
-            self.new_second_order_project(s[cur:cur+q], pi[cur:cur+q], two_pi_minus_sy[cur:cur+q])
-            cur += q
-
-        # y, zero cone
-        pi[cur:cur+self.zero] = y[:self.zero]
-        two_pi_minus_sy[cur:cur+self.zero] = y[:self.zero]
-
-        cur += self.zero
-
-        # y, nonneg cone
-        pi[cur:cur+self.nonneg] = np.maximum(y[cur-self.m:cur-self.m+self.nonneg], 0.)
-        two_pi_minus_sy[cur:cur+self.nonneg] = 2 * pi[cur:cur+self.nonneg] - y[cur-self.m:cur-self.m+self.nonneg]
-
-        cur += self.nonneg
-
-        # y, soc cones
-        for q in self.soc:
-            self.new_second_order_project(y[cur-self.m:cur-self.m+q], pi[cur:cur+q], two_pi_minus_sy[cur:cur+q])
-            # two_pi_minus_sy[cur:cur+q] = 2 * pi[cur:cur+q] - y[cur-self.m:cur-self.m+q]
-            cur += q
-
-        assert cur == self.m * 2
-
+        m = self.m
+        pi = np.empty(m * 2)
+        two_pi_minus_sy = np.empty(m * 2)
+        self.cone_layout.project(
+            sy[:m], pi[:m], two_pi_minus_sy[:m], self._second_order_cones,
+            exponential_cones=self._exponential_cones)
+        self.cone_layout.project(
+            sy[m:], pi[m:], two_pi_minus_sy[m:], self._second_order_cones,
+            dual=True, exponential_cones=self._exponential_cones)
         return pi, two_pi_minus_sy
 
     def _sy_from_var_reduced(self, var_reduced):
@@ -559,68 +972,391 @@ class Solver:
             matvec=matvec,
             rmatvec=rmatvec)
 
-    def new_toy_douglas_rachford_solve(self, max_iter=int(1e5), eps=1e-12):
-        """Simple Douglas-Rachford iteration."""
+    def _unscaled_from_sy(self, sy):
+        """Get variables of the original program from DR iterate.
+
+        :returns: Reduced variable, primal and dual variables.
+        :rtype: tuple
+        """
+        var_reduced = self._var_reduced_from_sy(self.admm_cone_project(sy))
+        var = self.var0 + self.gap_NS @ var_reduced
+        x_equil = self.r.solve(var[:self.n], transpose=False) * self.sigma_qr
+        y_equil = self.y0 + self.nullspace_projector @ var[self.n:]
+        return var_reduced, (self.equil_e * x_equil) / self.equil_sigma, \
+            (self.equil_d * y_equil) / self.equil_rho
+
+    def residuals(self, x, y):
+        """Residuals of a primal-dual pair of the original program.
+
+        The primal residual is the distance of ``b - A x`` from the cone,
+        the dual residual is the norm of ``A^T y + c`` and the distance of
+        ``y`` from the dual cone, the gap is ``|c^T x + b^T y|``. Each is
+        compared with the largest infinity norm of its terms.
+
+        :param x: Primal variable.
+        :type x: np.array
+        :param y: Dual variable.
+        :type y: np.array
+
+        :returns: Residuals and their scales, ``primal``, ``dual``, ``gap``
+            and the same with ``_scale`` suffix.
+        :rtype: dict
+        """
+        matrix_x = self.matrix @ x
+        s = self.b - matrix_x
+        matrix_t_y = self.matrix.T @ y
+        y_cone = self.dual_cone_project_basic(y)
+        c_x, b_y = self.c @ x, self.b @ y
+        return {
+            'primal': np.linalg.norm(s - self.cone_project(s), np.inf),
+            'primal_scale': max(
+                np.linalg.norm(self.b, np.inf),
+                np.linalg.norm(matrix_x, np.inf)),
+            'dual': max(
+                np.linalg.norm(matrix_t_y + self.c, np.inf),
+                np.linalg.norm(y - y_cone, np.inf)),
+            'dual_scale': max(
+                np.linalg.norm(self.c, np.inf),
+                np.linalg.norm(matrix_t_y, np.inf)),
+            'gap': abs(c_x + b_y),
+            'gap_scale': max(abs(c_x), abs(b_y))}
+
+    def _check_termination(self, sy):
+        """Check tolerances at DR iterate, keep the best iterate so far.
+
+        :returns: Whether the tolerances are met.
+        :rtype: bool
+        """
+        var_reduced, x, y = self._unscaled_from_sy(sy)
+        residuals = self.residuals(x, y)
+        names = ['primal', 'dual', 'gap']
+        # relative residual, to rank iterates also with zero tolerances
+        score = max(
+            residuals[name] / (1. + residuals[name + '_scale'])
+            for name in names)
+        met = (self.eps_abs > 0. or self.eps_rel > 0.) and all(
+            residuals[name] <= self.eps_abs
+            + self.eps_rel * residuals[name + '_scale'] for name in names)
+        if met or self._best_iterate is None or \
+                score < self._best_iterate[0]:
+            self._best_iterate = (score, var_reduced, residuals)
+        return met
+
+    def is_infeasibility_certificate(self, y):
+        """Check if dual vector certifies primal infeasibility.
+
+        :param y: Dual vector, normalized so that ``b^T y = -1``.
+        :type y: np.array
+
+        :returns: Whether ``A^T y`` and the distance of ``y`` from the dual
+            cone are within ``eps_infeas``.
+        :rtype: bool
+        """
+        y_cone = self.dual_cone_project_basic(y)
+        return bool(max(
+            np.linalg.norm(self.matrix.T @ y, np.inf),
+            np.linalg.norm(y - y_cone, np.inf)) <= self.eps_infeas)
+
+    def is_unboundedness_certificate(self, x):
+        """Check if primal vector certifies unboundedness.
+
+        :param x: Primal vector, normalized so that ``c^T x = -1``.
+        :type x: np.array
+
+        :returns: Whether the distance of ``-A x`` from the cone is within
+            ``eps_infeas``.
+        :rtype: bool
+        """
+        s = -(self.matrix @ x)
+        return bool(np.linalg.norm(
+            s - self.cone_project(s), np.inf) <= self.eps_infeas)
+
+    def _check_certificate(self, step):
+        """Build certificates from converged DR step and check them.
+
+        The step converges to the difference of the closest points of the
+        affine subspace and the cone, which is orthogonal to the former and
+        in the polar of the latter. So its ``s`` part is minus a dual ray,
+        orthogonal to the range of the matrix, and its ``y`` part is in the
+        range of the matrix, ``A x`` with ``-A x`` in the cone. If one is a
+        valid certificate it is stored for
+        :meth:`new_toy_douglas_rachford_solve`.
+
+        :returns: Whether a certificate was found.
+        :rtype: bool
+        """
+        m = self.m
+        y_equil = -step[:m]
+        y = self.equil_d * y_equil
+        b_y = self.b @ y
+        if b_y < 0. and self.is_infeasibility_certificate(y / -b_y):
+            self._certificate = ('infeasible', y_equil * (
+                self.equil_rho / -b_y))
+            return True
+
+        x_transf = self.matrix_qr_transf.T @ step[m:]
+        x = self.equil_e * self.r.solve(x_transf, transpose=False)
+        c_x = self.c @ x
+        if c_x < 0. and self.is_unboundedness_certificate(x / -c_x):
+            self._certificate = ('unbounded', x_transf * (
+                self.equil_sigma / (-c_x * self.sigma_qr)))
+            return True
+        return False
+
+    def _remaining_time(self):
+        """Time left before the time limit, or None.
+
+        :returns: Seconds.
+        :rtype: float or None
+        """
+        return None if self.time_limit is None else max(
+            self.time_limit - (time.perf_counter() - self._start_time), 0.)
+
+    def _single_precision_solve(self, dr_y, eps, relaxation,
+                                previous_iterations):
+        """First phase of mixed precision, with the factor in float32.
+
+        It runs until the step norm stalls, see
+        :meth:`cqr.douglas_rachford.DouglasRachford.solve`. If there is a
+        checkpoint it is written every ``checkpoint_interval`` seconds,
+        tested at the same interval as the termination criteria, which are
+        not evaluated in this phase.
+
+        :param dr_y: Initial point.
+        :type dr_y: np.array
+        :param eps: Tolerance on the norm of the step.
+        :type eps: float
+        :param relaxation: Relaxation of the step.
+        :type relaxation: float
+        :param previous_iterations: Iterations done before, e.g., by the
+            process that wrote the checkpoint.
+        :type previous_iterations: int
+
+        :returns: Last iterate, in double precision, total number of
+            iterations, and termination status of the phase.
+        :rtype: tuple
+        """
+        start = time.perf_counter()
+        engine = DouglasRachford.from_solver(
+            self, fused=self.fused_step, dtype=np.float32)
+
+        check = None
+        if self.checkpoint is not None:
+
+            def check(_):
+                if time.perf_counter() - self._last_checkpoint >= \
+                        self.checkpoint_interval:
+                    self._save_checkpoint(
+                        engine, None, previous_iterations, phase='single')
+                return False
+
+        status = engine.solve(
+            dr_y, max_iter=max(self.max_iter - previous_iterations, 0),
+            eps=eps, relaxation=relaxation,
+            time_limit=self._remaining_time(), check=check,
+            algorithm=self.algorithm, stall=True)
+        self.statistics['single_iterations'] = engine.iterations
+        self.statistics['single_termination'] = status
+        self.statistics['single_seconds'] = time.perf_counter() - start
+        self.statistics['single_bytes'] = engine.nbytes
+        if self.verbose:
+            print(
+                f'Single precision phase: {engine.iterations} iterations, '
+                f'{status}, {self.statistics["single_seconds"]:.2e}s, '
+                f'{engine.nbytes/2**20:.1f}MB')
+        return engine.dr_y.astype(np.float64), \
+            previous_iterations + engine.iterations, status
+
+    def _load_checkpoint(self):
+        """Load checkpoint of the iteration, if it is of this program.
+
+        :returns: Iterate, number of iterations, relaxation, phase and state
+            of the Anderson acceleration, or None if there is no checkpoint.
+        :rtype: tuple or None
+        """
+        self._checkpoint_key = program_fingerprint(self)
+        self.statistics['checkpoints'] = 0
+        if not os.path.exists(self.checkpoint):
+            return None
+        key, dr_y, iterations, relaxation, phase, anderson_state = \
+            load_checkpoint(self.checkpoint)
+        if key != self._checkpoint_key:
+            if self.verbose:
+                print('Checkpoint is of another program, not resumed.')
+            return None
+        if self.verbose:
+            print(
+                f'Resuming from checkpoint after {iterations} iterations, '
+                f'in the {phase} precision phase.')
+        return dr_y, iterations, relaxation, phase, anderson_state
+
+    def _save_checkpoint(
+            self, engine, acceleration, previous_iterations, phase='double'):
+        """Write checkpoint of the iteration.
+
+        :param engine: Douglas-Rachford engine, during or after its solve.
+        :type engine: cqr.douglas_rachford.DouglasRachford
+        :param acceleration: Anderson acceleration, or None.
+        :type acceleration: cqr.anderson.AndersonAcceleration or None
+        :param previous_iterations: Iterations done before the engine's.
+        :type previous_iterations: int
+        :param phase: Phase of the iteration, ``'single'`` or ``'double'``
+            precision. Default ``'double'``.
+        :type phase: str
+        """
+        save_checkpoint(
+            self.checkpoint, self._checkpoint_key, engine.dr_y,
+            previous_iterations + engine.iterations, engine.relaxation,
+            acceleration, phase=phase)
+        self._last_checkpoint = time.perf_counter()
+        self.statistics['checkpoints'] += 1
+
+    def new_toy_douglas_rachford_solve(self, eps=1e-12):
+        """Simple Douglas-Rachford iteration.
+
+        :param eps: Tolerance on the norm of the step, at which the iterate is
+            a fixed point.
+        :type eps: float
+
+        :returns: ``'converged'`` at a fixed point, ``'tolerance'`` if the
+            tolerances are met,
+            ``'inaccurate'`` if stopped by ``max_iter`` or ``time_limit``.
+        :rtype: str
+        """
         dr_y = self._sy_from_var_reduced(self.var_reduced)
-        # self.admm_compute_intercept()
-
-        losses = []
-        # steps = []
-        # xs = []
-        # breakpoint()
-
-        ##
-        # Analize vectors
-        ##
-
-        # for var in [self.var0, self.y0, self.b_qr_transf, self.admm_intercept]:
-        #     _ = np.abs(var)
-        #     _ = _[_ > 10 * np.finfo(float).eps]
-        #     print(f'min={np.min(_):.2e} max={np.max(_):.2e}')
-
-        # breakpoint()
-
-        for i in range(max_iter):
-            step = self.douglas_rachford_step(dr_y)
-            losses.append(np.linalg.norm(step))
-            # xs.append(dr_y)
-            # steps.append(step)
-            # print(f'iter {i} loss {losses[-1]:.2e}')
-            if np.linalg.norm(step) < eps:
-                print(f'converged in {i} iterations')
-                break
-
-            dr_y = np.copy(dr_y + step)
-
-            # infeas / unbound
-            if i % 100 == 99:
-                tmp = self.admm_linspace_project(dr_y)
-                cert = tmp - self.admm_cone_project(tmp)
-                # y_cert = cert[:self.m]
-                # s_cert = cert[self.m:]
-                # x_cert = self.matrix_qr_transf.T @ cert[self.m:]
-                cert /= np.linalg.norm(cert) # no, shoud normalize y by b and x,s by c
-                # TODO double check this logic
-                if (np.linalg.norm(self.matrix_qr_transf.T @ cert[:self.m]) < eps) and (np.linalg.norm(self.matrix_qr_transf @ self.matrix_qr_transf.T @ cert[self.m:] - cert[self.m:]) < eps):
-                    # print('INFEASIBLE')
-                    break
-
-        else: # TODO: needs early stopping for infeas/unbound
-
-            import matplotlib.pyplot as plt
-            plt.semilogy(losses)
-            plt.show()
-
-            raise NotImplementedError
+        relaxation = self.relaxation
+        previous_iterations = 0
+        phase = 'double'
+        resumed = None
+        if self.checkpoint is not None:
+            resumed = self._load_checkpoint()
+            self._last_checkpoint = time.perf_counter()
+        if resumed is not None:
+            dr_y, previous_iterations, relaxation, phase, anderson_state = \
+                resumed
+            self.statistics['resumed_iterations'] = previous_iterations
+            self.statistics['resumed_phase'] = phase
+        mixed_precision = self.mixed_precision and isinstance(
+            self.matrix_qr_transf.orthogonal, DenseHouseholderQ) and (
+                resumed is None or phase == 'single')
+        if mixed_precision:
+            dr_y, previous_iterations, single_status = \
+                self._single_precision_solve(
+                    dr_y, eps, relaxation, previous_iterations)
+            # stopped by max_iter or time_limit before it stalled
+            phase = 'single' if single_status in [
+                'max_iter', 'time_limit'] else 'double'
+        else:
+            phase = 'double'
+
+        start = time.perf_counter()
+        engine = DouglasRachford.from_solver(self, fused=self.fused_step)
+        acceleration = AndersonAcceleration(
+            size=len(dr_y), memory=self.anderson_memory,
+            anderson_type=self.anderson_type) if self.anderson else None
+        reset_acceleration = True
+        if acceleration is not None and resumed is not None and \
+                anderson_state is not None:
+            try:
+                acceleration.restore(anderson_state)
+                reset_acceleration = False
+            except ValueError:
+                pass
+        self._best_iterate = None
+
+        check = self._check_termination
+        if self.checkpoint is not None:
+
+            def check(dr_y):
+                if time.perf_counter() - self._last_checkpoint >= \
+                        self.checkpoint_interval:
+                    self._save_checkpoint(
+                        engine, acceleration, previous_iterations)
+                return self._check_termination(dr_y)
+
+        status = engine.solve(
+            dr_y, max_iter=max(self.max_iter - previous_iterations, 0),
+            eps=eps, acceleration=acceleration, relaxation=relaxation,
+            adaptive_relaxation=self.adaptive_relaxation,
+            time_limit=self._remaining_time(), check=check,
+            certificate=self._check_certificate, algorithm=self.algorithm,
+            reset_acceleration=reset_acceleration)
+        if self.checkpoint is not None and status in [
+                'max_iter', 'time_limit']:
+            self._save_checkpoint(
+                engine, acceleration, previous_iterations, phase=phase)
+        self.statistics['iterations'] = engine.iterations + \
+            previous_iterations
+        if mixed_precision:
+            self.statistics['double_iterations'] = engine.iterations
+            self.statistics['double_seconds'] = time.perf_counter() - start
+            self.statistics['double_bytes'] = engine.nbytes
+        if self.algorithm == 'RESTARTED_HALPERN':
+            self.statistics['restarts'] = engine.restarts
+        self.statistics['relaxation'] = engine.relaxation
+        self.statistics['termination'] = status
+
+        if acceleration is not None:
+            self.statistics['anderson_accepted'] = acceleration.accepted
+            self.statistics['anderson_rejected'] = acceleration.rejected
+            self.statistics['anderson_acceptance_rate'] = \
+                acceleration.acceptance_rate
+            if self.verbose:
+                print(
+                    'Anderson acceleration acceptance rate: '
+                    f'{acceleration.acceptance_rate:.2f}')
+
+        return self._douglas_rachford_outcome(
+            status, engine.dr_y, engine.iterations)
+
+    def _douglas_rachford_outcome(self, status, dr_y, iterations):
+        """Set reduced variable, or certificate, from the iteration's end.
+
+        :param status: Status returned by the engine's ``solve``.
+        :type status: str
+        :param dr_y: Last iterate.
+        :type dr_y: np.array
+        :param iterations: Number of iterations.
+        :type iterations: int
+
+        :raises Infeasible: If a certificate of infeasibility was found.
+        :raises Unbounded: If a certificate of unboundedness was found.
+
+        :returns: ``'converged'``, ``'tolerance'`` or ``'inaccurate'``, as
+            :meth:`new_toy_douglas_rachford_solve`.
+        :rtype: str
+        """
+        if status == 'converged':
+            print(f'converged in {iterations} iterations')
+
+        if status == 'certificate':
+            kind, certificate = self._certificate
+            if kind == 'infeasible':
+                self.y_equil = certificate
+                raise Infeasible()
+            self.x_transf = certificate
+            raise Unbounded()
+
+        if status in ['max_iter', 'time_limit']:
+            self._check_termination(dr_y)
+            _, self.var_reduced, residuals = self._best_iterate
+            if self.verbose:
+                print(
+                    f'Stopped by {status}, returning best iterate with '
+                    f'primal residual {residuals["primal"]:.2e}, dual '
+                    f'residual {residuals["dual"]:.2e}, gap '
+                    f'{residuals["gap"]:.2e}')
+            return 'inaccurate'
+
+        if status == 'tolerance':
+            _, self.var_reduced, _ = self._best_iterate
+            return status
 
         self.var_reduced = self._var_reduced_from_sy(
             self.admm_cone_project(dr_y))
         print('SQNORM RESIDUAL OF SOLUTION',
             np.linalg.norm(self.newres(self.var_reduced))**2)
-
-        # import matplotlib.pyplot as plt
-        # plt.semilogy(losses)
-        # plt.show()
+        return 'converged'
 
     def identity_minus_cone_project(self, s):
         """Identity minus projection on program cone."""
@@ -633,7 +1369,7 @@ class Solver:
 
     def dual_cone_project_nozero(self, y):
         """Project on dual of program cone, skip zeros."""
-        return self.self_dual_cone_project(y[self.zero:])
+        return self.dual_cone_project_basic(y)[self.zero:]
 
     def identity_minus_dual_cone_project_nozero(self, y):
         """Identity minus projection on dual of program cone, skip zeros."""
@@ -17,6 +17,7 @@
 
 import time
 import logging
+import tempfile
 import warnings
 from unittest import TestCase, main, skip
 
@@ -24,12 +25,25 @@ import cvxpy as cp
 import numpy as np
 import scipy as sp
 
-from .solver import Solver, Infeasible, Unbounded
+from . import solver as solver_module
+from .solver import Solver, Infeasible, Unbounded, FactorizationTooLarge
 from .cvxpy_interface import CQR
+from .factorization_cache import FactorizationCache
+from .factorization_store import FactorizationStore
+from .fused_step import NUMBA_AVAILABLE
 
 from .test_ql_transform import TestQLTransform
 from .test_cones import TestCones
 from .test_linspace_project import TestLinspaceProject
+from .test_factorization_cache import TestFactorizationCache
+from .test_factorization_store import TestFactorizationStore
+from .test_douglas_rachford import TestDouglasRachford
+from .test_anderson import TestAnderson
+from .test_batch import TestBatch
+from .test_checkpoint import TestCheckpoint
+from .test_factors import TestFactors
+from .test_qr_cost import TestQRCost
+from .test_programs import TestPrograms
 
 
 logging.basicConfig(level='INFO')
@@ -395,6 +409,54 @@ class TestSolverClass(TestCase):
             [x[:-1] <= 1., x[-1] == 0.])
         self.check_solve_from_cvxpy(probl)
 
+    @staticmethod
+    def _cone_vector(dims):
+        """Random vector in the interior of the cone, zero on zero cone."""
+        vector = [np.zeros(dims.zero), np.abs(np.random.randn(dims.nonneg))]
+        for size in dims.soc:
+            cone = np.random.randn(size)
+            cone[0] = np.linalg.norm(cone[1:]) + .1
+            vector.append(cone)
+        return np.concatenate(vector)
+
+    def test_certificates_from_differences(self):
+        """Test certificates are found in few iterations."""
+        for m, n, dims in [
+                (40, 10, Dims(40, 10, zero=3)),
+                (100, 30, Dims(100, 30, zero=5, soc=(3, 4)))]:
+            np.random.seed(0)
+            matrix = np.random.randn(m, n)
+
+            # primal infeasible, y with A^T y = 0 and b^T y = -1
+            y = self._cone_vector(dims)
+            y[:dims.zero] = np.random.randn(dims.zero)
+            infeasible = matrix - np.outer(y, y @ matrix) / (y @ y)
+            b = np.random.randn(m)
+            b -= y * (b @ y + 1) / (y @ y)
+            solver = Solver(
+                infeasible, b, np.random.randn(n), zero=dims.zero,
+                nonneg=dims.nonneg, soc=dims.soc)
+            self.assertEqual(solver.status, 'Infeasible')
+            self.assertEqual(solver.statistics['termination'], 'certificate')
+            self.assertLess(solver.statistics['iterations'], 1000)
+            self.check_infeasibility_certificate_valid(
+                infeasible, b, solver.y, dims=dims)
+
+            # unbounded, x with -A x in cone and c^T x = -1
+            x = np.random.randn(n)
+            unbounded = matrix - np.outer(
+                matrix @ x + self._cone_vector(dims), x) / (x @ x)
+            c = np.random.randn(n)
+            c -= x * (c @ x + 1) / (x @ x)
+            b = unbounded @ np.random.randn(n) + self._cone_vector(dims)
+            solver = Solver(
+                unbounded, b, c, zero=dims.zero, nonneg=dims.nonneg,
+                soc=dims.soc)
+            self.assertEqual(solver.status, 'Unbounded')
+            self.assertEqual(solver.statistics['termination'], 'certificate')
+            self.check_unboundedness_certificate_valid(
+                unbounded, c, solver.x, dims=dims)
+
     def test_more_difficult_infeasible(self):
         """More difficult primal infeasible."""
         np.random.randn(0)
@@ -564,6 +626,190 @@ class TestSolverClass(TestCase):
 
         self.assertLess(time_hotstart, time_coldstart)
 
+    def test_factorization_cache(self):
+        """Test re-solves with cached factorization."""
+        np.random.seed(0)
+        matrix = sp.sparse.csc_matrix(np.random.randn(20, 10))
+        dims = Dims(*matrix.shape, zero=3)
+        cache = FactorizationCache()
+        for seed in range(3):
+            b, c = self.make_program_from_matrix(matrix, dims=dims, seed=seed)
+            solver = Solver(
+                matrix, b, c, zero=dims.zero, nonneg=dims.nonneg,
+                factorization_cache=cache)
+            self.assertEqual(solver.status, 'Optimal')
+            self.check_solution_valid(
+                matrix, b, c, solver.x, solver.y, dims=dims)
+            # equilibration is the one of the first program, so the solution
+            # may differ if not unique, but the objective doesn't
+            uncached = Solver(matrix, b, c, zero=dims.zero, nonneg=dims.nonneg)
+            self.assertTrue(np.isclose(c @ solver.x, c @ uncached.x))
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(len(cache), 1)
+
+    def test_factorization_store(self):
+        """Test re-solves with factorization loaded from disk."""
+        np.random.seed(0)
+        matrix = sp.sparse.csc_matrix(np.random.randn(20, 10))
+        dims = Dims(*matrix.shape, zero=3)
+        with tempfile.TemporaryDirectory() as directory:
+            for qr in ['PYSPQR', 'NUMPY', 'TSQR']:
+                for seed in range(2):
+                    b, c = self.make_program_from_matrix(
+                        matrix, dims=dims, seed=seed)
+                    # as if each solve was in a new process
+                    store = FactorizationStore(directory)
+                    solver = Solver(
+                        matrix, b, c, zero=dims.zero, nonneg=dims.nonneg,
+                        qr=qr, factorization_cache=store, tsqr_workers=2)
+                    self.assertEqual(solver.status, 'Optimal')
+                    self.check_solution_valid(
+                        matrix, b, c, solver.x, solver.y, dims=dims)
+                    self.assertEqual(
+                        solver.statistics['factorization_cache_hit'],
+                        seed > 0)
+            # the loaded factors are read-only, updates wrap them
+            solver.add_rows(np.random.randn(2, 10), np.ones(2))
+            self.assertEqual(solver.status, 'Optimal')
+
+    def test_column_ordering_reuse(self):
+        """Test re-solves with same sparsity pattern reuse column ordering."""
+        np.random.seed(0)
+        matrix = np.random.randn(30, 10) * (
+            np.random.uniform(size=(30, 10)) < .5)
+        matrix = sp.sparse.csc_matrix(matrix + np.eye(30, 10))
+        dims = Dims(*matrix.shape, zero=3)
+        cache = FactorizationCache()
+        for seed in range(3):
+            np.random.seed(seed)
+            perturbed = matrix.copy()
+            perturbed.data *= 1. + np.random.uniform(size=matrix.nnz)
+            b, c = self.make_program_from_matrix(
+                perturbed, dims=dims, seed=seed)
+            solver = Solver(
+                perturbed, b, c, zero=dims.zero, nonneg=dims.nonneg,
+                factorization_cache=cache)
+            self.assertEqual(solver.status, 'Optimal')
+            self.check_solution_valid(
+                perturbed, b, c, solver.x, solver.y, dims=dims)
+        self.assertEqual(cache.misses, 3)
+        self.assertEqual(cache.ordering_misses, 1)
+        self.assertEqual(cache.ordering_hits, 2)
+
+    def test_qr_auto(self):
+        """Test automatic choice of QR backend and memory budget."""
+        np.random.seed(0)
+        dense = sp.sparse.csc_matrix(np.random.randn(20, 10))
+        sparse = sp.sparse.csc_matrix(
+            np.random.randn(300, 100)
+            * (np.random.uniform(size=(300, 100)) < .02) + np.eye(300, 100))
+        for matrix, backend in [(dense, 'NUMPY'), (sparse, 'PYSPQR')]:
+            dims = Dims(*matrix.shape, zero=3)
+            b, c = self.make_program_from_matrix(matrix, dims=dims, seed=0)
+            solver = Solver(
+                matrix, b, c, zero=dims.zero, nonneg=dims.nonneg, qr='AUTO')
+            self.assertEqual(solver.status, 'Optimal')
+            self.check_solution_valid(
+                matrix, b, c, solver.x, solver.y, dims=dims)
+            self.assertEqual(solver.statistics['qr_backend'], backend)
+            for key in ['qr_predicted_seconds', 'qr_predicted_bytes',
+                        'qr_seconds', 'qr_bytes']:
+                self.assertGreater(solver.statistics[key], 0)
+
+            with self.assertRaises(FactorizationTooLarge):
+                Solver(
+                    matrix, b, c, zero=dims.zero, nonneg=dims.nonneg,
+                    qr='AUTO', max_factorization_bytes=100)
+            with self.assertRaises(FactorizationTooLarge):
+                Solver(
+                    matrix, b, c, zero=dims.zero, nonneg=dims.nonneg,
+                    qr=backend, max_factorization_bytes=(
+                        solver.statistics['qr_predicted_bytes'] - 1))
+
+    def test_tsqr(self):
+        """Test tall-skinny QR backend."""
+        np.random.seed(0)
+        matrix = sp.sparse.csc_matrix(np.random.randn(60, 5))
+        dims = Dims(*matrix.shape, zero=3)
+        b, c = self.make_program_from_matrix(matrix, dims=dims, seed=0)
+        for workers in [1, 2, 4]:
+            solver = Solver(
+                matrix, b, c, zero=dims.zero, nonneg=dims.nonneg, qr='TSQR',
+                tsqr_workers=workers)
+            self.assertEqual(solver.status, 'Optimal')
+            self.check_solution_valid(
+                matrix, b, c, solver.x, solver.y, dims=dims)
+            self.assertEqual(solver.statistics['qr_backend'], 'TSQR')
+
+    def test_add_remove_rows(self):
+        """Test adding and removing rows with QR updates."""
+        np.random.seed(0)
+        matrix = sp.sparse.csc_matrix(np.random.randn(40, 10))
+        dims = Dims(*matrix.shape, zero=3)
+        b, c = self.make_program_from_matrix(matrix, dims=dims, seed=0)
+        for qr in ['PYSPQR', 'NUMPY']:
+            solver = Solver(
+                matrix, b, c, zero=dims.zero, nonneg=dims.nonneg, qr=qr)
+            rows = np.random.randn(3, 10)
+            solver.add_rows(
+                rows, rows @ solver.x + np.random.uniform(size=3))
+            solver.add_rows(rows[:1], rows[:1] @ solver.x, cone='zero')
+            solver.remove_rows([0, 5, 41])
+            self.assertEqual(
+                (solver.m, solver.zero, solver.nonneg), (41, 3, 38))
+            if qr == 'PYSPQR':
+                # the sparse factorization is computed again
+                self.assertEqual(solver.statistics['qr_updates'], 0)
+                self.assertEqual(
+                    solver.statistics['qr_refactorizations'], 3)
+            elif NUMBA_AVAILABLE:
+                self.assertEqual(solver.statistics['qr_updates'], 7)
+                self.assertNotIn('qr_refactorizations', solver.statistics)
+            else:
+                # rows are removed by factorizing again
+                self.assertEqual(solver.statistics['qr_updates'], 4)
+                self.assertEqual(
+                    solver.statistics['qr_refactorizations'], 1)
+
+            self.assertEqual(solver.status, 'Optimal')
+            self.check_solution_valid(
+                solver.matrix, solver.b, c, solver.x, solver.y,
+                dims=Dims(solver.m, solver.n, zero=solver.zero))
+            fresh = Solver(
+                solver.matrix, solver.b, c, zero=solver.zero,
+                nonneg=solver.nonneg, qr=qr)
+            self.assertTrue(np.isclose(c @ solver.x, c @ fresh.x))
+
+    def test_add_rows_refactorize(self):
+        """Test fallback to factorizing again after adding rows."""
+        np.random.seed(0)
+        matrix = sp.sparse.csc_matrix(np.random.randn(8, 10))
+        dims = Dims(*matrix.shape, zero=0)
+        b, c = self.make_program_from_matrix(matrix, dims=dims, seed=0)
+        solver = Solver(
+            matrix, b, c, zero=dims.zero, nonneg=dims.nonneg, qr='NUMPY')
+        rows = np.random.randn(5, 10)
+        # wide matrix, not updated
+        solver.add_rows(rows, rows @ solver.x + 1.)
+        self.assertEqual(solver.statistics['qr_updates'], 0)
+        self.assertEqual(solver.statistics['qr_refactorizations'], 1)
+
+        # drift
+        default = solver_module._QR_UPDATE_DRIFT_TOLERANCE
+        try:
+            solver_module._QR_UPDATE_DRIFT_TOLERANCE = 0.
+            solver.add_rows(rows[:1], rows[:1] @ solver.x + 1.)
+        finally:
+            solver_module._QR_UPDATE_DRIFT_TOLERANCE = default
+        self.assertEqual(solver.statistics['qr_updates'], 1)
+        self.assertEqual(solver.statistics['qr_refactorizations'], 2)
+
+        self.assertEqual(solver.status, 'Optimal')
+        self.check_solution_valid(
+            solver.matrix, solver.b, c, solver.x, solver.y,
+            dims=Dims(solver.m, solver.n))
+
     @staticmethod
     def _densify(linear_operator):
         """Create Numpy 2-d array from a sparse LinearOperator."""
@@ -574,6 +820,134 @@ class TestSolverClass(TestCase):
             result[:, j] = linear_operator @ ej
         return result
 
+    def test_anderson(self):
+        """Test Anderson acceleration reduces the number of iterations."""
+        np.random.seed(0)
+        matrix = sp.sparse.csc_matrix(np.random.randn(60, 20))
+        dims = Dims(*matrix.shape, zero=5)
+        b, c = self.make_program_from_matrix(matrix, dims=dims, seed=0)
+        plain = Solver(matrix, b, c, zero=dims.zero, nonneg=dims.nonneg)
+        self.assertNotIn('anderson_acceptance_rate', plain.statistics)
+        for anderson_type in ['I', 'II']:
+            solver = Solver(
+                matrix, b, c, zero=dims.zero, nonneg=dims.nonneg,
+                anderson=True, anderson_type=anderson_type)
+            self.assertEqual(solver.status, 'Optimal')
+            self.check_solution_valid(
+                matrix, b, c, solver.x, solver.y, dims=dims)
+            self.assertLess(
+                solver.statistics['iterations'],
+                plain.statistics['iterations'])
+            rate = solver.statistics['anderson_acceptance_rate']
+            self.assertTrue(0. < rate <= 1.)
+
+        with self.assertRaises(AssertionError):
+            Solver(
+                matrix, b, c, zero=dims.zero, nonneg=dims.nonneg,
+                anderson=True, anderson_type='III')
+
+    def test_restarted_halpern(self):
+        """Test restarted Halpern on an LP."""
+        np.random.seed(0)
+        matrix = sp.sparse.csc_matrix(np.random.randn(60, 20))
+        dims = Dims(*matrix.shape, zero=5)
+        b, c = self.make_program_from_matrix(matrix, dims=dims, seed=0)
+        plain = Solver(matrix, b, c, zero=dims.zero, nonneg=dims.nonneg)
+        solver = Solver(
+            matrix, b, c, zero=dims.zero, nonneg=dims.nonneg,
+            algorithm='RESTARTED_HALPERN')
+        self.assertEqual(solver.status, 'Optimal')
+        self.check_solution_valid(matrix, b, c, solver.x, solver.y, dims=dims)
+        self.assertLess(
+            solver.statistics['iterations'], plain.statistics['iterations'])
+        self.assertGreater(solver.statistics['restarts'], 0)
+
+    def test_termination(self):
+        """Test tolerances, max_iter and time_limit."""
+        _, program = self._generate_problem_one(seed=0)
+        matrix, b, c, zero, nonneg, soc = self.make_program_from_cvxpy(program)
+        accurate = Solver(matrix, b, c, zero=zero, nonneg=nonneg, soc=soc)
+        self.assertEqual(accurate.statistics['termination'], 'converged')
+
+        for eps in [1e-3, 1e-6]:
+            solver = Solver(
+                matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, eps_abs=eps,
+                eps_rel=eps)
+            self.assertEqual(solver.status, 'Optimal')
+            self.assertEqual(solver.statistics['termination'], 'tolerance')
+            self.assertLess(
+                solver.statistics['iterations'],
+                accurate.statistics['iterations'])
+            residuals = solver.residuals(solver.x, solver.y)
+            for name in ['primal', 'dual', 'gap']:
+                self.assertLessEqual(
+                    residuals[name],
+                    eps + eps * residuals[name + '_scale'])
+            self.assertTrue(np.isclose(
+                c @ solver.x, c @ accurate.x, rtol=100 * eps))
+
+        solver = Solver(
+            matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, max_iter=200)
+        self.assertEqual(solver.status, Solver.INACCURATE)
+        self.assertEqual(solver.statistics['termination'], 'max_iter')
+        self.assertEqual(solver.statistics['iterations'], 200)
+        self.assertLess(solver.statistics['primal'], 1e-1)
+
+        solver = Solver(
+            matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, time_limit=0.)
+        self.assertEqual(solver.status, Solver.INACCURATE)
+        self.assertEqual(solver.statistics['termination'], 'time_limit')
+        self.assertEqual(solver.statistics['iterations'], 0)
+
+    def test_mixed_precision(self):
+        """Test single precision phase and double precision finish."""
+        _, program = self._generate_problem_one(seed=0)
+        matrix, b, c, zero, nonneg, soc = self.make_program_from_cvxpy(program)
+        accurate = Solver(
+            matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, qr='NUMPY')
+        solver = Solver(
+            matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, qr='NUMPY',
+            mixed_precision=True)
+        self.assertEqual(solver.status, 'Optimal')
+        statistics = solver.statistics
+        self.assertEqual(statistics['single_termination'], 'stalled')
+        self.assertGreater(statistics['single_iterations'], 0)
+        self.assertEqual(
+            statistics['iterations'], statistics['single_iterations']
+            + statistics['double_iterations'])
+        self.assertLess(statistics['single_bytes'], statistics['double_bytes'])
+        for name in ['single_seconds', 'double_seconds']:
+            self.assertGreater(statistics[name], 0.)
+        # the solution is not unique
+        self.assertTrue(np.isclose(c @ solver.x, c @ accurate.x))
+        for name in ['primal', 'dual', 'gap']:
+            self.assertLess(statistics[name], 1e-10)
+
+        # ignored with the sparse backend, iterations limit is shared
+        solver = Solver(
+            matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, qr='PYSPQR',
+            mixed_precision=True)
+        self.assertNotIn('single_iterations', solver.statistics)
+        solver = Solver(
+            matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, qr='NUMPY',
+            mixed_precision=True, max_iter=20)
+        self.assertEqual(solver.status, Solver.INACCURATE)
+        self.assertEqual(solver.statistics['iterations'], 20)
+
+        # statistics of the previous solve are not kept after an update
+        solver = Solver(
+            matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, qr='NUMPY',
+            mixed_precision=True)
+        rows = np.random.randn(1, matrix.shape[1])
+        solver.add_rows(rows, rows @ solver.x + 1.)
+        self.assertEqual(solver.status, 'Optimal')
+        self.assertEqual(solver.statistics['qr_updates'], 1)
+        for name in ['single_iterations', 'single_termination',
+                     'single_seconds', 'single_bytes', 'double_iterations',
+                     'double_seconds', 'double_bytes']:
+            self.assertNotIn(name, solver.statistics)
+        self.assertIn('termination', solver.statistics)
+
     def test_simple_soc_and_residuals(self):
         """Simple SOCs and related tests."""
 
@@ -651,6 +1025,15 @@ class TestSolverClass(TestCase):
         x, prog = self._generate_problem_one(seed=321, m=20, n=10)
         prog.solve(solver=CQR())
 
+        value = prog.value
+        prog.solve(solver=CQR(), anderson=True, anderson_memory=5)
+        self.assertTrue(np.isclose(prog.value, value))
+        self.assertIn(
+            'anderson_acceptance_rate', prog.solver_stats.extra_stats)
+
+        prog.solve(solver=CQR(), max_iter=10)
+        self.assertEqual(prog.status, cp.OPTIMAL_INACCURATE)
+
         self.assertTrue(np.isposinf(cp.Problem(
             cp.Minimize(0.), [x >= 1, x <= 0]).solve(solver=CQR())))
 
@@ -679,6 +1062,37 @@ class TestSolverClass(TestCase):
         #print('gain over scs', scs_obj-cqr_obj)
         self.assertLess(cqr_obj, co_obj)
 
+    def test_exp_cvxpy(self):
+        """Test programs with exponential cones, from CVXPY."""
+        np.random.seed(0)
+        n = 10
+        x = cp.Variable(n)
+        A = np.random.randn(5, n)
+        constraints = [A @ x == A @ np.abs(np.random.randn(n)) / n]
+        for objective, constraints in [
+                (cp.Maximize(cp.sum(cp.entr(x))),
+                 constraints + [cp.sum(x) == 1]),
+                (cp.Minimize(cp.log_sum_exp(np.random.randn(20, n) @ x)
+                    + cp.sum_squares(x)), [x >= -1])]:
+            prog = cp.Problem(objective, constraints)
+            prog.solve(solver='SCS', eps=1e-9)
+            scs_obj, scs_x = prog.value, x.value
+            prog.solve(solver=CQR())
+            self.assertEqual(prog.status, cp.OPTIMAL)
+            self.assertTrue(np.isclose(prog.value, scs_obj))
+            self.assertTrue(np.allclose(x.value, scs_x, atol=1e-5))
+
+        # the solution is (-2, 1, exp(-2)), with dual variable of the cone
+        # the gradient of y exp(x / y) - z there, scaled
+        z = cp.Variable(3)
+        cone = cp.ExpCone(z[0], z[1], z[2])
+        prog = cp.Problem(
+            cp.Minimize(cp.sum(z)), [cone, z[1] == 1, z[0] >= -2])
+        prog.solve(solver=CQR())
+        self.assertTrue(np.isclose(prog.value, np.exp(-2.) - 1.))
+        self.assertTrue(np.allclose(
+            np.concatenate([np.atleast_1d(dual) for dual in cone.dual_value]),
+            [-np.exp(-2.), -3. * np.exp(-2.), 1.], atol=1e-6))
 
 if __name__ == '__main__':  # pragma: no cover
     main()
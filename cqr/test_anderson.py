@@ -0,0 +1,127 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""Unit tests for Anderson acceleration."""
+
+from unittest import TestCase
+
+import numpy as np
+
+from .anderson import AndersonAcceleration
+
+
+class TestAnderson(TestCase):
+    """Unit tests for Anderson acceleration."""
+
+    def _differences(self, points, columns):
+        """Last difference matrices of the iterates and residuals."""
+        xs = np.array([x for x, _ in points]).T
+        gs = np.array([g for _, g in points]).T
+        return np.diff(xs, axis=1)[:, -columns:], np.diff(
+            gs, axis=1)[:, -columns:]
+
+    def test_qr_updates(self):
+        """Test QR factors are kept equal to the history."""
+        np.random.seed(0)
+        for anderson_type in ['I', 'II']:
+            acceleration = AndersonAcceleration(
+                30, memory=4, anderson_type=anderson_type)
+            points = []
+            for i in range(9):
+                points.append((np.random.randn(30), np.random.randn(30)))
+                acceleration.update(*points[-1])
+                k = acceleration.columns
+                self.assertEqual(k, min(i, 4))
+                if k == 0:
+                    continue
+                dx, dg = self._differences(points, k)
+                basis, other = (dg, dx) if anderson_type == 'II' else (dx, dg)
+                q, r = acceleration._q[:, :k], acceleration._r[:k, :k]
+                self.assertTrue(np.allclose(q.T @ q, np.eye(k)))
+                self.assertTrue(np.allclose(r, np.triu(r)))
+                self.assertTrue(np.allclose(q @ r, basis))
+                self.assertTrue(np.allclose(
+                    acceleration._other[:, :k], other))
+                if anderson_type == 'I':
+                    self.assertTrue(np.allclose(
+                        acceleration._c[:k, :k], q.T @ dg))
+
+    def test_extrapolate(self):
+        """Test accelerated iterate against the direct formulas."""
+        np.random.seed(1)
+        for anderson_type in ['I', 'II']:
+            acceleration = AndersonAcceleration(
+                20, memory=3, anderson_type=anderson_type, regularization=0.)
+            points = [(np.random.randn(20), np.random.randn(20))
+                      for _ in range(6)]
+            for point in points:
+                acceleration.update(*point)
+            x, g = points[-1]
+            dx, dg = self._differences(points, 3)
+            if anderson_type == 'II':
+                gamma = np.linalg.lstsq(dg, g, rcond=None)[0]
+            else:
+                gamma = np.linalg.solve(dx.T @ dg, dx.T @ g)
+            result = np.empty(20)
+            self.assertTrue(acceleration.extrapolate(out=result))
+            self.assertTrue(np.allclose(result, x + g - (dx + dg) @ gamma))
+
+    def test_no_history(self):
+        """Test plain iterate without history, zero differences are skipped."""
+        acceleration = AndersonAcceleration(5)
+        x, g = np.arange(5.), np.ones(5)
+        acceleration.update(x, g)
+        acceleration.update(x, g)
+        self.assertEqual(acceleration.columns, 0)
+        result = np.empty(5)
+        self.assertFalse(acceleration.extrapolate(out=result))
+        self.assertTrue(np.allclose(result, x + g))
+        with self.assertRaises(SyntaxError):
+            AndersonAcceleration(5, anderson_type='III')
+
+    def test_linear_fixed_point(self):
+        """Test acceleration of a slowly converging linear iteration."""
+        np.random.seed(2)
+        size = 100
+        basis = np.linalg.qr(np.random.randn(size, size))[0]
+        operator = basis @ np.diag(np.linspace(-.99, .99, size)) @ basis.T
+        constant = np.random.randn(size)
+
+        def residual(x):
+            return operator @ x + constant - x
+
+        def iterations(acceleration):
+            x = np.zeros(size)
+            for i in range(10000):
+                g = residual(x)
+                if np.linalg.norm(g) < 1e-10:
+                    return i
+                if acceleration is None:
+                    x = x + g
+                else:
+                    acceleration.update(x, g)
+                    acceleration.extrapolate(out=x)
+            return np.inf
+
+        plain = iterations(None)
+        for anderson_type in ['I', 'II']:
+            accelerated = iterations(AndersonAcceleration(
+                size, memory=10, anderson_type=anderson_type))
+            self.assertLess(accelerated, plain / 5)
+
+
+if __name__ == '__main__':
+    from unittest import main
+    main()
@@ -0,0 +1,198 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""Unit tests for the batched Douglas-Rachford iteration."""
+
+from unittest import TestCase
+
+import numpy as np
+import scipy as sp
+
+from .batch import BatchDouglasRachford, solve_batch
+from .douglas_rachford import DouglasRachford
+from .factorization_cache import FactorizationCache
+from .solver import Solver
+
+
+def _cone_vectors(zero, nonneg, soc, count):
+    """Random vectors in the cone, zero on the zero cone, as columns."""
+    vectors = [np.zeros((zero, count)), np.abs(np.random.randn(
+        nonneg, count))]
+    for size in soc:
+        cone = np.random.randn(size, count)
+        cone[0] = np.linalg.norm(cone[1:], axis=0) + .1
+        vectors.append(cone)
+    return np.concatenate(vectors)
+
+
+def _batch_programs(m, n, zero, soc, count, seed):
+    """Programs sharing the matrix, the last one is primal infeasible.
+
+    :returns: Matrix, ``b`` and ``c`` with one row per program, cone sizes.
+    :rtype: tuple
+    """
+    np.random.seed(seed)
+    nonneg = m - zero - sum(soc)
+    matrix = np.random.randn(m, n)
+
+    # y in the dual cone with A^T y = 0
+    ray = _cone_vectors(zero, nonneg, soc, 1)[:, 0]
+    ray[:zero] = np.random.randn(zero)
+    matrix -= np.outer(ray, ray @ matrix) / (ray @ ray)
+
+    # feasible and bounded, with s in the cone and y in the dual cone
+    s = _cone_vectors(zero, nonneg, soc, count - 1)
+    y = _cone_vectors(0, zero + nonneg, soc, count - 1)
+    b = matrix @ np.random.randn(n, count - 1) + s
+    c = -matrix.T @ y
+
+    # primal infeasible, b^T y = -1
+    infeasible = np.random.randn(m)
+    infeasible -= ray * (infeasible @ ray + 1) / (ray @ ray)
+    return (
+        sp.sparse.csc_matrix(matrix), np.vstack([b.T, infeasible]),
+        np.vstack([c.T, np.random.randn(n)]), zero, nonneg, soc)
+
+
+class TestBatch(TestCase):
+    """Unit tests for the batched Douglas-Rachford iteration."""
+
+    def test_matches_single_engine(self):
+        """Test step of the batch against the single program engine."""
+        for qr in ['PYSPQR', 'NUMPY', 'TSQR']:
+            for m, n in [(40, 10), (30, 25)]:
+                matrix, b, c, zero, nonneg, soc = _batch_programs(
+                    m, n, zero=3, soc=(3, 4), count=4, seed=0)
+                cache = FactorizationCache()
+                solvers = [Solver(
+                    matrix, b_i, c_i, zero=zero, nonneg=nonneg, soc=soc,
+                    qr=qr, verbose=False, tsqr_workers=2, max_iter=0,
+                    factorization_cache=cache) for b_i, c_i in zip(b, c)]
+                batch = BatchDouglasRachford.from_solvers(solvers)
+                dr_y = np.random.randn(2 * m, len(solvers))
+                batch.dr_y[:] = dr_y
+                norms = batch.compute_step()
+                for column, solver in enumerate(solvers):
+                    engine = DouglasRachford.from_solver(solver, fused=False)
+                    engine.dr_y[:] = dr_y[:, column]
+                    norm = engine.compute_step()
+                    self.assertTrue(np.allclose(
+                        batch.pi[:, column], engine.pi))
+                    self.assertTrue(np.allclose(
+                        batch.step[:, column], engine.step))
+                    self.assertTrue(np.isclose(norms[column], norm))
+
+    def test_exponential_cones(self):
+        """Test step of the batch with exponential cones."""
+        matrix, b, c, zero, nonneg, soc = _batch_programs(
+            40, 10, zero=3, soc=(3,), count=3, seed=3)
+        # the last non-negative rows are taken as exponential cones, the
+        # programs needn't be feasible to compare the steps
+        cache = FactorizationCache()
+        solvers = [Solver(
+            matrix, b_i, c_i, zero=zero, nonneg=nonneg - 9, soc=soc, exp=3,
+            verbose=False, max_iter=0, factorization_cache=cache)
+            for b_i, c_i in zip(b, c)]
+        batch = BatchDouglasRachford.from_solvers(solvers)
+        dr_y = np.random.randn(80, len(solvers))
+        batch.dr_y[:] = dr_y
+        norms = batch.compute_step()
+        for column, solver in enumerate(solvers):
+            engine = DouglasRachford.from_solver(solver)
+            self.assertFalse(engine.fused)
+            engine.dr_y[:] = dr_y[:, column]
+            self.assertTrue(np.isclose(norms[column], engine.compute_step()))
+            self.assertTrue(np.allclose(batch.pi[:, column], engine.pi))
+            self.assertTrue(np.allclose(batch.step[:, column], engine.step))
+
+    def test_solve_batch(self):
+        """Test solutions and statuses against single solves."""
+        for qr in ['PYSPQR', 'NUMPY']:
+            matrix, b, c, zero, nonneg, soc = _batch_programs(
+                60, 20, zero=5, soc=(3, 4, 5), count=5, seed=1)
+            cache = FactorizationCache()
+            solvers = solve_batch(
+                matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, qr=qr,
+                verbose=False, factorization_cache=cache)
+            self.assertEqual(len(solvers), len(b))
+            for b_i, c_i, batched in zip(b, c, solvers):
+                # same cache, so same equilibration
+                single = Solver(
+                    matrix, b_i, c_i, zero=zero, nonneg=nonneg, soc=soc,
+                    qr=qr, verbose=False, factorization_cache=cache)
+                self.assertEqual(batched.status, single.status)
+                self.assertEqual(
+                    batched.statistics['termination'],
+                    single.statistics['termination'])
+                self.assertEqual(batched.statistics['batch_size'], len(b))
+                if single.status == 'Optimal':
+                    self.assertTrue(np.allclose(batched.x, single.x))
+                    self.assertTrue(np.allclose(batched.y, single.y))
+            self.assertEqual(
+                [solver.status for solver in solvers],
+                ['Optimal'] * (len(b) - 1) + ['Infeasible'])
+
+    def test_solve_batch_exponential_cones(self):
+        """Test solve of programs with an exponential cone."""
+        # minimize sum(z) s.t. z in the cone, z_1 = t, z_0 >= -l, whose
+        # solution is (-l, t, t exp(-l / t))
+        matrix = sp.sparse.csc_matrix(np.array([
+            [0., 1., 0.], [-1., 0., 0.],
+            [-1., 0., 0.], [0., -1., 0.], [0., 0., -1.]]))
+        bounds = [(1., 2.), (2., 1.), (.5, 1.)]
+        b = np.array([[t, l, 0., 0., 0.] for t, l in bounds])
+        c = np.ones((len(bounds), 3))
+        solvers = solve_batch(
+            matrix, b, c, zero=1, nonneg=1, exp=1, verbose=False)
+        for (t, l), b_i, c_i, batched in zip(bounds, b, c, solvers):
+            self.assertEqual(batched.status, 'Optimal')
+            self.assertTrue(np.allclose(
+                batched.x, [-l, t, t * np.exp(-l / t)]))
+            single = Solver(
+                matrix, b_i, c_i, zero=1, nonneg=1, exp=1, verbose=False)
+            self.assertTrue(np.allclose(batched.x, single.x))
+            self.assertTrue(np.allclose(batched.y, single.y))
+
+    def test_solve_batch_limits(self):
+        """Test iteration limits, tolerances and batch of one program."""
+        matrix, b, c, zero, nonneg, soc = _batch_programs(
+            40, 10, zero=3, soc=(3,), count=3, seed=2)
+        solvers = solve_batch(
+            matrix, b[:2], c[:2], zero=zero, nonneg=nonneg, soc=soc,
+            verbose=False, max_iter=10)
+        for solver in solvers:
+            self.assertEqual(solver.status, Solver.INACCURATE)
+            self.assertEqual(solver.statistics['termination'], 'max_iter')
+            self.assertEqual(solver.statistics['iterations'], 10)
+
+        solvers = solve_batch(
+            matrix, b[:2], c[:2], zero=zero, nonneg=nonneg, soc=soc,
+            verbose=False, eps_abs=1e-6, eps_rel=1e-6)
+        for solver in solvers:
+            self.assertEqual(solver.status, 'Optimal')
+            self.assertEqual(solver.statistics['termination'], 'tolerance')
+            self.assertLessEqual(solver.statistics['primal'], 1e-6 * (
+                1. + solver.statistics['primal_scale']))
+
+        solver, = solve_batch(
+            matrix, b[0], c[0], zero=zero, nonneg=nonneg, soc=soc,
+            verbose=False)
+        self.assertEqual(solver.status, 'Optimal')
+        self.assertEqual(solver.statistics['termination'], 'converged')
+
+
+if __name__ == '__main__':
+    from unittest import main
+    main()
@@ -0,0 +1,158 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""Unit tests for checkpoints of the Douglas-Rachford iteration."""
+
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+
+from .anderson import AndersonAcceleration
+from .checkpoint import load_checkpoint, save_checkpoint
+from .factorization_store import FactorizationStore
+from .programs import feasible_program
+from .solver import Solver
+
+
+class TestCheckpoint(TestCase):
+    """Unit tests for checkpoints of the Douglas-Rachford iteration."""
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.path = Path(self._directory.name) / 'solve.npz'
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_save_load(self):
+        """Test round trip of a checkpoint, with and without acceleration."""
+        np.random.seed(0)
+        dr_y = np.random.randn(20)
+        save_checkpoint(self.path, 'abc', dr_y, 7, 1.5)
+        key, loaded, iterations, relaxation, phase, anderson = \
+            load_checkpoint(self.path)
+        self.assertEqual(key, 'abc')
+        self.assertTrue(np.all(loaded == dr_y))
+        self.assertEqual(iterations, 7)
+        self.assertEqual(relaxation, 1.5)
+        self.assertEqual(phase, 'double')
+        self.assertIsNone(anderson)
+        save_checkpoint(
+            self.path, 'abc', dr_y.astype(np.float32), 7, 1.5, phase='single')
+        _, loaded, *_, phase, _ = load_checkpoint(self.path)
+        self.assertEqual(loaded.dtype, np.float64)
+        self.assertEqual(phase, 'single')
+
+        acceleration = AndersonAcceleration(20, memory=3, anderson_type='I')
+        for _ in range(6):
+            acceleration.update(np.random.randn(20), np.random.randn(20))
+        save_checkpoint(self.path, 'abc', dr_y, 7, 1.5, acceleration)
+        *_, anderson = load_checkpoint(self.path)
+        restored = AndersonAcceleration(20, memory=3, anderson_type='I')
+        restored.restore(anderson)
+        self.assertEqual(restored.columns, acceleration.columns)
+        expected, result = np.empty(20), np.empty(20)
+        acceleration.extrapolate(out=expected)
+        restored.extrapolate(out=result)
+        self.assertTrue(np.all(result == expected))
+        with self.assertRaises(ValueError):
+            AndersonAcceleration(20, memory=4).restore(anderson)
+        self.assertEqual(list(self.path.parent.iterdir()), [self.path])
+
+        np.savez(self.path, version=np.array(0))
+        with self.assertRaises(ValueError):
+            load_checkpoint(self.path)
+
+    def test_resume(self):
+        """Test interrupted and resumed solves match uninterrupted ones."""
+        matrix, b, c, zero, nonneg, soc = feasible_program(
+            60, 20, zero=5, soc=(3, 4), seed=5)
+        for anderson in [False, True]:
+            kwargs = dict(
+                zero=zero, nonneg=nonneg, soc=soc, verbose=False,
+                anderson=anderson)
+            full = Solver(matrix, b, c, **kwargs)
+            self.assertEqual(full.statistics['termination'], 'converged')
+            total = full.statistics['iterations']
+
+            store = FactorizationStore(Path(self._directory.name) / 'store')
+            interrupted = Solver(
+                matrix, b, c, max_iter=total // 2, checkpoint=self.path,
+                checkpoint_interval=0., factorization_cache=store, **kwargs)
+            self.assertEqual(interrupted.status, Solver.INACCURATE)
+            self.assertGreater(interrupted.statistics['checkpoints'], 1)
+
+            # another process, the factorization is loaded from the store
+            resumed = Solver(
+                matrix, b, c, checkpoint=self.path,
+                factorization_cache=FactorizationStore(store.directory),
+                **kwargs)
+            self.assertTrue(resumed.statistics['factorization_cache_hit'])
+            self.assertEqual(
+                resumed.statistics['resumed_iterations'], total // 2)
+            self.assertEqual(resumed.statistics['iterations'], total)
+            self.assertEqual(resumed.status, 'Optimal')
+            self.assertTrue(np.allclose(resumed.x, full.x))
+            self.assertTrue(np.allclose(resumed.y, full.y))
+            self.path.unlink()
+
+    def test_resume_mixed_precision(self):
+        """Test solve interrupted in the single precision phase."""
+        matrix, b, c, zero, nonneg, soc = feasible_program(
+            60, 20, zero=5, soc=(3, 4), seed=5)
+        kwargs = dict(
+            zero=zero, nonneg=nonneg, soc=soc, verbose=False, qr='NUMPY',
+            mixed_precision=True)
+        full = Solver(matrix, b, c, **kwargs)
+        single = full.statistics['single_iterations']
+
+        interrupted = Solver(
+            matrix, b, c, max_iter=single // 2, checkpoint=self.path,
+            checkpoint_interval=0., **kwargs)
+        self.assertEqual(interrupted.status, Solver.INACCURATE)
+        self.assertEqual(
+            interrupted.statistics['single_termination'], 'max_iter')
+        self.assertGreater(interrupted.statistics['checkpoints'], 1)
+        _, _, iterations, _, phase, _ = load_checkpoint(self.path)
+        self.assertEqual((iterations, phase), (single // 2, 'single'))
+
+        resumed = Solver(matrix, b, c, checkpoint=self.path, **kwargs)
+        self.assertEqual(resumed.statistics['resumed_iterations'], single // 2)
+        self.assertEqual(resumed.statistics['resumed_phase'], 'single')
+        self.assertGreater(resumed.statistics['single_iterations'], 0)
+        self.assertGreater(resumed.statistics['double_iterations'], 0)
+        self.assertEqual(resumed.status, 'Optimal')
+        # the solution is not unique
+        self.assertTrue(np.isclose(c @ resumed.x, c @ full.x))
+
+    def test_other_program(self):
+        """Test checkpoint of another program is not resumed."""
+        matrix, b, c, zero, nonneg, soc = feasible_program(
+            40, 10, zero=3, soc=(4,), seed=6)
+        kwargs = dict(
+            zero=zero, nonneg=nonneg, soc=soc, verbose=False,
+            checkpoint=self.path)
+        Solver(matrix, b, c, max_iter=10, **kwargs)
+        self.assertEqual(load_checkpoint(self.path)[2], 10)
+        solver = Solver(matrix, b * 2., c, **kwargs)
+        self.assertEqual(solver.status, 'Optimal')
+        self.assertNotIn('resumed_iterations', solver.statistics)
+
+
+if __name__ == '__main__':
+    from unittest import main
+    main()
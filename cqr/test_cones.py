@@ -21,7 +21,9 @@ import cvxpy as cp
 import numpy as np
 import scipy as sp
 
-from .cones import project_nonsymm_soc
+from .cones import (ConeLayout, ExponentialCones, ScaledSecondOrderCones,
+                    SecondOrderCones, project_nonsymm_soc)
+from .solver import Solver
 
 class TestCones(TestCase):
     """Unit tests for cones projections."""
@@ -124,6 +126,229 @@ class TestCones(TestCase):
             # check pi orthogonal to pi - x
             self.assertLess(abs(np.dot(pi, diff)), ACCURACY)
 
+    def test_scaled_second_order_cones(self):
+        """Test vectorized projection on scaled cones, and warm start."""
+        np.random.seed(3)
+        sizes = np.random.randint(2, 12, 200)
+        heads = np.cumsum(sizes) - sizes
+        scaling = np.random.uniform(1e-2, 1e2, np.sum(sizes) - len(sizes))
+        z = np.random.randn(np.sum(sizes))
+        z[heads[::7]] = 0.
+        z[heads[1::7]] = 1e3
+        z[heads[2::7]] = -1e3
+        cones = ScaledSecondOrderCones(sizes, scaling)
+        pi, reflected = np.empty_like(z), np.empty_like(z)
+        cones.project(z, pi, reflected)
+        self.assertTrue(np.allclose(reflected, 2 * pi - z))
+        cold = cones.iterations
+
+        for i, (head, size) in enumerate(zip(heads, sizes)):
+            x, a = z[head:head+size], scaling[head-i:head-i+size-1]
+            pi_i = pi[head:head+size]
+            self.assertTrue(np.allclose(pi_i, project_nonsymm_soc(x, a)))
+            diff = pi_i - x
+            self.assertGreaterEqual(
+                pi_i[0] - np.linalg.norm(pi_i[1:] * a), -1e-12)
+            self.assertGreaterEqual(
+                diff[0] - np.linalg.norm(diff[1:] / a), -1e-12)
+            self.assertLess(abs(np.dot(pi_i, diff)), 1e-12)
+
+        # small change of the input, warm-started from the multipliers
+        z += 1e-4 * np.random.randn(len(z))
+        cold_cones = ScaledSecondOrderCones(sizes, scaling)
+        expected = np.empty_like(z)
+        cold_cones.project(z, expected)
+        cones.project(z, pi)
+        self.assertTrue(np.allclose(pi, expected))
+        self.assertLess(cones.iterations, cold)
+        self.assertLessEqual(cones.iterations, 5)
+
+    @staticmethod
+    def _exponential_violation(x, y, z, e=1.):
+        """Violation of ``y exp(x / y) <= e z``, or of its closure."""
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            small = np.maximum(y * np.exp(x / y) - e * z, 0.)
+            large = np.where(
+                z > 0., np.maximum(x - y * np.log(e * z / y), 0.), np.inf)
+            violation = np.where(x / y <= 0., small, large)
+        return np.where(
+            y > 0., violation,
+            np.maximum(x, 0.) + np.abs(y) + np.maximum(-z, 0.))
+
+    def test_exponential_cones(self):
+        """Test projection on exponential cones and their duals."""
+        np.random.seed(4)
+        count = 20000
+        v = np.random.randn(count, 3) * np.exp(3 * np.random.randn(count, 3))
+        v[:100, 1] = 0.
+        v[100:200, 0] = 0.
+        cones = ExponentialCones(count)
+        pi = cones.project_rows(v)
+        self.assertLessEqual(cones.iterations, cones.max_iters)
+        scale = np.linalg.norm(v, axis=1)
+        difference = v - pi
+        self.assertLess(np.max(
+            self._exponential_violation(*pi.T) / scale), 1e-12)
+        # v - pi in the polar, so pi - v in the dual cone
+        self.assertLess(np.max(self._exponential_violation(
+            difference[:, 1], difference[:, 0], -difference[:, 2], np.e
+        ) / scale), 1e-12)
+        self.assertLess(np.max(
+            np.abs(np.sum(pi * difference, axis=1)) / scale ** 2), 1e-12)
+
+        # Moreau decomposition, and in place projection
+        dual = cones.project_rows(v, dual=True)
+        self.assertTrue(np.allclose(dual, v + cones.project_rows(-v)))
+        z = v.ravel()
+        pi_flat, reflected = np.empty_like(z), np.empty_like(z)
+        cones.project(z, pi_flat, reflected, dual=True)
+        self.assertTrue(np.all(pi_flat == dual.ravel()))
+        self.assertTrue(np.allclose(reflected, 2 * pi_flat - z))
+
+        # against CVXPY, on points of moderate size
+        variable = cp.Variable(3)
+        point = cp.Parameter(3)
+        problem = cp.Problem(
+            cp.Minimize(cp.sum_squares(variable - point)),
+            [cp.ExpCone(variable[0], variable[1], variable[2])])
+        for row in np.random.randn(10, 3):
+            point.value = row
+            problem.solve(solver='SCS', eps=1e-10)
+            self.assertTrue(np.allclose(
+                cones.project_rows(row[None])[0], variable.value,
+                atol=1e-9))
+
+    def test_exponential_cones_derivative(self):
+        """Test Jacobians of projection on exponential cones."""
+        np.random.seed(5)
+        count = 1000
+        v = np.random.randn(count, 3)
+        cones = ExponentialCones(count)
+        for dual in [False, True]:
+            jacobians = cones.derivative(v.ravel(), dual=dual)
+            self.assertEqual(jacobians.shape, (count, 3, 3))
+            step = 1e-6
+            differences = np.stack([(cones.project_rows(
+                v + step * direction, dual=dual) - cones.project_rows(
+                    v - step * direction, dual=dual)) / (2 * step)
+                for direction in np.eye(3)], axis=2)
+            errors = np.max(np.abs(differences - jacobians), axis=(1, 2))
+            # finite differences are wrong only near the case boundaries
+            self.assertGreater(np.mean(errors < 1e-6), .99)
+
+    def test_second_order_cones(self):
+        """Test vectorized projections against the one of each cone."""
+        np.random.seed(1)
+        for sizes in [(3,) * 50, (2, 5, 3, 5, 2, 2, 8), (4,), ()]:
+            total = sum(sizes)
+            z = np.random.randn(total)
+            # some cones inside, in the polar, or with zero tail
+            cur = 0
+            for i, size in enumerate(sizes):
+                if i % 4 == 1:
+                    z[cur] = 2. * np.linalg.norm(z[cur+1:cur+size])
+                elif i % 4 == 2:
+                    z[cur] = -2. * np.linalg.norm(z[cur+1:cur+size])
+                elif i % 4 == 3:
+                    z[cur+1:cur+size] = 0.
+                cur += size
+
+            for method in ['GROUPED', 'SEGMENTED']:
+                cones = SecondOrderCones(
+                    ConeLayout(0, 0, sizes), method=method)
+                pi, reflected = np.empty(total), np.empty(total)
+                cones.project(z, pi, reflected)
+                cur = 0
+                for size in sizes:
+                    pi_i, reflected_i = np.empty(size), np.empty(size)
+                    Solver.new_second_order_project(
+                        z[cur:cur+size], pi_i, reflected_i)
+                    self.assertTrue(np.allclose(pi[cur:cur+size], pi_i))
+                    self.assertTrue(np.allclose(
+                        reflected[cur:cur+size], reflected_i))
+                    cur += size
+
+                single = SecondOrderCones(
+                    ConeLayout(0, 0, sizes), dtype=np.float32, method=method)
+                pi_single = np.empty(total, dtype=np.float32)
+                single.project(
+                    z.astype(np.float32), pi_single, np.empty_like(pi_single))
+                self.assertTrue(np.allclose(pi_single, pi, atol=1e-5))
+
+        self.assertEqual(SecondOrderCones(
+            ConeLayout(0, 0, (3,) * 5)).method, 'GROUPED')
+        self.assertEqual(SecondOrderCones(
+            ConeLayout(0, 0, (3, 4))).method, 'SEGMENTED')
+
+    def test_cone_layout(self):
+        """Test offsets, masks and block operations of a cone layout."""
+        layout = ConeLayout(2, 3, (3, 2, 3))
+        self.assertEqual(layout.size, 13)
+        self.assertEqual(layout.soc_slice, slice(5, 13))
+        self.assertEqual(layout.self_dual_slice, slice(2, 13))
+        self.assertEqual(list(layout.soc_offsets), [0, 3, 5])
+        self.assertEqual(list(layout.block_sizes), [1] * 5 + [3, 2, 3])
+        self.assertEqual(list(layout.block_starts), [0, 1, 2, 3, 4, 5, 8, 10])
+        self.assertEqual(
+            [(size, list(indices)) for size, indices in layout.soc_groups],
+            [(2, [3, 4]), (3, [0, 1, 2, 5, 6, 7])])
+        self.assertEqual(np.sum(layout.zero_mask), 2)
+        self.assertEqual(np.sum(layout.nonneg_mask), 3)
+        self.assertEqual(
+            list(np.flatnonzero(layout.soc_head_mask)), [5, 8, 10])
+
+        values = np.arange(13.)
+        self.assertEqual(
+            list(layout.block_reduce(values)), [0, 1, 2, 3, 4, 18, 17, 33])
+        self.assertEqual(
+            list(layout.block_reduce(values, np.maximum)),
+            [0, 1, 2, 3, 4, 7, 9, 12])
+        self.assertEqual(
+            list(layout.expand(np.arange(8)))[4:], [4, 5, 5, 5, 6, 6, 7, 7, 7])
+        self.assertEqual(len(ConeLayout(0, 0).block_reduce(np.empty(0))), 0)
+
+        self.assertEqual(layout, ConeLayout(2, 3, [3, 2, 3]))
+        self.assertEqual(hash(layout), hash(ConeLayout(2, 3, [3, 2, 3])))
+        self.assertNotEqual(layout, ConeLayout(2, 3, (3, 3, 2)))
+        with self.assertRaises(AttributeError):
+            layout.zero = 3
+        with self.assertRaises(ValueError):
+            layout.block_sizes[0] = 2
+
+        np.random.seed(2)
+        z = np.random.randn(13)
+        cones = SecondOrderCones(layout)
+        pi, reflected = np.empty(13), np.empty(13)
+        for dual in [False, True]:
+            layout.project(z, pi, reflected, cones, dual=dual)
+            self.assertTrue(np.all(pi[:2] == (z[:2] if dual else 0.)))
+            self.assertTrue(np.all(pi[2:5] == np.maximum(z[2:5], 0.)))
+            self.assertTrue(np.allclose(reflected, 2 * pi - z))
+            for start, size in [(5, 3), (8, 2), (10, 3)]:
+                pi_i = np.empty(size)
+                Solver.new_second_order_project(
+                    z[start:start+size], pi_i, np.empty(size))
+                self.assertTrue(np.allclose(pi[start:start+size], pi_i))
+
+        layout = ConeLayout(1, 2, (3,), exp=2)
+        self.assertEqual(layout.size, 12)
+        self.assertEqual(layout.exp_slice, slice(6, 12))
+        self.assertEqual(layout.self_dual_slice, slice(1, 6))
+        self.assertEqual(list(layout.block_sizes), [1, 1, 1, 3, 3, 3])
+        self.assertEqual(np.sum(layout.exp_mask), 6)
+        self.assertNotEqual(layout, ConeLayout(1, 2, (3,)))
+        z = np.random.randn(12)
+        pi, reflected = np.empty(12), np.empty(12)
+        exponential = ExponentialCones(2)
+        for dual in [False, True]:
+            layout.project(
+                z, pi, reflected, SecondOrderCones(layout), dual=dual,
+                exponential_cones=exponential)
+            self.assertTrue(np.allclose(
+                pi[6:], exponential.project_rows(
+                    z[6:].reshape(2, 3), dual=dual).ravel()))
+            self.assertTrue(np.allclose(reflected, 2 * pi - z))
+
 
 if __name__ == '__main__':
     from unittest import main
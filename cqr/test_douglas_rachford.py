@@ -0,0 +1,255 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""Unit tests for the Douglas-Rachford engine."""
+
+import tracemalloc
+from unittest import TestCase
+
+import numpy as np
+
+from .anderson import AndersonAcceleration
+from .douglas_rachford import DouglasRachford
+from .fused_step import NUMBA_AVAILABLE
+from .programs import feasible_program
+from .solver import Solver
+
+
+class TestDouglasRachford(TestCase):
+    """Unit tests for the Douglas-Rachford engine."""
+
+    def test_matches_solver(self):
+        """Test projections and step against the methods of the solver."""
+        for qr in ['PYSPQR', 'NUMPY', 'TSQR']:
+            for m, n in [(40, 10), (20, 30)]:
+                matrix, b, c, zero, nonneg, soc = feasible_program(
+                    m, n, zero=3, soc=(3, 4), seed=1)
+                solver = Solver(
+                    matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, qr=qr,
+                    verbose=False, tsqr_workers=2)
+                engine = DouglasRachford.from_solver(solver)
+                dr_y = np.random.randn(2 * m)
+
+                engine.cone_project(dr_y, engine.pi, engine.reflected)
+                pi, reflected = solver.new_admm_cone_project(dr_y)
+                self.assertTrue(np.allclose(engine.pi, pi))
+                self.assertTrue(np.allclose(engine.reflected, reflected))
+
+                engine.linspace_project(dr_y, engine.step)
+                self.assertTrue(np.allclose(
+                    engine.step, solver.admm_linspace_project(dr_y)))
+
+                engine.dr_y[:] = dr_y
+                norm = engine.iterate()
+                step = solver.douglas_rachford_step(dr_y)
+                self.assertTrue(np.allclose(engine.step, step))
+                self.assertTrue(np.isclose(norm, np.linalg.norm(step)))
+                self.assertTrue(np.allclose(engine.dr_y, dr_y + step))
+
+    def test_fused_step(self):
+        """Test fused step against the NumPy one, with dense QR."""
+        for m, n in [(40, 10), (20, 30), (30, 30)]:
+            matrix, b, c, zero, nonneg, soc = feasible_program(
+                m, n, zero=3, soc=(3, 4), seed=3)
+            solver = Solver(
+                matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, qr='NUMPY',
+                verbose=False)
+            dr_y = np.random.randn(2 * m)
+            engines = [DouglasRachford.from_solver(solver, fused=fused)
+                       for fused in [False, True]]
+            norms = []
+            for engine in engines:
+                engine.dr_y[:] = dr_y
+                norms.append(engine.iterate())
+            self.assertTrue(np.isclose(*norms))
+            for name in ['pi', 'reflected', 'step', 'dr_y']:
+                self.assertTrue(np.allclose(
+                    getattr(engines[0], name), getattr(engines[1], name)))
+
+        solver = Solver(
+            matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, qr='PYSPQR',
+            verbose=False)
+        with self.assertRaises(AssertionError):
+            DouglasRachford.from_solver(solver, fused=True)
+
+    def test_single_precision(self):
+        """Test step in single precision, and stop when it stalls."""
+        matrix, b, c, zero, nonneg, soc = feasible_program(
+            60, 20, zero=5, soc=(3, 4), seed=4)
+        solver = Solver(
+            matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, qr='NUMPY',
+            verbose=False, max_iter=0)
+        double = DouglasRachford.from_solver(solver, fused=False)
+        single = DouglasRachford.from_solver(
+            solver, fused=False, dtype=np.float32)
+        self.assertEqual(single.orthogonal.dtype, np.float32)
+        self.assertLess(single.nbytes, double.nbytes)
+        dr_y = np.random.randn(120)
+        for engine in [single, double]:
+            engine.dr_y[:] = dr_y
+            engine.iterate()
+        self.assertEqual(single.step.dtype, np.float32)
+        self.assertTrue(np.allclose(single.step, double.step, atol=1e-5))
+
+        dr_y = solver._sy_from_var_reduced(solver.var_reduced)
+        status = single.solve(dr_y, max_iter=100000, eps=1e-12, stall=True)
+        self.assertEqual(status, 'stalled')
+        self.assertLess(single.iterations, 100000)
+        self.assertEqual(double.solve(
+            single.dr_y.astype(float), max_iter=100000, eps=1e-12),
+            'converged')
+
+        with self.assertRaises(AttributeError):
+            DouglasRachford.from_solver(Solver(
+                matrix, b, c, zero=zero, nonneg=nonneg, soc=soc,
+                qr='PYSPQR', verbose=False, max_iter=0), dtype=np.float32)
+
+    def test_solve(self):
+        """Test convergence from the solver's starting point."""
+        matrix, b, c, zero, nonneg, soc = feasible_program(
+            40, 10, zero=3, soc=(4,), seed=1)
+        solver = Solver(
+            matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, verbose=False)
+        self.assertEqual(solver.status, 'Optimal')
+        engine = DouglasRachford.from_solver(solver)
+        self.assertEqual(
+            engine.solve(np.zeros(80), max_iter=100000, eps=1e-12),
+            'converged')
+        self.assertEqual(
+            engine.solve(np.zeros(80), max_iter=3, eps=1e-12), 'max_iter')
+        self.assertEqual(engine.iterations, 3)
+        self.assertEqual(engine.solve(
+            np.zeros(80), max_iter=100000, eps=1e-12, time_limit=0.),
+            'time_limit')
+        self.assertEqual(engine.iterations, 0)
+        calls = []
+        self.assertEqual(engine.solve(
+            np.zeros(80), max_iter=100000, eps=1e-12,
+            check=lambda dr_y: calls.append(np.copy(dr_y)) or len(calls) == 2),
+            'tolerance')
+        self.assertEqual(
+            engine.iterations, 2 * DouglasRachford.TERMINATION_INTERVAL - 1)
+        self.assertTrue(np.all(calls[-1] == engine.dr_y))
+
+    def test_relaxation(self):
+        """Test relaxed iterations converge to a fixed point of the step."""
+        matrix, b, c, zero, nonneg, soc = feasible_program(
+            40, 10, zero=3, soc=(4,), seed=1)
+        solver = Solver(
+            matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, verbose=False)
+        engine = DouglasRachford.from_solver(solver)
+        dr_y = np.random.randn(80)
+
+        engine.dr_y[:] = dr_y
+        norm = engine.iterate()
+        engine.relaxation = 1.5
+        engine.dr_y[:] = dr_y
+        self.assertEqual(engine.iterate(), norm)
+        self.assertTrue(np.allclose(
+            engine.dr_y, dr_y + 1.5 * solver.douglas_rachford_step(dr_y)))
+
+        for relaxation, adaptive in [(.8, False), (1.6, False), (1., True)]:
+            self.assertEqual(engine.solve(
+                np.zeros(80), max_iter=100000, eps=1e-12,
+                relaxation=relaxation, adaptive_relaxation=adaptive),
+                'converged')
+            engine.relaxation = 1.
+            self.assertLess(engine.compute_step(), 1e-10)
+        low, high = DouglasRachford.RELAXATION_BOUNDS
+        self.assertTrue(low <= engine.relaxation <= high)
+
+    def test_halpern(self):
+        """Test anchored iterations and restarts."""
+        matrix, b, c, zero, nonneg, soc = feasible_program(
+            40, 10, zero=3, soc=(4,), seed=1)
+        solver = Solver(
+            matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, verbose=False)
+        engine = DouglasRachford.from_solver(solver)
+        dr_y = np.random.randn(80)
+
+        # the first two updates average with the anchor
+        engine.solve(dr_y, max_iter=2, eps=0., algorithm='HALPERN')
+        first = dr_y + solver.douglas_rachford_step(dr_y) / 2.
+        second = dr_y / 3. + 2. * (
+            first + solver.douglas_rachford_step(first)) / 3.
+        self.assertTrue(np.allclose(engine.dr_y, second))
+
+        self.assertEqual(engine.solve(
+            np.zeros(80), max_iter=100000, eps=1e-12,
+            algorithm='RESTARTED_HALPERN'), 'converged')
+        self.assertGreater(engine.restarts, 0)
+        self.assertLess(engine.compute_step(), 1e-10)
+
+        with self.assertRaises(AssertionError):
+            engine.solve(
+                dr_y, max_iter=10, eps=0., algorithm='HALPERN',
+                acceleration=AndersonAcceleration(80))
+
+    def _check_no_allocations(self, solver):
+        """Check iterations of the engine of solver allocate no arrays."""
+        engine = DouglasRachford.from_solver(solver)
+        engine.dr_y[:] = np.random.randn(2 * solver.m)
+
+        tracemalloc.start()
+        try:
+            # first calls may fill caches of Numpy and Python
+            for _ in range(2):
+                engine.iterate()
+                engine.difference_converged()
+            start, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            for _ in range(10):
+                engine.iterate()
+            engine.difference_converged()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(current, start)
+        # a few array views and scalars, less than one vector of size m
+        self.assertLess(peak - start, 8 * solver.m // 4)
+
+    def test_no_allocations(self):
+        """Test iterations allocate no arrays, with sparse and dense QR."""
+        matrix, b, c, zero, nonneg, soc = feasible_program(
+            2000, 50, zero=10, soc=(5,) * 20, seed=2)
+        for qr in ['PYSPQR', 'NUMPY']:
+            solver = Solver(
+                matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, qr=qr,
+                verbose=False)
+            self._check_no_allocations(solver)
+
+        # chained factors of the QR updates
+        np.random.seed(2)
+        rows = np.random.randn(3, 50)
+        solver.add_rows(rows, rows @ solver.x + 1.)
+        self.assertEqual(solver.statistics['qr_updates'], 3)
+        self._check_no_allocations(solver)
+        solver.remove_rows([0, 20])
+        if NUMBA_AVAILABLE:
+            self.assertEqual(solver.statistics['qr_updates'], 5)
+        self._check_no_allocations(solver)
+
+        # projection on exponential cones
+        matrix, b, c, zero, nonneg, soc = feasible_program(
+            2000, 50, zero=10, soc=(5,) * 20, seed=2, exp=300)
+        solver = Solver(
+            matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, exp=300,
+            qr='NUMPY', verbose=False)
+        self._check_no_allocations(solver)
+
+if __name__ == '__main__':
+    from unittest import main
+    main()
@@ -0,0 +1,114 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""Unit tests for the factorization cache."""
+
+from unittest import TestCase
+
+import numpy as np
+import scipy as sp
+
+from .factorization_cache import (
+    FactorizationCache, _nbytes, fingerprint, sparsity_fingerprint)
+
+
+class TestFactorizationCache(TestCase):
+    """Unit tests for the factorization cache."""
+
+    def test_fingerprint(self):
+        """Test fingerprint depends on matrix values, structure and cones."""
+        np.random.seed(0)
+        matrix = sp.sparse.random(20, 10, density=.3, format='csc')
+        base = fingerprint(matrix, 5, 15, (), 'PYSPQR')
+        self.assertEqual(
+            base, fingerprint(matrix.copy(), 5, 15, (), 'PYSPQR'))
+        self.assertNotEqual(base, fingerprint(matrix, 6, 14, (), 'PYSPQR'))
+        self.assertNotEqual(base, fingerprint(matrix, 5, 12, (3,), 'PYSPQR'))
+        self.assertNotEqual(base, fingerprint(matrix, 5, 15, (), 'NUMPY'))
+        self.assertNotEqual(
+            base, fingerprint(matrix, 5, 12, (), 'PYSPQR', exp=1))
+        self.assertEqual(base, fingerprint(matrix, 5, 15, (), 'PYSPQR', 0))
+        other = matrix.copy()
+        other.data[0] += 1.
+        self.assertNotEqual(base, fingerprint(other, 5, 15, (), 'PYSPQR'))
+
+    def test_nbytes(self):
+        """Test memory estimate counts shared arrays once."""
+        array = np.zeros(100)
+        self.assertEqual(_nbytes(array), 800)
+        self.assertEqual(_nbytes({'a': array, 'b': array[:10]}), 800)
+        linop = sp.sparse.linalg.LinearOperator(
+            shape=(100, 100), matvec=lambda x: array * x)
+        self.assertEqual(_nbytes([array, linop]), 800)
+        self.assertEqual(_nbytes(linop), 800)
+
+    def test_lru(self):
+        """Test least recently used entries are evicted first."""
+        cache = FactorizationCache(max_entries=2)
+        cache.put('a', {'value': np.zeros(1)})
+        cache.put('b', {'value': np.zeros(1)})
+        self.assertIsNotNone(cache.get('a'))
+        cache.put('c', {'value': np.zeros(1)})
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.statistics(), {
+            'hits': 1, 'misses': 1, 'evictions': 1, 'entries': 2,
+            'nbytes': 16, 'ordering_hits': 0, 'ordering_misses': 0})
+
+    def test_orderings(self):
+        """Test column orderings are keyed by sparsity pattern only."""
+        np.random.seed(0)
+        matrix = sp.sparse.random(20, 10, density=.3, format='csc')
+        other = matrix.copy()
+        other.data *= 2.
+        self.assertEqual(
+            sparsity_fingerprint(matrix), sparsity_fingerprint(other))
+        self.assertNotEqual(
+            sparsity_fingerprint(matrix), sparsity_fingerprint(matrix[:-1]))
+
+        cache = FactorizationCache(max_orderings=1)
+        self.assertIsNone(cache.get_ordering(sparsity_fingerprint(matrix)))
+        cache.put_ordering(sparsity_fingerprint(matrix), np.arange(10))
+        self.assertTrue(np.all(
+            cache.get_ordering(sparsity_fingerprint(other)) == np.arange(10)))
+        cache.put_ordering('other', np.arange(10))
+        self.assertIsNone(cache.get_ordering(sparsity_fingerprint(matrix)))
+        self.assertEqual(cache.ordering_hits, 1)
+        self.assertEqual(cache.ordering_misses, 2)
+
+    def test_byte_budget(self):
+        """Test byte budget is respected."""
+        cache = FactorizationCache(max_bytes=2000)
+        cache.put('a', {'value': np.zeros(100)})
+        cache.put('b', {'value': np.zeros(100)})
+        self.assertEqual(cache.nbytes, 1600)
+        cache.put('c', {'value': np.zeros(100)})
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 1)
+        self.assertNotIn('a', cache)
+        # too large to store at all
+        cache.put('d', {'value': np.zeros(1000)})
+        self.assertNotIn('d', cache)
+        self.assertEqual(cache.nbytes, 1600)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.nbytes, 0)
+
+
+if __name__ == '__main__':
+    from unittest import main
+    main()
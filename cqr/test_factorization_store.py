@@ -0,0 +1,154 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""Unit tests for the on-disk factorization store."""
+
+import struct
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+import scipy as sp
+from pyspqr import qr
+
+from . import factorization_store
+from .factorization_store import (
+    FactorizationStore, load_factorization, save_factorization)
+from .factors import (
+    ColumnBlock, DenseHouseholderQ, SparseHouseholderQ, TSQRHouseholderQ,
+    TriangularFactor)
+
+
+class TestFactorizationStore(TestCase):
+    """Unit tests for the on-disk factorization store."""
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = Path(self._directory.name)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def _round_trip(self, entry):
+        """Save and load entry."""
+        path = self.directory / 'entry.cqr'
+        save_factorization(path, entry, key='key')
+        key, loaded = load_factorization(path)
+        self.assertEqual(key, 'key')
+        return loaded
+
+    def test_plain_values(self):
+        """Test round trip of plain values and arrays."""
+        entry = {
+            'none': None, 'flag': True, 'integer': 3, 'real': .1,
+            'string': 'x', 'tuple': (1, (2., 'y')), 'list': [np.int64(4)],
+            'vector': np.arange(5.), 'fortran': np.asfortranarray(
+                np.random.randn(4, 3)), 'empty': np.zeros(0, dtype=int),
+            'sparse': sp.sparse.random(10, 5, density=.3, format='csr')}
+        loaded = self._round_trip(entry)
+        self.assertEqual(loaded['tuple'], (1, (2., 'y')))
+        self.assertEqual(loaded['real'], .1)
+        self.assertIsInstance(loaded['list'][0], int)
+        for name in ['vector', 'fortran', 'empty']:
+            self.assertTrue(np.all(loaded[name] == entry[name]))
+            self.assertEqual(loaded[name].dtype, entry[name].dtype)
+            self.assertFalse(loaded[name].flags.writeable)
+        self.assertTrue(loaded['fortran'].flags.f_contiguous)
+        self.assertEqual(loaded['sparse'].format, 'csr')
+        self.assertTrue(np.all(
+            loaded['sparse'].toarray() == entry['sparse'].toarray()))
+
+    def test_shared_objects(self):
+        """Test shared arrays and objects are stored once."""
+        array = np.random.randn(100)
+        q, _ = DenseHouseholderQ.from_matrix(np.random.randn(20, 5))
+        loaded = self._round_trip({
+            'a': array, 'b': array, 'range': ColumnBlock(q, 0, 5),
+            'null': ColumnBlock(q, 5, 20)})
+        self.assertIs(loaded['a'], loaded['b'])
+        self.assertIs(loaded['range'].orthogonal, loaded['null'].orthogonal)
+
+    def test_factors(self):
+        """Test loaded factors give the same products."""
+        np.random.seed(0)
+        matrix = sp.sparse.random(40, 10, density=.3, format='csc') \
+            + sp.sparse.eye(40, 10)
+        orthogonals = [
+            SparseHouseholderQ.from_pyspqr(qr(matrix.tocsc())[0]),
+            DenseHouseholderQ.from_matrix(matrix.toarray())[0],
+            TSQRHouseholderQ.from_matrix(matrix.toarray(), 3)[0]]
+        triangular = TriangularFactor(
+            sp.sparse.random(10, 10, density=.5, format='csc')
+            + sp.sparse.eye(10), np.random.permutation(10))
+        loaded = self._round_trip(
+            {'orthogonals': orthogonals, 'triangular': triangular})
+        vector = np.random.randn(40)
+        for orthogonal, other in zip(orthogonals, loaded['orthogonals']):
+            self.assertIs(type(orthogonal), type(other))
+            self.assertTrue(np.allclose(orthogonal @ vector, other @ vector))
+            self.assertTrue(np.allclose(
+                orthogonal.T @ vector, other.T @ vector))
+        for transpose in [False, True]:
+            self.assertTrue(np.allclose(
+                triangular.solve(vector[:10], transpose=transpose),
+                loaded['triangular'].solve(vector[:10], transpose=transpose)))
+
+    def test_errors(self):
+        """Test unknown types and invalid files are rejected."""
+        with self.assertRaises(TypeError):
+            save_factorization(self.directory / 'x.cqr', {'a': object()})
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+        path = self.directory / 'y.cqr'
+        path.write_bytes(b'not a factorization')
+        with self.assertRaises(ValueError):
+            load_factorization(path)
+
+        save_factorization(path, {'a': 1})
+        data = bytearray(path.read_bytes())
+        data[8:16] = struct.pack('<Q', factorization_store.FORMAT_VERSION + 1)
+        path.write_bytes(bytes(data))
+        with self.assertRaises(ValueError):
+            load_factorization(path)
+
+    def test_store(self):
+        """Test store is shared by instances on the same directory."""
+        store = FactorizationStore(self.directory)
+        self.assertIsNone(store.get('a'))
+        store.put('a', {'value': np.zeros(100)})
+        other = FactorizationStore(self.directory)
+        self.assertIn('a', other)
+        self.assertEqual(len(other), 1)
+        self.assertTrue(np.all(other.get('a')['value'] == 0.))
+        self.assertIsNone(other.get_ordering('pattern'))
+        store.put_ordering('pattern', np.arange(10))
+        self.assertTrue(np.all(
+            other.get_ordering('pattern') == np.arange(10)))
+        statistics = other.statistics()
+        self.assertEqual(statistics['hits'], 1)
+        self.assertEqual(statistics['misses'], 0)
+        self.assertEqual(statistics['entries'], 1)
+        self.assertGreater(statistics['nbytes'], 800)
+        self.assertEqual(statistics['ordering_hits'], 1)
+        self.assertEqual(statistics['ordering_misses'], 1)
+        other.clear()
+        self.assertEqual(len(store), 0)
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+
+if __name__ == '__main__':
+    from unittest import main
+    main()
@@ -0,0 +1,272 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""Unit tests for the factors of QR decompositions."""
+
+from unittest import TestCase
+
+import numpy as np
+import scipy as sp
+from pyspqr import qr
+
+from .factors import (
+    AppendedRowsQ, DeletedRowQ, DenseHouseholderQ, HouseholderReflector,
+    SparseHouseholderQ, TriangularFactor, TSQRHouseholderQ)
+
+
+class TestFactors(TestCase):
+    """Unit tests for the factors of QR decompositions."""
+
+    def assertAllClose(self, *args, **kwargs):
+        """Wrapper around np.allclose."""
+        self.assertTrue(np.allclose(*args, **kwargs))
+
+    @staticmethod
+    def _densify(linear_operator):
+        """Create Numpy 2-d array from a LinearOperator."""
+        return np.column_stack([
+            linear_operator @ column
+            for column in np.eye(linear_operator.shape[1])])
+
+    def test_sparse_householder_q(self):
+        """Test implicit Q of sparse QR against PySPQR's own operator."""
+        np.random.seed(0)
+        m, n = 40, 15
+        matrix = sp.sparse.random(m, n, density=.2, format='csc')
+        matrix += sp.sparse.eye(m, n, format='csc')
+        q_pyspqr, r, e = qr(matrix)
+        q = SparseHouseholderQ.from_pyspqr(q_pyspqr)
+
+        dense_q = self._densify(q)
+        self.assertAllClose(dense_q, self._densify(q_pyspqr))
+        self.assertAllClose(dense_q.T @ dense_q, np.eye(m))
+        self.assertAllClose(self._densify(q.T), dense_q.T)
+        self.assertGreater(q.nbytes, 0)
+
+        # products by matrices, column by column
+        block = np.asfortranarray(np.random.randn(m, 3))
+        result = np.empty((m, 3), order='F')
+        q.rmatmat_to(block, result)
+        self.assertAllClose(result, dense_q.T @ block)
+        expected = dense_q @ block
+        q.matmat_to(block, result)
+        self.assertAllClose(result, expected)
+
+        # column blocks
+        for start, stop in [(0, n), (n, m), (0, m), (3, 3)]:
+            block = q.column_block(start, stop)
+            self.assertEqual(block.shape, (m, stop - start))
+            if stop > start:
+                self.assertAllClose(
+                    self._densify(block), dense_q[:, start:stop])
+            y = np.random.randn(m)
+            self.assertAllClose(block.T @ y, dense_q[:, start:stop].T @ y)
+
+        # reconstructs matrix
+        self.assertAllClose(
+            q.column_block(0, n) @ (r.todense()[:n] @ e),
+            matrix.todense())
+
+    def test_dense_householder_q(self):
+        """Test implicit Q of dense QR against complete Numpy Q."""
+        np.random.seed(0)
+        for m, n in [(30, 10), (10, 30), (10, 10), (1, 3), (90, 70)]:
+            matrix = np.random.randn(m, n)
+            q, r = DenseHouseholderQ.from_matrix(matrix)
+            k = min(m, n)
+            self.assertEqual(r.shape, (k, n))
+            self.assertEqual(q.nbytes, 8 * (m * k + k + min(k, 32) * k))
+            # the Householder vectors are only read
+            q.householder_reflections.flags.writeable = False
+
+            dense_q = self._densify(q)
+            self.assertAllClose(dense_q.T @ dense_q, np.eye(m))
+            self.assertAllClose(self._densify(q.T), dense_q.T)
+            self.assertAllClose(dense_q[:, :k] @ r, matrix)
+            self.assertAllClose(
+                np.abs(dense_q), np.abs(np.linalg.qr(matrix, 'complete')[0]))
+
+            # null space block
+            nullspace = q.column_block(k, m)
+            y = np.random.randn(m)
+            self.assertAllClose(nullspace.T @ y, dense_q[:, k:].T @ y)
+            self.assertAllClose(matrix.T @ (nullspace @ nullspace.T @ y), 0.)
+
+            # products by matrices, in place on Fortran-ordered arrays
+            block = np.asfortranarray(np.random.randn(m, 4))
+            result = np.empty((m, 4), order='F')
+            q.rmatmat_to(block, result)
+            self.assertAllClose(result, dense_q.T @ block)
+            expected = dense_q @ block
+            q.matmat_to(block, result)
+            self.assertAllClose(result, expected)
+
+            # single precision copy
+            single = q.astype(np.float32)
+            self.assertEqual(single.dtype, np.float32)
+            self.assertEqual(2 * single.nbytes, q.nbytes)
+            vector = np.random.randn(m).astype(np.float32)
+            result = np.empty(m, dtype=np.float32)
+            single.rmatvec_to(vector, result)
+            self.assertAllClose(result, dense_q.T @ vector, atol=1e-5)
+            single.matvec_to(vector.copy(), result)
+            self.assertAllClose(result, dense_q @ vector, atol=1e-5)
+
+    def test_tsqr_householder_q(self):
+        """Test tall-skinny QR, with reduction tree and rank deficiency."""
+        np.random.seed(0)
+        for m, n, blocks in [
+                (100, 10, 4), (103, 7, 3), (64, 4, 16), (21, 10, 4),
+                (30, 10, 1)]:
+            matrix = np.random.randn(m, n)
+            matrix[:, 1] = matrix[:, 0]
+            q, r, permutation = TSQRHouseholderQ.from_matrix(
+                sp.sparse.csr_matrix(matrix), blocks=blocks)
+            self.assertIsInstance(q, TSQRHouseholderQ)
+            self.assertGreater(q.nbytes, 0)
+
+            dense_q = self._densify(q)
+            self.assertAllClose(dense_q.T @ dense_q, np.eye(m))
+            self.assertAllClose(self._densify(q.T), dense_q.T)
+            self.assertAllClose(dense_q[:, :n] @ r, matrix[:, permutation])
+
+            # pivoting at the root reveals the rank
+            factor = TriangularFactor(r, permutation)
+            self.assertEqual(factor.rank, n - 1)
+            self.assertEqual(factor.split, n - 1)
+
+        # tree with two levels
+        q, r, permutation = TSQRHouseholderQ.from_matrix(
+            np.random.randn(100, 10), blocks=4)
+        self.assertIsInstance(q.root, TSQRHouseholderQ)
+        self.assertIsInstance(q.root.root, DenseHouseholderQ)
+
+        # too few rows for more than one block
+        q, r, permutation = TSQRHouseholderQ.from_matrix(
+            np.random.randn(10, 20), blocks=4)
+        self.assertIsInstance(q, DenseHouseholderQ)
+
+    def _check_qr(self, q, r, matrix):
+        """Check orthogonal factor and QR reconstruction."""
+        m, n = matrix.shape
+        dense_q = self._densify(q)
+        self.assertAllClose(dense_q.T @ dense_q, np.eye(m))
+        self.assertAllClose(self._densify(q.T), dense_q.T)
+        self.assertAllClose(dense_q[:, :min(m, n)] @ r, matrix)
+        self.assertAllClose(np.tril(r, -1), 0.)
+
+    def test_appended_rows_q(self):
+        """Test QR update appending rows, also chained."""
+        np.random.seed(0)
+        m, n = 12, 5
+        matrix = sp.sparse.random(m, n, density=.5, format='csc')
+        matrix += sp.sparse.eye(m, n, format='csc')
+        q_pyspqr, r, e = qr(matrix)
+        q = SparseHouseholderQ.from_pyspqr(q_pyspqr)
+        r = r.toarray()[:n]
+        matrix = matrix.toarray()[:, e.permutation]
+        for rows, position in [(2, 3), (1, 0), (3, 15)]:
+            new = np.random.randn(rows, n)
+            q, r = AppendedRowsQ.from_update(q, r, new, position)
+            matrix = np.vstack([matrix[:position], new, matrix[position:]])
+            self._check_qr(q, r, matrix)
+        self.assertGreater(q.nbytes, 0)
+
+    def test_deleted_row_q(self):
+        """Test QR update deleting rows, also chained and wide."""
+        np.random.seed(0)
+        for m, n in [(12, 5), (6, 5), (5, 5), (4, 6)]:
+            matrix = np.random.randn(m, n)
+            q, r = DenseHouseholderQ.from_matrix(matrix)
+            for position in [0, m // 2, m - 3]:
+                q, r = DeletedRowQ.from_update(q, r, position)
+                matrix = np.delete(matrix, position, axis=0)
+                self.assertEqual(r.shape, (min(matrix.shape), n))
+                self._check_qr(q, r, matrix)
+
+    def test_householder_reflector(self):
+        """Test reflector is orthonormal basis of complement of vector."""
+        np.random.seed(0)
+        m = 20
+        for vector in [
+                np.random.randn(m), -np.abs(np.random.randn(m)),
+                np.eye(m)[0], np.eye(m)[-1], np.zeros(m)]:
+            basis = HouseholderReflector(vector)
+            self.assertEqual(basis.shape, (m, m-1))
+            dense = self._densify(basis)
+            self.assertAllClose(dense.T @ dense, np.eye(m-1))
+            self.assertAllClose(vector @ dense, 0.)
+            y = np.random.randn(m)
+            self.assertAllClose(basis.T @ y, dense.T @ y)
+
+    def _check_triangular_factor(self, matrix, r):
+        """Check triangular factor against dense least squares."""
+        dense = self._densify(r)
+        self.assertAllClose(self._densify(r.T), dense.T)
+        self.assertEqual(r.rank, np.linalg.matrix_rank(matrix))
+        np.random.seed(1)
+
+        # solutions where they exist, same as minimum norm least squares for
+        # the transpose system
+        x = np.random.randn(r.shape[1])
+        self.assertAllClose(dense @ r.solve(dense @ x), dense @ x)
+        z = np.random.randn(r.shape[0])
+        self.assertAllClose(
+            r.solve(dense.T @ z, transpose=True),
+            np.linalg.lstsq(dense.T, dense.T @ z, rcond=None)[0])
+
+        # no solution
+        if r.rank < r.shape[0]:
+            rhs = np.random.randn(r.shape[0])
+            self.assertFalse(np.allclose(dense @ r.solve(rhs), rhs))
+        if r.rank < r.shape[1]:
+            rhs = np.random.randn(r.shape[1])
+            self.assertFalse(np.allclose(
+                dense.T @ r.solve(rhs, transpose=True), rhs))
+
+    def test_triangular_factor(self):
+        """Test triangular factor from sparse QR, also rank deficient."""
+        np.random.seed(0)
+        full_rank = np.random.randn(10, 4)
+        rank_deficient = np.concatenate(
+            [full_rank, full_rank[:, :2] @ np.ones((2, 1)),
+                np.random.randn(10, 1)], axis=1)
+        wide = np.random.randn(4, 7)
+        for matrix in [full_rank, rank_deficient, wide, rank_deficient.T]:
+            matrix = sp.sparse.csc_matrix(matrix)
+            q, r, e = qr(matrix)
+            rows = min(matrix.shape)
+            factor = TriangularFactor(
+                r[:rows], getattr(e, 'permutation', np.arange(
+                    matrix.shape[1])))
+            self.assertAllClose(
+                SparseHouseholderQ.from_pyspqr(q).column_block(0, rows)
+                    @ self._densify(factor), matrix.todense())
+            self._check_triangular_factor(matrix.todense(), factor)
+
+    def test_triangular_factor_dense(self):
+        """Test triangular factor from dense unpivoted QR."""
+        np.random.seed(0)
+        matrix = np.random.randn(10, 4)
+        matrix = np.concatenate([matrix[:, :1] * 2, matrix], axis=1)
+        _, r = np.linalg.qr(matrix)
+        factor = TriangularFactor(r, np.arange(5))
+        self.assertEqual(factor.split, 1)
+        self._check_triangular_factor(matrix, factor)
+
+
+if __name__ == '__main__':
+    from unittest import main
+    main()
@@ -0,0 +1,92 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""Unit tests for the random cone programs."""
+
+from unittest import TestCase
+
+import cvxpy as cp
+import numpy as np
+import scipy as sp
+
+from .programs import (
+    feasible_linear_program, feasible_program, l1_regression_program,
+    l1_regularized_regression_program, portfolio_program)
+from .solver import Solver
+
+
+class TestPrograms(TestCase):
+    """Unit tests for the random cone programs."""
+
+    def _solve(self, program):
+        """Solve program, check it is optimal, return the objective."""
+        matrix, b, c, zero, nonneg, soc = program
+        self.assertEqual(matrix.shape, (len(b), len(c)))
+        self.assertEqual(zero + nonneg + sum(soc), len(b))
+        solver = Solver(
+            matrix, b, c, zero=zero, nonneg=nonneg, soc=soc, verbose=False)
+        self.assertEqual(solver.status, 'Optimal')
+        return c @ solver.x
+
+    def test_feasible(self):
+        """Test feasible programs have a solution."""
+        self._solve(feasible_program(40, 10, zero=3, soc=(3, 4), seed=0))
+        np.random.seed(0)
+        self._solve(feasible_linear_program(
+            sp.sparse.csc_matrix(np.random.randn(30, 10)), 5, seed=0))
+
+    def test_against_cvxpy(self):
+        """Test l1 and portfolio programs against their CVXPY models."""
+        np.random.seed(1)
+        a, b, d = np.random.randn(41, 30), np.random.randn(41), \
+            np.random.randn(30, 5)
+        x = cp.Variable(30)
+        reference = cp.Problem(
+            cp.Minimize(cp.norm1(a @ x - b)),
+            [cp.abs(x) <= .75, x @ d == 2.]).solve(solver='SCS', eps=1e-10)
+        self.assertTrue(np.isclose(
+            self._solve(l1_regression_program(1)), reference))
+
+        np.random.seed(1)
+        a, b = np.random.randn(41, 30), np.random.randn(41)
+        reference = cp.Problem(cp.Minimize(
+            cp.norm1(a @ x - b) + cp.norm1(x))).solve(
+                solver='SCS', eps=1e-10)
+        self.assertTrue(np.isclose(
+            self._solve(l1_regularized_regression_program(1)), reference))
+
+        np.random.seed(1)
+        n = 20
+        w0 = np.random.randn(n)
+        w0 -= np.sum(w0) / n
+        w0 /= np.sum(np.abs(w0))
+        mu = np.random.randn(n) * 1e-3
+        sigma = np.random.randn(n, n)
+        eigenvalues, eigenvectors = np.linalg.eigh(sigma.T @ sigma)
+        factors = np.diag(np.sqrt(1e-4 * eigenvalues[-2:])) @ \
+            eigenvectors[:, -2:].T
+        w = cp.Variable(n)
+        reference = cp.Problem(
+            cp.Minimize(w @ mu + 1e-5 * cp.norm1(w - w0)),
+            [cp.sum(w) == 0, cp.norm1(w - w0) <= .05, cp.norm1(w) <= 1,
+             cp.sum_squares(factors @ w) <= 5e-5]).solve(
+                 solver='SCS', eps=1e-12)
+        self.assertTrue(np.isclose(
+            self._solve(portfolio_program(1, n=n)), reference, atol=1e-8))
+
+
+if __name__ == '__main__':
+    from unittest import main
+    main()
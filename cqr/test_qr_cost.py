@@ -0,0 +1,93 @@
+# Copyright 2025 Enzo Busseti
+#
+# This file is part of CQR, the Conic QR Solver.
+#
+# CQR is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# CQR is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# CQR. If not, see <https://www.gnu.org/licenses/>.
+"""Unit tests for the cost model of QR factorizations."""
+
+from unittest import TestCase
+
+import numpy as np
+import scipy as sp
+
+from . import qr_cost
+from .qr_cost import choose_qr_backend, estimate_qr_cost, symbolic_fill
+
+
+class TestQRCost(TestCase):
+    """Unit tests for the cost model of QR factorizations."""
+
+    def test_symbolic_fill(self):
+        """Test fill estimate on simple sparsity patterns."""
+        self.assertEqual(symbolic_fill(sp.sparse.eye(30, 10)), 10)
+        self.assertEqual(
+            symbolic_fill(sp.sparse.csc_matrix(np.ones((30, 10)))), 55)
+        self.assertEqual(
+            symbolic_fill(sp.sparse.csc_matrix(np.ones((5, 10)))), 40)
+        # bidiagonal, R is bidiagonal too
+        bidiagonal = sp.sparse.eye(20) + sp.sparse.eye(20, k=1)
+        self.assertEqual(symbolic_fill(bidiagonal), 39)
+
+    def test_symbolic_fill_bound(self):
+        """Test bound used when pattern of A^T A is too costly."""
+        matrix = sp.sparse.csc_matrix(np.ones((30, 10)))
+        matrix[:, 5:] = 0.
+        matrix.eliminate_zeros()
+        self.assertEqual(symbolic_fill(matrix), 15)
+        default = qr_cost._MAX_SYMBOLIC_WORK
+        try:
+            qr_cost._MAX_SYMBOLIC_WORK = 0
+            # sum of squared row counts, clipped to the full trapezoid
+            self.assertEqual(symbolic_fill(matrix), 55)
+        finally:
+            qr_cost._MAX_SYMBOLIC_WORK = default
+
+    def test_choose_backend(self):
+        """Test dense matrices go to dense QR, sparse ones to sparse QR."""
+        np.random.seed(0)
+        dense = estimate_qr_cost(
+            sp.sparse.csc_matrix(np.random.randn(500, 200)))
+        self.assertEqual(choose_qr_backend(dense), 'NUMPY')
+        sparse = estimate_qr_cost(
+            sp.sparse.random(5000, 2000, density=.001, format='csc')
+            + sp.sparse.eye(5000, 2000))
+        self.assertEqual(choose_qr_backend(sparse), 'PYSPQR')
+        self.assertLess(sparse['PYSPQR']['bytes'], sparse['NUMPY']['bytes'])
+
+        # memory budget
+        self.assertEqual(choose_qr_backend(
+            sparse, max_bytes=sparse['PYSPQR']['bytes']), 'PYSPQR')
+        self.assertIsNone(choose_qr_backend(
+            sparse, max_bytes=sparse['PYSPQR']['bytes'] - 1))
+        self.assertEqual(choose_qr_backend(
+            dense, max_bytes=dense['NUMPY']['bytes'] - 1), 'PYSPQR')
+
+    def test_tsqr(self):
+        """Test tall-skinny QR is chosen for tall dense matrices."""
+        np.random.seed(0)
+        matrix = sp.sparse.csc_matrix(np.random.randn(10000, 50))
+        self.assertEqual(
+            choose_qr_backend(estimate_qr_cost(matrix, workers=1)), 'NUMPY')
+        estimate = estimate_qr_cost(matrix, workers=8)
+        self.assertEqual(choose_qr_backend(estimate), 'TSQR')
+        self.assertLess(
+            estimate['TSQR']['seconds'], estimate['NUMPY']['seconds'] / 4)
+        # not tall enough for more than one block
+        estimate = estimate_qr_cost(matrix[:60], workers=8)
+        self.assertEqual(
+            estimate['TSQR']['flops'], estimate['NUMPY']['flops'])
+
+
+if __name__ == '__main__':
+    from unittest import main
+    main()